@@ -8,6 +8,7 @@ from . import crawlers
 from . import processes
 from . import settings
 from . import tasks
+from . import transports
 
 
 
@@ -61,15 +62,33 @@ def main():
     parser.add_argument("-f",dest="indexFile",default=None)
     parser.add_argument("-I",dest="listAll",action="store_true")
     parser.add_argument("-t",dest="species",default="")
+    parser.add_argument("--clade",dest="clade",type=int,default=0)
+    parser.add_argument("--taxid",dest="taxId",type=int,default=0)
     parser.add_argument("-d",dest="rootPath",default=None)
     parser.add_argument("-q",dest="notEcho",action="store_true")
     parser.add_argument("-n",dest="cpuCount",type=int,default=0)
+    parser.add_argument("-p",dest="hostConnections",type=int,default=0)
+    parser.add_argument("-j",dest="mirrorJobs",type=int,default=0)
+    parser.add_argument("--recrawl",dest="recrawl",action="store_true")
+    parser.add_argument("--transport",dest="transports",action="append",default=[])
+    parser.add_argument("--changes",dest="changes",action="append",default=None)
     args = parser.parse_args()
+    for transport in args.transports:
+        (name,sep,scheme) = transport.partition("=")
+        if not sep or scheme not in ("ftp","http","https"):
+            parser.error("--transport must be NAME=ftp, NAME=http, or NAME=https.")
+        settings.transports[name] = scheme
     if args.cpuCount > 0:
         settings.cpuCount = args.cpuCount
+    if args.hostConnections > 0:
+        settings.hostConnections = args.hostConnections
+    if args.mirrorJobs > 0:
+        settings.mirrorJobs = args.mirrorJobs
     if args.rootPath:
         settings.rootPath = args.rootPath
+    settings.recrawl = args.recrawl
     core.log.setEcho(not args.notEcho)
+    speciesFilter = core.SpeciesFilter(args.species,args.clade,args.taxId)
     core.assembly.registerCrawler(crawlers.EnsemblCrawler())
     core.assembly.registerCrawler(crawlers.Ensembl2Crawler())
     core.assembly.registerCrawler(crawlers.NCBICrawler())
@@ -85,26 +104,30 @@ def main():
     core.assembly.registerTask(tasks.WriteCDNATask)
     core.assembly.registerTask(tasks.WriteGtfTask)
     core.assembly.registerTask(tasks.WriteSpliceSitesTask)
+    core.scheduler.registerTransport("ftp",transports.FTPTransport)
+    core.scheduler.registerTransport("http",transports.HTTPTransport)
+    core.scheduler.registerTransport("https",transports.HTTPTransport)
     if args.listAll:
         listAll()
     else:
         if not args.crawl and not args.mirror and not args.index:
-            core.assembly.crawl(args.species)
-            core.assembly.mirror(args.species)
+            core.assembly.crawl(speciesFilter)
+            core.assembly.mirror(speciesFilter,args.changes)
             if args.indexFile is not None:
                 index(args.indexFile)
             else:
-                core.assembly.indexSpecies(args.species)
+                core.assembly.indexSpecies(speciesFilter)
         else:
             if args.crawl:
-                core.assembly.crawl(args.species)
+                core.assembly.crawl(speciesFilter)
             if args.mirror:
-                core.assembly.mirror(args.species)
+                core.assembly.mirror(speciesFilter,args.changes)
             if args.index:
                 if args.indexFile is not None:
                     index(args.indexFile)
                 else:
-                    core.assembly.indexSpecies(args.species)
+                    core.assembly.indexSpecies(speciesFilter)
+        core.scheduler.report()
 
 
 
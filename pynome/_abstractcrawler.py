@@ -3,10 +3,12 @@ Contains the AbstractCrawler class.
 """
 from . import core
 import abc
+import datetime
 import json
 import os
 import re
 from . import settings
+from . import utility
 
 
 
@@ -20,6 +22,9 @@ class AbstractCrawler(abc.ABC):
     This is the abstract crawler class. An interface is provided that crawls its
     source and adds entries to be added to the local file structure.
     """
+    __BATCH_SIZE = 1000
+    __CHANGES_FORMAT = "changes-%Y%m%d%H%M%S.txt"
+    __LOCAL_KEYS = ("processed","validators")
 
 
     def __init__(
@@ -30,51 +35,79 @@ class AbstractCrawler(abc.ABC):
         """
         super().__init__()
         self.__entries = {}
+        self.__seen = set()
+        self.__changes = []
+        self.__counts = {"added": 0, "changed": 0, "unchanged": 0}
 
 
     def assemble(
         self
+        ,speciesFilter=None
         ):
         """
-        Updates the directory structure and metadata JSON files of the local
-        database with all entries added to this crawler, creating directories
-        and files that do not exist and overwriting ones that do. If a metadata
-        JSON file already exists for a written assembly, the processed data is
-        preserved in the new JSON file. This also clears all entries added from
-        this crawler's crawl method.
+        Finishes updating the directory structure and metadata JSON files of
+        the local database with all entries added to this crawler. Entries are
+        written in batches as they are added, so this only writes the last
+        batch and then reports how many assemblies were added, changed,
+        unchanged, or vanished since the last crawl. Vanished assemblies are
+        ones in the local database from this crawler that were not seen by its
+        last crawl, which are only counted if the given filter is empty because
+        a filtered crawl does not see every assembly. If any assemblies were
+        added or their remote files changed, a changeset file listing their data
+        directories is written to this crawler's data directory, which can be
+        given to mirroring to only mirror them. This also clears all entries,
+        changes, and counts of this crawler's crawl method.
+
+        Parameters
+        ----------
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter given to this crawler's last crawl or None
+                        if it was not filtered.
         """
-        for key in self.__entries:
-            d = os.path.join(settings.rootPath,key)
-            os.makedirs(d,exist_ok=True)
-            path = os.path.join(d,"metadata.json")
-            processed = {}
-            if os.path.isfile(path):
-                with open(path,"r") as ifile:
-                    oldmeta = json.loads(ifile.read())
-                    processed = oldmeta["processed"]
-            meta = self.__entries[key]
-            meta["processed"] = processed
-            with open(os.path.join(d,"metadata.json"),"w") as ofile:
-                ofile.write(json.dumps(meta,indent=4) + "\n")
-        self.__entries = {}
+        self.__flush_()
+        if self.__changes:
+            path = os.path.join(
+                self._dataDir_()
+                ,datetime.datetime.now().strftime(self.__CHANGES_FORMAT)
+            )
+            with open(path,"w") as ofile:
+                ofile.write("".join(change+"\n" for change in self.__changes))
+            self._log_("Wrote changeset of "+str(len(self.__changes))+" assemblies to '"+path+"'.")
+        message = (
+            "Assembled "
+            + str(self.__counts["added"])
+            + " added, "
+            + str(self.__counts["changed"])
+            + " changed, "
+            + str(self.__counts["unchanged"])
+            + " unchanged"
+        )
+        if speciesFilter is None or speciesFilter.isEmpty():
+            message += ", and "+str(self.__countVanished_())+" vanished"
+        self._log_(message+" assemblies.")
+        self.__seen = set()
+        self.__changes = []
+        self.__counts = {"added": 0, "changed": 0, "unchanged": 0}
 
 
     @abc.abstractmethod
     def crawl(
         self
-        ,species=""
+        ,speciesFilter
         ):
         """
         This interface crawls the remote database, adding all entries it finds
-        to be added to the local file database. An optional species name can be
-        provided that restricts entries being added to only that species if it
-        is not an empty string.
+        to be added to the local file database. A species filter is provided
+        that restricts entries being added to only matching species. The filter
+        should be applied as early as possible, before any remote probing of
+        species that do not match.
 
         Parameters
         ----------
-        species : string
-                  Species name used to restrict the entries added to only that
-                  species. If this is empty then all species are added.
+        speciesFilter : pynome.core.SpeciesFilter
+                        Filter used to restrict the entries added to only
+                        matching species. If this is empty then all species
+                        are added.
         """
         pass
 
@@ -108,7 +141,10 @@ class AbstractCrawler(abc.ABC):
         ):
         """
         Adds a database entry for this crawler to be used in assembling the
-        local directories and JSON metadata.
+        local directories and JSON metadata. Added entries are written in
+        batches, comparing each one with its existing metadata JSON file and
+        only writing it if it has changed. The metadata JSON file is replaced
+        atomically and its processed data is preserved.
 
         Parameters
         ----------
@@ -131,7 +167,8 @@ class AbstractCrawler(abc.ABC):
                       source.
         """
         assert(taxonomyId.isdigit())
-        key = os.path.join(taxonomyId,re.sub("[\s\\\\/]","_",assemblyId+"-"+self.name()))
+        key = self._entryKey_(taxonomyId,assemblyId)
+        self.__seen.add(key)
         self.__entries[key] =  {
             "genus": genus
             ,"species": species
@@ -144,6 +181,8 @@ class AbstractCrawler(abc.ABC):
             ,"process_type": processType
             ,"process_data": processData
         }
+        if len(self.__entries) >= self.__BATCH_SIZE:
+            self.__flush_()
 
 
     def _dataDir_(
@@ -161,6 +200,52 @@ class AbstractCrawler(abc.ABC):
         return os.path.join(settings.rootPath,"."+self.name())
 
 
+    def _entryKey_(
+        self
+        ,taxonomyId
+        ,assemblyId
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        taxonomyId : string
+                     The taxonomy ID of an entry.
+        assemblyId : string
+                     The assembly ID of an entry.
+
+        Returns
+        -------
+        ret0 : string
+               The data directory of the entry with the given taxonomy and
+               assembly ID added by this crawler, relative to the root path of
+               the local database.
+        """
+        return os.path.join(taxonomyId,re.sub("[\s\\\\/]","_",assemblyId+"-"+self.name()))
+
+
+    def _keepEntry_(
+        self
+        ,taxonomyId
+        ,assemblyId
+        ):
+        """
+        Marks the existing database entry of this crawler with the given
+        taxonomy and assembly ID as unchanged, so it is counted as seen by this
+        crawl without being added again.
+
+        Parameters
+        ----------
+        taxonomyId : string
+                     The taxonomy ID of the entry.
+        assemblyId : string
+                     The assembly ID of the entry.
+        """
+        self.__seen.add(self._entryKey_(taxonomyId,assemblyId))
+        self.__counts["unchanged"] += 1
+
+
     def _log_(
         self
         ,message
@@ -176,3 +261,85 @@ class AbstractCrawler(abc.ABC):
                   Message that is sent to the logging system.
         """
         core.log.send("("+self.name()+") "+message)
+
+
+    def _transport_(
+        self
+        ,host
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        host : string
+               A remote host this crawler accesses.
+
+        Returns
+        -------
+        ret0 : pynome.interfaces.AbstractTransport
+               The shared transport of the given host using the URL scheme
+               selected for this crawler by the transports setting, which is
+               FTP if none is selected.
+        """
+        scheme = settings.transports.get(self.name(),"ftp")
+        return core.scheduler.transport(scheme+"://"+host+"/")
+
+
+    def __countVanished_(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : int
+               The number of assemblies in the local database from this crawler
+               that were not seen by its last crawl.
+        """
+        ret = 0
+        suffix = "-"+self.name()
+        for taxId in os.listdir(settings.rootPath):
+            if taxId.isdecimal():
+                path = os.path.join(settings.rootPath,taxId)
+                if os.path.isdir(path):
+                    for assemblyName in os.listdir(path):
+                        if (
+                            assemblyName.endswith(suffix)
+                            and os.path.join(taxId,assemblyName) not in self.__seen
+                        ):
+                            ret += 1
+        return ret
+
+
+    def __flush_(
+        self
+        ):
+        """
+        Writes all entries added to this crawler that are new or have changed
+        to the local database and then clears them. The metadata JSON file of
+        an entry is only written if it does not exist or its contents excluding
+        the locally maintained keys differ, in which case it is replaced
+        atomically with the locally maintained keys of the existing file
+        preserved. Entries that are new or whose process data changed are added
+        to this crawler's changes.
+        """
+        for (key,meta) in self.__entries.items():
+            d = os.path.join(settings.rootPath,key)
+            path = os.path.join(d,"metadata.json")
+            old = None
+            if os.path.isfile(path):
+                with open(path,"r") as ifile:
+                    old = json.loads(ifile.read())
+            for localKey in self.__LOCAL_KEYS:
+                meta[localKey] = old.get(localKey,{}) if old is not None else {}
+            if old == meta:
+                self.__counts["unchanged"] += 1
+                continue
+            self.__counts["changed" if old is not None else "added"] += 1
+            if old is None or old.get("process_data") != meta["process_data"]:
+                self.__changes.append(key)
+            os.makedirs(d,exist_ok=True)
+            utility.saveJson(path,meta,indent=4)
+        self.__entries = {}
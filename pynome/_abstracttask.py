@@ -26,6 +26,7 @@ class AbstractTask(abc.ABC):
         ,dataDir
         ,rootName
         ,meta
+        ,validators=None
         ):
         """
         Initializes a new implemented task.
@@ -40,11 +41,16 @@ class AbstractTask(abc.ABC):
                    by this task for its assembly.
         meta : dictionary
                The processed part of the metadata of this task's assembly.
+        validators : dictionary
+                     The last seen validators of the remote file this new task
+                     downloads, as saved in the metadata of its assembly. This
+                     is copied so it can be updated while the task runs.
         """
         super().__init__()
         self.__dataDir = dataDir
         self.__rootName = rootName
         self.__meta = meta
+        self.__validators = dict(validators) if validators else {}
 
 
     @abc.abstractmethod
@@ -80,6 +86,42 @@ class AbstractTask(abc.ABC):
         pass
 
 
+    def url(
+        self
+        ):
+        """
+        Getter method. Tasks that download a remote file must implement this
+        so concurrent mirroring can limit the tasks running for each remote
+        host.
+
+        Returns
+        -------
+        ret0 : string
+               The remote URL this task downloads or an empty string if it does
+               not access a remote server.
+        """
+        return ""
+
+
+    def validators(
+        self
+        ):
+        """
+        Getter method. Tasks that download a remote file update these with the
+        validators of the remote file they last saw, which are saved in the
+        metadata of their assembly after the task runs.
+
+        Returns
+        -------
+        ret0 : dictionary
+               The remote validators of this task's file with the keys "size",
+               "modify", "etag", and "checksum", any of which can be missing
+               if they are unknown. This is empty if the task does not access
+               a remote server or has never seen its remote file.
+        """
+        return self.__validators
+
+
     def _log_(
         self
         ,message
@@ -0,0 +1,288 @@
+"""
+Contains the AbstractTransport class.
+"""
+import abc
+from . import exceptions
+
+
+
+
+
+
+
+
+class AbstractTransport(abc.ABC):
+    """
+    This is the abstract transport class. An interface is provided that
+    accesses the files of a single remote host through one protocol, listing
+    directories, getting the facts of single files, and retrieving them. Every
+    request of a transport is made through the scheduler singleton. Transports
+    are shared by everything accessing the same host with the same protocol and
+    are thread safe, keeping a bounded pool of connections to their host.
+    """
+
+
+    def __init__(
+        self
+        ,host
+        ,scheme
+        ):
+        """
+        Initializes a new abstract transport instance.
+
+        Parameters
+        ----------
+        host : string
+               The remote host this new transport accesses, which can include a
+               port number.
+        scheme : string
+                 The URL scheme this new transport is registered with.
+        """
+        super().__init__()
+        self.__host = host
+        self.__scheme = scheme
+
+
+    @abc.abstractmethod
+    def close(
+        self
+        ):
+        """
+        This interface closes all idle connections of this transport.
+        """
+        pass
+
+
+    def conditional(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : bool
+               True if this transport retrieves files with conditional requests
+               when given validators or false if it ignores them.
+        """
+        return False
+
+
+    def host(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : string
+               The remote host of this transport.
+        """
+        return self.__host
+
+
+    @abc.abstractmethod
+    def list(
+        self
+        ,directory
+        ):
+        """
+        This interface is a getter method.
+
+        Parameters
+        ----------
+        directory : string
+                    The remote directory path that is listed.
+
+        Returns
+        -------
+        ret0 : list
+               Tuples of the file name and facts of every entry of the given
+               directory in the same format returned by the list directory
+               utility function. This is empty if the directory does not exist.
+        """
+        pass
+
+
+    @abc.abstractmethod
+    def retrieve(
+        self
+        ,path
+        ,callback
+        ,offset=0
+        ,validators=None
+        ):
+        """
+        This interface retrieves the given remote file, calling the given
+        callback with each block of its data in order. If the request is retried
+        after some data has been given to the callback then it resumes where it
+        stopped, so the callback is never given the same data twice. Any error
+        raised by the callback is raised as a download error without retrying
+        the request. If validators are given then the file is only retrieved if
+        it changed compared with them, using a conditional request. Transports
+        whose protocol has no conditional requests ignore the given validators.
+
+        Parameters
+        ----------
+        path : string
+               The remote path of the file that is retrieved.
+        callback : function
+                   Called with each block of bytes of the remote file.
+        offset : int
+                 The byte offset of the remote file where retrieval starts.
+        validators : dictionary
+                     The last seen validators of the remote file in the same
+                     format as the validators of tasks.
+
+        Returns
+        -------
+        ret0 : dictionary
+               Any validators of the remote file reported by its server while
+               retrieving it, which can be empty, or None if the file was not
+               retrieved because it has not changed compared with the given
+               validators.
+        """
+        pass
+
+
+    @abc.abstractmethod
+    def retrieveRange(
+        self
+        ,path
+        ,callback
+        ,start
+        ,length
+        ):
+        """
+        This interface retrieves the given byte range of the given remote file,
+        calling the given callback with each block of its data in order. If the
+        request is retried after some data has been given to the callback then
+        it resumes where it stopped, so the callback is never given the same
+        data twice. Any error raised by the callback is raised as a download
+        error without retrying the request. Ranges of the same file can be
+        retrieved concurrently over separate connections.
+
+        Parameters
+        ----------
+        path : string
+               The remote path of the file whose range is retrieved.
+        callback : function
+                   Called with each block of bytes of the given range.
+        start : int
+                The byte offset of the remote file where the range starts.
+        length : int
+                 The number of bytes of the range, which must not extend past
+                 the end of the remote file.
+
+        Returns
+        -------
+        ret0 : dictionary
+               Any validators of the remote file reported by its server while
+               retrieving the range, which can be empty.
+        """
+        pass
+
+
+    def scheme(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : string
+               The URL scheme of this transport.
+        """
+        return self.__scheme
+
+
+    @abc.abstractmethod
+    def size(
+        self
+        ):
+        """
+        This interface is a getter method.
+
+        Returns
+        -------
+        ret0 : int
+               The maximum number of concurrent connections this transport
+               opens to its host.
+        """
+        pass
+
+
+    @abc.abstractmethod
+    def stat(
+        self
+        ,path
+        ):
+        """
+        This interface is a getter method.
+
+        Parameters
+        ----------
+        path : string
+               The remote path of a file.
+
+        Returns
+        -------
+        ret0 : dictionary
+               The facts of the given remote file in the same format returned
+               by the list directory utility function or None if it does not
+               exist.
+        """
+        pass
+
+
+    def url(
+        self
+        ,path
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        path : string
+               A remote path starting with a slash.
+
+        Returns
+        -------
+        ret0 : string
+               The URL of the given remote path accessed with this transport.
+        """
+        return self.__scheme+"://"+self.__host+path
+
+
+    def _deliver_(
+        self
+        ,callback
+        ,data
+        ,path
+        ,received
+        ):
+        """
+        Gives the given block of data of the given remote file to the given
+        callback of a retrieval. Any error raised by the callback, such as a
+        full local disk, is raised as a download error instead, so the request
+        is neither retried nor counted as a failure of this transport's host.
+
+        Parameters
+        ----------
+        callback : function
+                   The callback of a retrieval that is given the data.
+        data : bytes
+               The next block of data of the given remote file.
+        path : string
+               The remote path of the file that is retrieved.
+        received : int
+                   The byte offset of the remote file where the given block
+                   starts.
+        """
+        try:
+            callback(data)
+        except Exception as e:
+            raise exceptions.DownloadError(self.url(path),received,str(e)) from e
@@ -1,7 +1,9 @@
 """
 Contains the Assembly class.
 """
+import concurrent.futures
 from . import core
+import functools
 import inspect
 from . import interfaces
 from . import exceptions
@@ -10,7 +12,9 @@ import os
 import re
 from . import settings
 import subprocess
+import threading
 import traceback
+from . import utility
 
 
 
@@ -78,27 +82,27 @@ class Assembly():
 
     def indexSpecies(
         self
-        ,species
+        ,speciesFilter
         ):
         """
-        Indexes all assemblies with the given species name. If the indexes are
-        already up to date for any matched assembly then it is skipped.
+        Indexes all assemblies matching the given species filter. If the indexes
+        are already up to date for any matched assembly then it is skipped. If
+        the given filter is empty then nothing is indexed.
 
         Parameters
         ----------
-        species : string
-                  The species name matched with assemblies to index.
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter matched with assemblies to index.
         """
-        if not species:
+        if speciesFilter.isEmpty():
             return
         for taxId in os.listdir(settings.rootPath):
-            if taxId.isdecimal():
+            if taxId.isdecimal() and speciesFilter.matchTaxId(taxId):
                 path = os.path.join(settings.rootPath,taxId)
                 if os.path.isdir(path):
                     for assemblyName in os.listdir(path):
                         meta = self.__loadMeta_(os.path.join(settings.rootPath,taxId,assemblyName))
-                        fullName = meta["genus"].lower()+" "+meta["species"].lower()
-                        if not species.lower() in fullName:
+                        if not speciesFilter.matchName(meta["genus"],meta["species"]):
                             continue
                         self.index(taxId,assemblyName)
 
@@ -131,65 +135,76 @@ class Assembly():
 
     def mirror(
         self
-        ,species
+        ,speciesFilter
+        ,changes=None
         ):
         """
         Iterates through all local database folders, inspecting their metadata
         file and downloading any new data files if new versions are present on
         the remote server. Any assembly whose data is updated is marked to
-        update its appropriate indexes.
+        update its appropriate indexes. If changeset files are given then only
+        the assemblies they list are mirrored instead of every local assembly.
+        Mirror tasks of all assemblies are run concurrently by a mirror engine,
+        limited by the mirror jobs setting in total and by the host connections
+        setting for any one remote host. A task that fails is logged without
+        interrupting any other task. Stored files of the content store
+        singleton that are no longer used are pruned once all tasks are done.
 
         Parameters
         ----------
-        species : string
-                  The name of the species that is mirrored, ignoring any other
-                  species on the local database. If this string is blank then
-                  all species are mirrored.
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter that mirrored species must match, ignoring
+                        any other species on the local database. Directories
+                        of taxonomy IDs that do not match are never scanned.
+        changes : list
+                  Full paths to changeset files written by assembling crawlers
+                  or None to mirror all local assemblies.
         """
-        for taxId in os.listdir(settings.rootPath):
-            if taxId.isdecimal():
-                path = os.path.join(settings.rootPath,taxId)
-                if os.path.isdir(path):
-                    for assemblyName in os.listdir(path):
-                        dataDir = os.path.join(taxId,assemblyName)
-                        workDir = os.path.join(settings.rootPath,dataDir)
-                        meta = self.__loadMeta_(workDir)
-                        if species:
-                            fullName = meta["genus"].lower()+" "+meta["species"].lower()
-                            if not species.lower() in fullName:
-                                continue
-                        rootName = self.__rootName_(meta)
-                        process = self.__processes[meta["process_type"]]
-                        for taskName in process.mirrorTasks():
-                            task = self.__tasks[taskName](dataDir,rootName,meta["process_data"])
-                            try:
-                                if task():
-                                    process.completeTask(taskName,meta["processed"])
-                                    self.__saveMeta_(workDir,meta)
-                            except:
-                                pass
+        if changes is None:
+            dataDirs = self.__listDataDirs_(speciesFilter)
+        else:
+            dataDirs = self.__readChanges_(changes)
+        core.MirrorEngine(settings.mirrorJobs,settings.hostConnections).run(
+            self.__mirrorJobs_(dataDirs,speciesFilter)
+        )
+        core.store.prune()
 
 
     def crawl(
         self
-        ,species
+        ,speciesFilter
         ):
         """
-        Iterates through all registered crawler implementations and crawls their
-        remote database to update the local database metadata.
+        Crawls the remote databases of all registered crawler implementations
+        concurrently, each in its own thread, to update the local database
+        metadata. Each crawler is assembled as soon as its crawl finishes, one
+        at a time. A crawler whose crawl fails is logged and not assembled,
+        without interrupting any other crawler.
 
         Parameters
         ----------
-        species : string
-                  The name of the species that is crawled, ignoring any other
-                  species found on the remote server. If this string is blank
-                  then all species are crawled.
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter that crawled species must match, ignoring
+                        any other species found on the remote server.
         """
         self.__copyListScript_()
         self.__prepareDataDirs_()
-        for crawler in self.__crawlers.values():
-            crawler.crawl(species)
-            crawler.assemble()
+        if not self.__crawlers:
+            return
+        with concurrent.futures.ThreadPoolExecutor(len(self.__crawlers)) as executor:
+            futures = {
+                executor.submit(crawler.crawl,speciesFilter): crawler
+                for crawler in self.__crawlers.values()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                crawler = futures[future]
+                try:
+                    future.result()
+                    crawler.assemble(speciesFilter)
+                except Exception:
+                    core.log.send(
+                        "("+crawler.name()+") Crawl failed:\n"+traceback.format_exc().rstrip()
+                    )
 
 
     def registerCrawler(
@@ -265,6 +280,35 @@ class Assembly():
             os.popen("cp "+src+" "+dst)
 
 
+    def __listDataDirs_(
+        self
+        ,speciesFilter
+        ):
+        """
+        Generator method that yields the data directory of every local assembly
+        whose taxonomy ID directory matches the given filter.
+
+        Parameters
+        ----------
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter that taxonomy ID directories must match.
+                        Directories of taxonomy IDs that do not match are never
+                        scanned.
+
+        Returns
+        -------
+        ret0 : string
+               The data directory of the yielded assembly relative to the root
+               path of the local database.
+        """
+        for taxId in os.listdir(settings.rootPath):
+            if taxId.isdecimal() and speciesFilter.matchTaxId(taxId):
+                path = os.path.join(settings.rootPath,taxId)
+                if os.path.isdir(path):
+                    for assemblyName in os.listdir(path):
+                        yield os.path.join(taxId,assemblyName)
+
+
     def __loadMeta_(
         self
         ,workDir
@@ -288,6 +332,62 @@ class Assembly():
             return meta
 
 
+    def __mirrorJobs_(
+        self
+        ,dataDirs
+        ,speciesFilter
+        ):
+        """
+        Generator method that yields a mirror engine job for every mirror task
+        of the assemblies in the given data directories that match the given
+        filter. All jobs of an assembly share its loaded metadata and a lock,
+        which is held while a completed task updates and saves the metadata.
+
+        Parameters
+        ----------
+        dataDirs : iterable
+                   The data directories of the assemblies that are mirrored,
+                   relative to the root path of the local database.
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter that mirrored species must match.
+
+        Returns
+        -------
+        ret0 : tuple
+               The remote host of the yielded task and the function running
+               it.
+        """
+        for dataDir in dataDirs:
+            workDir = os.path.join(settings.rootPath,dataDir)
+            if not os.path.isfile(os.path.join(workDir,"metadata.json")):
+                continue
+            meta = self.__loadMeta_(workDir)
+            if not speciesFilter.match(meta["genus"],meta["species"],meta["taxonomy"]["id"]):
+                continue
+            rootName = self.__rootName_(meta)
+            process = self.__processes[meta["process_type"]]
+            lock = threading.Lock()
+            for taskName in process.mirrorTasks():
+                task = self.__tasks[taskName](
+                    dataDir
+                    ,rootName
+                    ,meta["process_data"]
+                    ,meta.get("validators",{}).get(taskName)
+                )
+                yield (
+                    utility.splitUrl(task.url())[1] if task.url() else ""
+                    ,functools.partial(
+                        self.__runMirrorTask_
+                        ,dataDir
+                        ,meta
+                        ,process
+                        ,taskName
+                        ,task
+                        ,lock
+                    )
+                )
+
+
     def __prepareDataDirs_(
         self
         ):
@@ -300,6 +400,34 @@ class Assembly():
             os.makedirs(d,exist_ok=True)
 
 
+    def __readChanges_(
+        self
+        ,paths
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        paths : list
+                Full paths to changeset files written by assembling crawlers.
+
+        Returns
+        -------
+        ret0 : list
+               The unique data directories listed in the given changeset files
+               in the order they are first listed.
+        """
+        ret = {}
+        for path in paths:
+            with open(path,"r") as ifile:
+                for line in ifile:
+                    line = line.strip()
+                    if line:
+                        ret[line] = None
+        return list(ret)
+
+
     def __rootName_(
         self
         ,meta
@@ -326,13 +454,58 @@ class Assembly():
         return re.sub("[\s\\\\/]","_",ret)
 
 
+    def __runMirrorTask_(
+        self
+        ,dataDir
+        ,meta
+        ,process
+        ,taskName
+        ,task
+        ,lock
+        ):
+        """
+        Runs the given mirror task of an assembly, completing it and saving the
+        assembly's metadata while holding the given lock if the task downloaded
+        new data. The remote validators seen by the task are also saved if they
+        changed. Any exception raised by the task is logged.
+
+        Parameters
+        ----------
+        dataDir : string
+                  The data directory of the assembly relative to the root path
+                  of the local database.
+        meta : dictionary
+               The loaded metadata of the assembly.
+        process : pynome.interfaces.AbstractProcess
+                  The process implementation of the assembly.
+        taskName : string
+                   The name of the given task.
+        task : pynome.interfaces.AbstractTask
+               The mirror task that is run.
+        lock : threading.Lock
+               The lock of the assembly shared by all of its mirror tasks.
+        """
+        try:
+            changed = task()
+            with lock:
+                validators = meta.setdefault("validators",{})
+                if changed or validators.get(taskName,{}) != task.validators():
+                    if changed:
+                        process.completeTask(taskName,meta["processed"])
+                    validators[taskName] = task.validators()
+                    self.__saveMeta_(os.path.join(settings.rootPath,dataDir),meta)
+        except Exception as e:
+            core.log.send("("+dataDir+") Task "+taskName+" failed: "+str(e))
+
+
     def __saveMeta_(
         self
         ,workDir
         ,meta
         ):
         """
-        Saves the given assembly metadata to the given working directory.
+        Saves the given assembly metadata to the given working directory,
+        replacing its metadata JSON file atomically.
 
         Parameters
         ----------
@@ -343,5 +516,4 @@ class Assembly():
                The given assembly metadata that is saved to the given working
                directory as JSON.
         """
-        with open(os.path.join(workDir,"metadata.json"),"w") as ofile:
-            return ofile.write(json.dumps(meta,indent=4) + "\n\n")
+        utility.saveJson(os.path.join(workDir,"metadata.json"),meta,indent=4)
@@ -0,0 +1,117 @@
+"""
+Contains the ChecksumOracle class.
+"""
+from . import core
+from . import exceptions
+import ftplib
+import threading
+from . import utility
+
+
+
+
+
+
+
+
+class ChecksumOracle():
+    """
+    This is the singleton checksum oracle class. It answers the checksum an
+    upstream server publishes for a remote file, fetching the checksum manifest
+    of each remote directory once per run with its shared transport and caching
+    it. NCBI publishes MD5 digests in a "md5checksums.txt" file of every
+    assembly directory and ensembl publishes BSD sum checksums and 1024 byte
+    block counts in a "CHECKSUMS" file of every file directory. Manifests are
+    only fetched if the freshness oracle singleton lists them, so directories
+    without one cost no extra request. A manifest that cannot be fetched is
+    treated as missing.
+    """
+    __MANIFESTS = (("md5checksums.txt","md5"),("CHECKSUMS","sum"))
+
+
+    def __init__(
+        self
+        ):
+        """
+        Initializes the singleton checksum oracle instance.
+        """
+        self.__manifests = {}
+        self.__locks = {}
+        self.__lock = threading.Lock()
+
+
+    def expected(
+        self
+        ,url
+        ):
+        """
+        Getter method. The manifest of the remote directory of the given URL is
+        fetched the first time any file in it is requested, concurrent requests
+        for the same directory waiting for that single fetch.
+
+        Parameters
+        ----------
+        url : string
+              The remote URL of a file.
+
+        Returns
+        -------
+        ret0 : tuple
+               The algorithm and expected checksum of the given remote file or
+               None if its directory publishes no checksum for it. The algorithm
+               is "md5" with a hexadecimal digest or "sum" with a string of the
+               BSD sum checksum and block count separated by a space.
+        """
+        (directory,name) = url.rsplit("/",1)
+        with self.__lock:
+            lock = self.__locks.setdefault(directory,threading.Lock())
+        with lock:
+            if directory not in self.__manifests:
+                self.__manifests[directory] = self.__fetch_(directory)
+            return self.__manifests[directory].get(name)
+
+
+    def __fetch_(
+        self
+        ,directory
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        directory : string
+                    The remote URL of a directory without a trailing slash.
+
+        Returns
+        -------
+        ret0 : dictionary
+               The algorithm and expected checksum of every file listed in the
+               checksum manifest of the given directory, keyed by file name.
+               This is empty if the directory has no manifest.
+        """
+        for (name,algorithm) in self.__MANIFESTS:
+            url = directory+"/"+name
+            try:
+                if core.freshness.facts(url) is None:
+                    continue
+                blocks = []
+                core.scheduler.transport(url).retrieve(utility.splitUrl(url)[2],blocks.append)
+            except (exceptions.RemoteError,ftplib.Error,OSError,EOFError) as e:
+                core.log.send("Cannot fetch checksum manifest '"+url+"': "+str(e))
+                continue
+            ret = {}
+            for line in b"".join(blocks).decode("utf-8","replace").splitlines():
+                parts = line.split()
+                if algorithm == "md5" and len(parts) == 2:
+                    path = parts[1][2:] if parts[1].startswith("./") else parts[1]
+                    ret[path] = ("md5",parts[0].lower())
+                elif (
+                    algorithm == "sum"
+                    and len(parts) == 3
+                    and parts[0].isdigit()
+                    and parts[1].isdigit()
+                ):
+                    ret[parts[2]] = ("sum",str(int(parts[0]))+" "+str(int(parts[1])))
+            return ret
+        return {}
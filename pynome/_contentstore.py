@@ -0,0 +1,405 @@
+"""
+Contains the ContentStore class.
+"""
+from . import core
+import hashlib
+import os
+from . import settings
+import shutil
+import threading
+
+
+
+
+
+
+
+
+class ContentStore():
+    """
+    This is the singleton content store class. It deduplicates the files of the
+    local database by their content, keeping a hard link of every distinct
+    finished file in the hidden ".store" directory of the root path named after
+    its SHA-256 digest. A file whose content is already stored is replaced with
+    a hard link to the stored file, so the same genome mirrored from several
+    sources or kept across unchanged releases uses its disk space once.
+    Indexes are stored by the tool and version that built them and the digests
+    of their input files, so an assembly whose inputs are byte identical to an
+    already indexed assembly links that index instead of building it again.
+    Stored files are shared, so files must never be modified in place once
+    they are added. Files that cannot be linked, such as files on another file
+    system, are left as they are. The digest of every added file is also kept
+    in the store by its inode, so it is never read again to compute it.
+    """
+    __DIRECTORY = ".store"
+    __ROOT_NAME = "@"
+
+
+    def __init__(
+        self
+        ):
+        """
+        Initializes the singleton content store instance.
+        """
+        self.__digests = {}
+        self.__lock = threading.Lock()
+
+
+    def add(
+        self
+        ,path
+        ,digest=None
+        ):
+        """
+        Adds the given finished file to this store, replacing it with a hard
+        link to the stored file if its content is already stored. Any error is
+        logged and leaves the given file as it is.
+
+        Parameters
+        ----------
+        path : string
+               The full path to the local file that is added.
+        digest : string
+                 The hexadecimal SHA-256 digest of the given file if it was
+                 computed while the file was written or None to read the file
+                 to compute it.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given file now shares its content with a file that
+               was already stored or false otherwise.
+        """
+        if not settings.deduplicate:
+            return False
+        try:
+            if digest is None:
+                digest = self.digest(path)
+            stored = os.path.join(self.__path_("objects"),digest[:2],digest)
+            os.makedirs(os.path.dirname(stored),exist_ok=True)
+            try:
+                os.link(path,stored)
+                ret = False
+            except FileExistsError:
+                ret = not os.path.samefile(path,stored)
+                if ret:
+                    temp = path+".store"
+                    os.link(stored,temp)
+                    os.replace(temp,path)
+            self.__remember_(path,digest)
+            return ret
+        except OSError as e:
+            core.log.send("Cannot store '"+path+"': "+str(e))
+            return False
+
+
+    def detach(
+        self
+        ,path
+        ):
+        """
+        Removes the given file if it exists, so it can be written again without
+        changing the content it shares with this store and other files.
+
+        Parameters
+        ----------
+        path : string
+               The full path to the local file that is removed.
+        """
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+    def digest(
+        self
+        ,path
+        ):
+        """
+        Getter method. Digests are cached by the inode, size, and modify time
+        of their file, so files linked to the same stored file are read at most
+        once. Files added to this store are never read because their digest is
+        also kept in the store.
+
+        Parameters
+        ----------
+        path : string
+               The full path to a local file.
+
+        Returns
+        -------
+        ret0 : string
+               The hexadecimal SHA-256 digest of the given file's content.
+        """
+        key = self.__key_(os.stat(path))
+        with self.__lock:
+            if key in self.__digests:
+                return self.__digests[key]
+        try:
+            ret = os.readlink(os.path.join(self.__path_("inodes"),key))
+        except OSError:
+            sha = hashlib.sha256()
+            with open(path,"rb") as ifile:
+                while True:
+                    data = ifile.read(settings.downloadBlockSize)
+                    if not data:
+                        break
+                    sha.update(data)
+            ret = sha.hexdigest()
+        with self.__lock:
+            self.__digests[key] = ret
+        return ret
+
+
+    def fetchIndex(
+        self
+        ,key
+        ,path
+        ,rootName
+        ):
+        """
+        Links the stored index with the given key to the given directory,
+        naming its files after the given root name. The given directory must
+        not exist. Any error is logged and removes the given directory again.
+
+        Parameters
+        ----------
+        key : string
+              The key of the index returned by the index key method.
+        path : string
+               The full path to the index directory that is linked.
+        rootName : string
+                   The root name used for all data files of the assembly the
+                   index is linked to.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the stored index was linked or false if it is not
+               stored.
+        """
+        if not settings.deduplicate:
+            return False
+        entry = os.path.join(self.__path_("indexes"),key)
+        if not os.path.isdir(entry):
+            return False
+        try:
+            self.__linkTree_(entry,path,self.__ROOT_NAME,rootName)
+        except OSError as e:
+            core.log.send("Cannot link stored index '"+key+"': "+str(e))
+            shutil.rmtree(path,ignore_errors=True)
+            return False
+        return True
+
+
+    def indexKey(
+        self
+        ,tool
+        ,version
+        ,inputs
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        tool : string
+               The name of the tool that builds the index.
+        version : string
+                  The version of the tool that builds the index.
+        inputs : list
+                 Full paths to the local input files of the index in the order
+                 they are given to the tool.
+
+        Returns
+        -------
+        ret0 : string
+               The key of the index built by the given tool and version from
+               the given input files, which is the same for any input files
+               with identical content.
+        """
+        sha = hashlib.sha256()
+        for path in inputs:
+            sha.update(self.digest(path).encode())
+        return tool+"-"+version+"-"+sha.hexdigest()
+
+
+    def prune(
+        self
+        ):
+        """
+        Removes every stored file that is no longer linked to by the local
+        database, along with its kept digest, and every stored index none of
+        whose files are.
+        """
+        if not settings.deduplicate:
+            return
+        for (directory,dirs,files) in os.walk(self.__path_("objects")):
+            for name in files:
+                path = os.path.join(directory,name)
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+        inodes = self.__path_("inodes")
+        if os.path.isdir(inodes):
+            for key in os.listdir(inodes):
+                entry = os.path.join(inodes,key)
+                digest = os.readlink(entry)
+                try:
+                    current = self.__key_(
+                        os.stat(os.path.join(self.__path_("objects"),digest[:2],digest))
+                    )
+                except FileNotFoundError:
+                    current = None
+                if current != key:
+                    os.remove(entry)
+        indexes = self.__path_("indexes")
+        if os.path.isdir(indexes):
+            for key in os.listdir(indexes):
+                entry = os.path.join(indexes,key)
+                if all(
+                    os.stat(os.path.join(d,f)).st_nlink == 1
+                    for (d,ds,fs) in os.walk(entry) for f in fs
+                ):
+                    shutil.rmtree(entry,ignore_errors=True)
+
+
+    def saveIndex(
+        self
+        ,key
+        ,path
+        ,rootName
+        ):
+        """
+        Stores the given finished index directory with the given key, linking
+        its files so they share their content with the stored index. Any error
+        is logged and leaves the index unstored.
+
+        Parameters
+        ----------
+        key : string
+              The key of the index returned by the index key method.
+        path : string
+               The full path to the index directory that is stored.
+        rootName : string
+                   The root name used for all data files of the assembly the
+                   index was built for.
+        """
+        if not settings.deduplicate:
+            return
+        indexes = self.__path_("indexes")
+        if os.path.isdir(os.path.join(indexes,key)):
+            return
+        temp = None
+        try:
+            os.makedirs(indexes,exist_ok=True)
+            temp = os.path.join(indexes,"."+os.urandom(6).hex())
+            os.mkdir(temp)
+            self.__linkTree_(path,temp,rootName,self.__ROOT_NAME)
+            os.rename(temp,os.path.join(indexes,key))
+        except OSError as e:
+            core.log.send("Cannot store index '"+key+"': "+str(e))
+            if temp:
+                shutil.rmtree(temp,ignore_errors=True)
+
+
+    def __key_(
+        self
+        ,st
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        st : os.stat_result
+             The status of a local file.
+
+        Returns
+        -------
+        ret0 : string
+               The key of the digest of the given file, made of its device,
+               inode, size, and modify time.
+        """
+        return "%d-%d-%d-%d" % (st.st_dev,st.st_ino,st.st_size,st.st_mtime_ns)
+
+
+    def __linkTree_(
+        self
+        ,source
+        ,destination
+        ,old
+        ,new
+        ):
+        """
+        Links all files of the given source directory tree to the same relative
+        paths of the given destination directory, renaming files that start
+        with the given old prefix to start with the given new prefix instead.
+
+        Parameters
+        ----------
+        source : string
+                 The full path to the directory whose files are linked.
+        destination : string
+                      The full path to the directory the files are linked to.
+        old : string
+              The prefix of file names that is replaced.
+        new : string
+              The prefix replacing the old prefix of file names.
+        """
+        for (directory,dirs,files) in os.walk(source):
+            target = os.path.normpath(os.path.join(destination,os.path.relpath(directory,source)))
+            os.makedirs(target,exist_ok=True)
+            for name in files:
+                if name.startswith(old):
+                    linked = new+name[len(old):]
+                else:
+                    linked = name
+                os.link(os.path.join(directory,name),os.path.join(target,linked))
+
+
+    def __path_(
+        self
+        ,name
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        name : string
+               The name of a directory of this store.
+
+        Returns
+        -------
+        ret0 : string
+               The full path to the given directory of this store under the
+               root path of the local database.
+        """
+        return os.path.join(settings.rootPath,self.__DIRECTORY,name)
+
+
+    def __remember_(
+        self
+        ,path
+        ,digest
+        ):
+        """
+        Keeps the given digest of the given file added to this store, in
+        memory and in this store, so the file is never read to compute it.
+
+        Parameters
+        ----------
+        path : string
+               The full path to a local file added to this store.
+        digest : string
+                 The hexadecimal SHA-256 digest of the given file.
+        """
+        key = self.__key_(os.stat(path))
+        with self.__lock:
+            self.__digests[key] = digest
+        os.makedirs(self.__path_("inodes"),exist_ok=True)
+        try:
+            os.symlink(digest,os.path.join(self.__path_("inodes"),key))
+        except FileExistsError:
+            pass
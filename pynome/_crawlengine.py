@@ -0,0 +1,210 @@
+"""
+Contains the CrawlEngine class.
+"""
+import json
+import os
+import queue
+from . import settings
+import threading
+import time
+from . import utility
+
+
+
+
+
+
+
+
+class CrawlEngine():
+    """
+    This is the crawl engine class. It crawls a remote directory tree using a
+    work queue of directories that are listed concurrently by worker threads,
+    one worker for each connection of the transport it is given. What is done
+    with each listing is decided by a visit function given to the crawl method,
+    which is always called from the thread that called crawl so it does not
+    have to be thread safe.
+    """
+
+
+    def __init__(
+        self
+        ,transport
+        ):
+        """
+        Initializes a new crawl engine.
+
+        Parameters
+        ----------
+        transport : pynome.interfaces.AbstractTransport
+                    The transport used for listing remote directories, whose
+                    size determines the number of directories listed
+                    concurrently.
+        """
+        super().__init__()
+        self.__transport = transport
+        self.__work = queue.Queue()
+        self.__done = queue.Queue()
+
+
+    def crawl(
+        self
+        ,items
+        ,visit
+        ,results
+        ,checkpoint=""
+        ):
+        """
+        Crawls the remote directory tree starting with the given items until no
+        more items are returned by the given visit function. Directory listings
+        are requests made by the transport through the scheduler singleton, so
+        any listing that fails with a connection error is retried with
+        backoff. A listing that still fails stops the crawl with a remote
+        error. If a checkpoint path is given, the frontier of pending work
+        items and the results are saved to it at intervals set by the
+        checkpoint interval setting and when the crawl is interrupted. If that
+        checkpoint exists when a crawl starts, the crawl resumes from it instead
+        of the given items and results. The checkpoint is removed once the
+        crawl is complete.
+
+        Parameters
+        ----------
+        items : list
+                Work items that are crawled first. Each item is a tuple whose
+                first element is the remote directory path that is listed and
+                whose remaining elements are left to the visit function. Items
+                must be JSON compatible if a checkpoint is used.
+        visit : function
+                Called with the given results, a work item, and the listing of
+                that item's directory as returned by the transport's list
+                method. It must return a list of new work items that are crawled
+                in turn.
+        results : object
+                  The results object passed to every call of the visit function.
+                  This must be JSON compatible if a checkpoint is used.
+        checkpoint : string
+                     The full path of this crawl's checkpoint file or an empty
+                     string to not use a checkpoint.
+
+        Returns
+        -------
+        ret0 : object
+               The given results object or the results object of the resumed
+               checkpoint.
+        """
+        if checkpoint and os.path.isfile(checkpoint):
+            with open(checkpoint,"r") as ifile:
+                state = json.loads(ifile.read())
+            items = [tuple(item) for item in state["frontier"]]
+            results = state["results"]
+        workers = [
+            threading.Thread(target=self.__work_,daemon=True)
+            for i in range(self.__transport.size())
+        ]
+        for worker in workers:
+            worker.start()
+        frontier = {}
+        complete = False
+        saved = time.monotonic()
+        try:
+            for item in items:
+                self.__put_(frontier,item)
+            while frontier:
+                (item,listing,error) = self.__done.get()
+                if error is not None:
+                    raise error
+                for child in visit(results,item,listing):
+                    self.__put_(frontier,child)
+                frontier[item] -= 1
+                if not frontier[item]:
+                    del frontier[item]
+                if checkpoint and time.monotonic()-saved >= settings.checkpointInterval:
+                    self.__save_(checkpoint,frontier,results)
+                    saved = time.monotonic()
+            complete = True
+        finally:
+            while not self.__work.empty():
+                try:
+                    self.__work.get_nowait()
+                except queue.Empty:
+                    break
+            for worker in workers:
+                self.__work.put(None)
+            for worker in workers:
+                worker.join()
+            self.__done = queue.Queue()
+            if checkpoint:
+                if complete:
+                    if os.path.isfile(checkpoint):
+                        os.remove(checkpoint)
+                else:
+                    self.__save_(checkpoint,frontier,results)
+        return results
+
+
+    def __put_(
+        self
+        ,frontier
+        ,item
+        ):
+        """
+        Adds the given work item to the given frontier and this engine's work
+        queue.
+
+        Parameters
+        ----------
+        frontier : dictionary
+                   The pending work items of a crawl, mapped to how many times
+                   each item is pending.
+        item : tuple
+               The work item that is added.
+        """
+        frontier[item] = frontier.get(item,0) + 1
+        self.__work.put(item)
+
+
+    def __save_(
+        self
+        ,path
+        ,frontier
+        ,results
+        ):
+        """
+        Saves a checkpoint of a crawl with the given frontier and results to the
+        given path.
+
+        Parameters
+        ----------
+        path : string
+               The full path of the checkpoint file.
+        frontier : dictionary
+                   The pending work items of the crawl, mapped to how many
+                   times each item is pending.
+        results : object
+                  The JSON compatible results of the crawl.
+        """
+        utility.saveJson(
+            path
+            ,{
+                "frontier": [item for (item,count) in frontier.items() for i in range(count)]
+                ,"results": results
+            }
+        )
+
+
+    def __work_(
+        self
+        ):
+        """
+        Worker thread function that lists directories of work items taken from
+        this engine's work queue until it is given None.
+        """
+        while True:
+            item = self.__work.get()
+            if item is None:
+                break
+            try:
+                listing = self.__transport.list(item[0])
+                self.__done.put((item,listing,None))
+            except Exception as error:
+                self.__done.put((item,None,error))
@@ -3,7 +3,6 @@ Contains the DownloadCDNATask class.
 """
 from . import interfaces
 import os
-import subprocess
 from . import utility
 
 
@@ -16,7 +15,9 @@ from . import utility
 class DownloadCDNATask(interfaces.AbstractTask):
     """
     This is the download CDNA task. It implements the abstract task interface.
-    This synchronizes the remote CDNA Fasta file with the local assembly.
+    This synchronizes the remote CDNA Fasta file with the local assembly,
+    decompressing it while it is downloaded and adding it to the content store
+    singleton.
     """
 
 
@@ -33,13 +34,13 @@ class DownloadCDNATask(interfaces.AbstractTask):
         """
         self._log_("Syncing CDNA")
         fullPath = os.path.join(self._workDir_(),self._rootName_()+".cdna.fa")
-        if utility.rSync(self._meta_()["cdna"],fullPath+".gz",compare=fullPath):
-            self._log_("Decompressing CDNA")
-            cmd = ["gunzip",fullPath+".gz"]
-            assert(subprocess.run(cmd).returncode==0)
-            return True
-        else:
-            return False
+        return utility.rSync(
+            self._meta_()["cdna"]
+            ,fullPath
+            ,validators=self.validators()
+            ,decompress=True
+            ,store=True
+        )
 
 
     def name(
@@ -54,3 +55,17 @@ class DownloadCDNATask(interfaces.AbstractTask):
                See interface docs.
         """
         return "download_cdna"
+
+
+    def url(
+        self
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTask interface.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        return self._meta_().get("cdna","")
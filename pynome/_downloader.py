@@ -0,0 +1,630 @@
+"""
+Contains the Downloader class.
+"""
+import concurrent.futures
+from . import core
+from . import exceptions
+import ftplib
+import hashlib
+import json
+import os
+from . import settings
+import subprocess
+import threading
+import time
+from . import utility
+import zlib
+
+
+
+
+
+
+
+
+class Downloader():
+    """
+    This is the downloader class. It downloads a single remote file to a local
+    path, streaming it from the shared transport of its URL with large buffered
+    writes and replacing the local path only once the download is complete. The
+    downloaded data is kept in a ".part" file next to the local path, with a
+    ".part.json" file of the size and modify time of the remote file. An
+    interrupted download is resumed from its partial file the next time it is
+    run if the remote file still has the same size and modify time. Remote files
+    at least as large as the segment threshold setting that are not decompressed
+    are downloaded as byte range segments over several connections at once,
+    written in place to a preallocated partial file whose progress is saved at
+    checkpoint intervals, and then read back once to be hashed and verified.
+    Conditional downloads are never segmented. Gzip compressed files can be
+    decompressed on the fly as their data arrives into a temporary file that
+    replaces the local path. Their compressed data is only kept in a partial
+    file if the resume decompressed setting is enabled, in which case a resumed
+    download decompresses the partial data again locally. The MD5 digest of the
+    downloaded data, before any decompression, and the SHA-256 digest of the
+    local file, after any decompression, are computed while it is written, and
+    an expected upstream checksum is verified against the data as it streams,
+    piping it to the BSD sum command for sum checksums. Progress is given to an
+    optional callback and sent to the logging system for long downloads, and the
+    throughput of every finished download is added to the counters of its host
+    kept by the scheduler singleton. Transfers that receive no data for longer
+    than the stall timeout setting are aborted by the socket timeout of their
+    connection and resumed by the retries of the scheduler singleton. A download
+    that still fails raises a download error, keeping its partial file unless
+    its data is corrupt.
+    """
+
+
+    def __init__(
+        self
+        ,url
+        ,progress=None
+        ,decompress=False
+        ,checksum=None
+        ):
+        """
+        Initializes a new downloader.
+
+        Parameters
+        ----------
+        url : string
+              The remote FTP or HTTP(S) URL of the file this new downloader
+              downloads.
+        progress : function
+                   Optional callback called with the number of bytes received
+                   so far and the seconds elapsed after every block of data.
+        decompress : bool
+                     True to decompress the remote file, which must be gzip
+                     compressed with one or more members, while it is
+                     downloaded or false to write it unchanged.
+        checksum : tuple
+                   Optional algorithm and expected checksum of the remote file
+                   as returned by the checksum oracle singleton, which the
+                   downloaded data must match.
+        """
+        super().__init__()
+        self.__url = url
+        self.__progress = progress
+        self.__offset = 0
+        self.__received = 0
+        self.__logged = 0.0
+        self.__digest = hashlib.md5()
+        self.__content = hashlib.sha256() if settings.deduplicate else None
+        self.__inflater = zlib.decompressobj(16+zlib.MAX_WBITS) if decompress else None
+        self.__checksum = checksum
+        self.__summer = None
+
+
+    def contentDigest(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : string
+               The hexadecimal SHA-256 digest of the local file written by this
+               downloader, after any decompression, or None if the
+               deduplicate setting is disabled.
+        """
+        return None if self.__content is None else self.__content.hexdigest()
+
+
+    def digest(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : string
+               The hexadecimal MD5 digest of the data downloaded by this
+               downloader.
+        """
+        return self.__digest.hexdigest()
+
+
+    def run(
+        self
+        ,path
+        ,validators=None
+        ):
+        """
+        Downloads this downloader's remote file to the given local path. If
+        validators are given then the file is only downloaded if it changed
+        compared with them, using a conditional request if its transport
+        supports them. A checksum error is raised and the local path is left
+        unchanged if the downloaded data does not match the expected checksum
+        of this downloader. Conditional downloads are never segmented. Each
+        downloader must only be run once.
+
+        Parameters
+        ----------
+        path : string
+               The full path to the local file that is replaced with the
+               downloaded remote file.
+        validators : dictionary
+                     The last seen validators of the remote file in the same
+                     format as the validators of tasks.
+
+        Returns
+        -------
+        ret0 : dictionary
+               Any validators of the remote file reported by its server while
+               downloading it or None if it was not downloaded because it has
+               not changed.
+        """
+        transport = core.scheduler.transport(self.__url)
+        partPath = path+".part"
+        statePath = partPath+".json"
+        facts = self.__facts_() if validators is None else None
+        segmented = (
+            not self.__inflater
+            and facts is not None
+            and facts["size"] >= settings.segmentThreshold
+            and min(settings.segmentCount,transport.size()) > 1
+        )
+        resumable = not self.__inflater or settings.resumeDecompressed
+        if self.__checksum is not None and self.__checksum[0] == "sum":
+            try:
+                self.__summer = subprocess.Popen(
+                    ["sum"]
+                    ,stdin=subprocess.PIPE
+                    ,stdout=subprocess.PIPE
+                    ,stderr=subprocess.DEVNULL
+                )
+            except OSError:
+                self.__checksum = None
+        start = time.monotonic()
+        outPath = None
+        keep = False
+        try:
+            out = None
+            try:
+                if self.__inflater:
+                    (out,outPath) = utility.createTemp(path,"wb",settings.downloadBlockSize)
+                if segmented:
+                    try:
+                        ret = self.__segment_(transport,partPath,statePath,facts,start)
+                    except exceptions.RangeError as e:
+                        core.log.send(str(e)+", downloading it as a single stream.")
+                        for p in (partPath,statePath):
+                            if os.path.exists(p):
+                                os.remove(p)
+                        segmented = False
+                if segmented:
+                    with open(partPath,"rb") as ifile:
+                        for block in iter(lambda: ifile.read(settings.downloadBlockSize),b""):
+                            self.__feed_(block,None)
+                else:
+                    ret = self.__stream_(
+                        transport
+                        ,partPath
+                        ,statePath
+                        ,out
+                        ,validators
+                        ,resumable
+                        ,start
+                    )
+            except exceptions.DownloadError as e:
+                keep = resumable and not isinstance(e.__cause__,zlib.error)
+                raise
+            except zlib.error as e:
+                raise exceptions.DownloadError(self.__url,self.__received,str(e)) from e
+            except (exceptions.RemoteError,ftplib.Error,OSError,EOFError) as e:
+                keep = resumable and not isinstance(e,ftplib.error_perm)
+                raise exceptions.DownloadError(self.__url,self.__received,str(e)) from e
+            finally:
+                if out is not None:
+                    out.close()
+            if ret is not None and self.__inflater and not self.__inflater.eof:
+                raise exceptions.DownloadError(
+                    self.__url
+                    ,self.__received
+                    ,"compressed data ended before the end of its stream"
+                )
+            if ret is not None:
+                self.__verify_()
+                os.replace(outPath if self.__inflater else partPath,path)
+        finally:
+            if self.__summer is not None and self.__summer.poll() is None:
+                self.__summer.kill()
+                self.__summer.wait()
+            if outPath is not None and os.path.exists(outPath):
+                os.remove(outPath)
+            if not keep:
+                for p in (partPath,statePath):
+                    if os.path.exists(p):
+                        os.remove(p)
+        if ret is not None:
+            core.scheduler.recordDownload(
+                transport.host()
+                ,self.__received-self.__offset
+                ,time.monotonic()-start
+            )
+        return ret
+
+
+    def __advance_(
+        self
+        ,size
+        ,start
+        ):
+        """
+        Adds the given number of newly received bytes to this downloader,
+        giving its progress to its callback and sending it to the logging
+        system if the progress interval setting has passed since it was last
+        sent.
+
+        Parameters
+        ----------
+        size : int
+               The number of bytes received.
+        start : float
+                The monotonic time the download started.
+        """
+        self.__received += size
+        now = time.monotonic()
+        if self.__progress is not None:
+            self.__progress(self.__received,now-start)
+        if now-self.__logged >= settings.progressInterval:
+            self.__logged = now
+            core.log.send(
+                "Downloaded %.1f MiB of '%s' at %.2f MiB/s"
+                % (
+                    self.__received/1048576
+                    ,self.__url
+                    ,(self.__received-self.__offset)/1048576/max(now-start,1e-6)
+                )
+            )
+
+
+    def __facts_(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : dictionary
+               The size and modify time of this downloader's remote file, as
+               answered by the freshness oracle singleton, or None if either is
+               unknown.
+        """
+        try:
+            facts = core.freshness.facts(self.__url)
+        except (exceptions.RemoteError,ftplib.Error,OSError,EOFError):
+            return None
+        if facts is None or facts["size"] is None or not facts["modify"]:
+            return None
+        return {"url": self.__url, "size": facts["size"], "modify": facts["modify"]}
+
+
+    def __feed_(
+        self
+        ,data
+        ,out
+        ):
+        """
+        Feeds the given block of this downloader's remote file to its digest,
+        its sum command, and its decompressor, and the data written to the
+        local file to its content digest.
+
+        Parameters
+        ----------
+        data : bytes
+               The next block of data of the remote file.
+        out : file
+              The file the decompressed data is written to or None if this
+              downloader does not decompress.
+        """
+        self.__digest.update(data)
+        if self.__summer is not None:
+            self.__summer.stdin.write(data)
+        if out is not None:
+            data = self.__inflate_(data)
+            out.write(data)
+        if self.__content is not None:
+            self.__content.update(data)
+
+
+    def __inflate_(
+        self
+        ,data
+        ):
+        """
+        Getter method. A new decompressor is started for every gzip member
+        following the end of the previous one.
+
+        Parameters
+        ----------
+        data : bytes
+               The next block of gzip compressed data of this downloader's
+               remote file.
+
+        Returns
+        -------
+        ret0 : bytes
+               The decompressed data of the given block.
+        """
+        ret = []
+        while data:
+            if self.__inflater.eof:
+                self.__inflater = zlib.decompressobj(16+zlib.MAX_WBITS)
+            ret.append(self.__inflater.decompress(data))
+            data = self.__inflater.unused_data
+        return b"".join(ret)
+
+
+    def __loadState_(
+        self
+        ,partPath
+        ,statePath
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        partPath : string
+                   The path of a partial file of this downloader.
+        statePath : string
+                    The path of the state file of the given partial file.
+
+        Returns
+        -------
+        ret0 : dictionary
+               The saved state of the given partial file or None if either file
+               does not exist or the state cannot be read, in which case both
+               files are removed.
+        """
+        if os.path.isfile(partPath) and os.path.isfile(statePath):
+            try:
+                with open(statePath,"r") as ifile:
+                    return json.loads(ifile.read())
+            except (OSError,ValueError):
+                pass
+        for path in (partPath,statePath):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+
+
+    def __resume_(
+        self
+        ,partPath
+        ,statePath
+        ):
+        """
+        Getter method. The given partial file and its state file are removed
+        if the partial file cannot be resumed.
+
+        Parameters
+        ----------
+        partPath : string
+                   The path of the partial file of this downloader.
+        statePath : string
+                    The path of the state file of the given partial file.
+
+        Returns
+        -------
+        ret0 : int
+               The size of the given partial file if it can be resumed because
+               it is smaller than the remote file and its state matches the
+               current size and modify time of the remote file, or zero
+               otherwise.
+        """
+        state = self.__loadState_(partPath,statePath)
+        if state is not None:
+            facts = self.__facts_()
+            size = os.path.getsize(partPath)
+            if facts is not None and state == facts and 0 < size < facts["size"]:
+                core.log.send(
+                    "Resuming '%s' from %.1f MiB" % (self.__url,size/1048576)
+                )
+                return size
+        for path in (partPath,statePath):
+            if os.path.exists(path):
+                os.remove(path)
+        return 0
+
+
+    def __segment_(
+        self
+        ,transport
+        ,partPath
+        ,statePath
+        ,facts
+        ,start
+        ):
+        """
+        Downloads this downloader's remote file to the given partial file as
+        byte range segments retrieved concurrently, one connection each, and
+        written in place to the partial file, which is preallocated to the size
+        of the remote file. The progress of every segment is saved to the given
+        state file at intervals set by the checkpoint interval setting and once
+        they are all done or any of them fails, syncing the partial file to disk
+        first, so an interrupted or killed download resumes each segment where
+        it stopped.
+
+        Parameters
+        ----------
+        transport : pynome.interfaces.AbstractTransport
+                    The shared transport of this downloader's remote file.
+        partPath : string
+                   The path of the partial file.
+        statePath : string
+                   The path of the state file of the given partial file.
+        facts : dictionary
+                The size and modify time of the remote file as returned by the
+                facts method.
+        start : float
+                The monotonic time the download started.
+
+        Returns
+        -------
+        ret0 : dictionary
+               Any validators of the remote file reported by its server while
+               retrieving the segments.
+        """
+        size = facts["size"]
+        segments = None
+        state = self.__loadState_(partPath,statePath)
+        if state is not None and os.path.getsize(partPath) == size:
+            segments = state.pop("segments",None)
+            if state != facts:
+                segments = None
+        if segments is None:
+            count = min(settings.segmentCount,transport.size())
+            step = -(-size//count)
+            segments = [[s,min(step,size-s),0] for s in range(0,size,step)]
+            fd = os.open(partPath,os.O_RDWR|os.O_CREAT|os.O_TRUNC,0o666)
+            try:
+                os.posix_fallocate(fd,0,size)
+            except (AttributeError,OSError):
+                os.ftruncate(fd,size)
+        else:
+            fd = os.open(partPath,os.O_RDWR)
+            core.log.send(
+                "Resuming '%s' from %.1f MiB"
+                % (self.__url,sum(s[2] for s in segments)/1048576)
+            )
+        utility.saveJson(statePath,dict(facts,segments=segments))
+        self.__offset = sum(s[2] for s in segments)
+        self.__received = self.__offset
+        self.__logged = start
+        remotePath = utility.splitUrl(self.__url)[2]
+        lock = threading.Lock()
+        saved = [time.monotonic()]
+        def save():
+            os.fsync(fd)
+            utility.saveJson(statePath,dict(facts,segments=segments))
+            saved[0] = time.monotonic()
+        def fetch(segment):
+            def write(data):
+                os.pwrite(fd,data,segment[0]+segment[2])
+                with lock:
+                    segment[2] += len(data)
+                    self.__advance_(len(data),start)
+                    if time.monotonic()-saved[0] >= settings.checkpointInterval:
+                        save()
+            if segment[2] < segment[1]:
+                return transport.retrieveRange(
+                    remotePath
+                    ,write
+                    ,segment[0]+segment[2]
+                    ,segment[1]-segment[2]
+                )
+            return {}
+        ret = {}
+        try:
+            with concurrent.futures.ThreadPoolExecutor(len(segments)) as executor:
+                futures = [executor.submit(fetch,segment) for segment in segments]
+                for future in futures:
+                    ret.update(future.result())
+        finally:
+            try:
+                with lock:
+                    save()
+            finally:
+                os.close(fd)
+        return ret
+
+
+    def __stream_(
+        self
+        ,transport
+        ,partPath
+        ,statePath
+        ,out
+        ,validators
+        ,resumable
+        ,start
+        ):
+        """
+        Downloads this downloader's remote file as a single stream, writing its
+        data to the given partial file if it is resumable and feeding it to
+        this downloader as it arrives.
+
+        Parameters
+        ----------
+        transport : pynome.interfaces.AbstractTransport
+                    The shared transport of this downloader's remote file.
+        partPath : string
+                   The path of the partial file.
+        statePath : string
+                   The path of the state file of the given partial file.
+        out : file
+              The file the decompressed data is written to or None if this
+              downloader does not decompress.
+        validators : dictionary
+                     The last seen validators of the remote file given to the
+                     run method.
+        resumable : bool
+                    True to keep the downloaded data in the given partial file
+                    or false otherwise.
+        start : float
+                The monotonic time the download started.
+
+        Returns
+        -------
+        ret0 : dictionary
+               Any validators of the remote file reported by its server while
+               downloading it or None if it was not downloaded because it has
+               not changed.
+        """
+        offset = self.__resume_(partPath,statePath) if resumable else 0
+        if resumable and not offset:
+            facts = self.__facts_()
+            if facts is not None:
+                utility.saveJson(statePath,facts)
+        self.__offset = offset
+        self.__received = offset
+        self.__logged = start
+        raw = None
+        try:
+            if resumable:
+                raw = open(partPath,"ab" if offset else "wb",buffering=settings.downloadBlockSize)
+            if offset:
+                with open(partPath,"rb") as ifile:
+                    for block in iter(lambda: ifile.read(settings.downloadBlockSize),b""):
+                        self.__feed_(block,out)
+            def write(data):
+                if raw is not None:
+                    raw.write(data)
+                self.__feed_(data,out)
+                self.__advance_(len(data),start)
+            return transport.retrieve(
+                utility.splitUrl(self.__url)[2]
+                ,write
+                ,offset
+                ,None if offset else validators
+            )
+        finally:
+            if raw is not None:
+                raw.close()
+
+
+    def __verify_(
+        self
+        ):
+        """
+        Verifies the data downloaded by this downloader matches its expected
+        checksum, if it has one, raising a checksum error if it does not.
+        """
+        if self.__checksum is None:
+            return
+        (algorithm,expected) = self.__checksum
+        if algorithm == "md5":
+            actual = self.__digest.hexdigest()
+        else:
+            output = self.__summer.communicate()[0].split()
+            actual = " ".join(str(int(v)) for v in output[:2])
+        if actual != expected:
+            raise exceptions.ChecksumError(
+                self.__url
+                ,self.__received
+                ,algorithm+" checksum "+actual+" does not match expected "+expected
+            )
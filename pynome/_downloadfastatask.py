@@ -3,7 +3,6 @@ Contains the DownloadFastaTask class.
 """
 from . import interfaces
 import os
-import subprocess
 from . import utility
 
 
@@ -16,7 +15,9 @@ from . import utility
 class DownloadFastaTask(interfaces.AbstractTask):
     """
     This is the download Fasta task. It implements the abstract task interface.
-    This synchronizes the remote Fasta file with the local assembly.
+    This synchronizes the remote Fasta file with the local assembly,
+    decompressing it while it is downloaded and adding it to the content store
+    singleton.
     """
 
 
@@ -33,13 +34,13 @@ class DownloadFastaTask(interfaces.AbstractTask):
         """
         self._log_("Syncing FASTA")
         fullPath = os.path.join(self._workDir_(),self._rootName_()+".fa")
-        if utility.rSync(self._meta_()["fasta"],fullPath+".gz",compare=fullPath):
-            self._log_("Decompressing FASTA")
-            cmd = ["gunzip",fullPath+".gz"]
-            assert(subprocess.run(cmd).returncode==0)
-            return True
-        else:
-            return False
+        return utility.rSync(
+            self._meta_()["fasta"]
+            ,fullPath
+            ,validators=self.validators()
+            ,decompress=True
+            ,store=True
+        )
 
 
     def name(
@@ -54,3 +55,17 @@ class DownloadFastaTask(interfaces.AbstractTask):
                See interface docs.
         """
         return "download_fasta"
+
+
+    def url(
+        self
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTask interface.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        return self._meta_().get("fasta","")
@@ -3,7 +3,6 @@ Contains the DownloadGtfTask class.
 """
 from . import interfaces
 import os
-import subprocess
 from . import utility
 
 
@@ -16,8 +15,10 @@ from . import utility
 class DownloadGtfTask(interfaces.AbstractTask):
     """
     This is the download Gtf task. It implements the abstract task interface.
-    This synchronizes the remote Gtf file with the local assembly. If the Gtf
-    URL entry in the metadata is empty then this does nothing.
+    This synchronizes the remote Gtf file with the local assembly,
+    decompressing it while it is downloaded and adding it to the content store
+    singleton. If the Gtf URL entry in the metadata is empty then this does
+    nothing.
     """
 
 
@@ -36,13 +37,13 @@ class DownloadGtfTask(interfaces.AbstractTask):
             return False
         self._log_("Syncing GTF")
         fullPath = os.path.join(self._workDir_(),self._rootName_()+".gtf")
-        if utility.rSync(self._meta_()["gtf"],fullPath+".gz",compare=fullPath):
-            self._log_("Decompressing GTF")
-            cmd = ["gunzip",fullPath+".gz"]
-            assert(subprocess.run(cmd).returncode==0)
-            return True
-        else:
-            return False
+        return utility.rSync(
+            self._meta_()["gtf"]
+            ,fullPath
+            ,validators=self.validators()
+            ,decompress=True
+            ,store=True
+        )
 
 
     def name(
@@ -57,3 +58,17 @@ class DownloadGtfTask(interfaces.AbstractTask):
                See interface docs.
         """
         return "download_gtf"
+
+
+    def url(
+        self
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTask interface.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        return self._meta_().get("gtf","")
@@ -2,9 +2,11 @@
 Contains the EnsemblCrawler class.
 """
 from . import core
-import ftplib
 from . import interfaces
-import socket
+import json
+import os
+from . import settings
+from . import utility
 
 
 
@@ -16,12 +18,16 @@ import socket
 class EnsemblCrawler(interfaces.AbstractCrawler):
     """
     This is the ensembl crawler class. It implements the abstract crawler
-    interface. The remote database is crawled directly through its ftp server to
-    find all valid entries. All information can be found within those
+    interface. The remote database is crawled directly through its FTP or HTTPS
+    server to find all valid entries. All information can be found within those
     directories except for the taxonomy ID. The taxonomy ID is found in a
     special text file located in the root public folder.
     """
     __CDNA_EXTENSION = ".cdna.all.fa.gz"
+    __CHECKPOINT_BASENAME = "checkpoint-"
+    __COLLECTION_SUFFIX = "_collection"
+    _DIVISIONS = ("",)
+    __DIVISION_PREFIX = "Ensembl"
     _FTP_FASTA_DIR = "/fasta"
     _FTP_GFF_DIR = "/gff3"
     _FTP_HOST = "ftp.ensembl.org"
@@ -31,6 +37,7 @@ class EnsemblCrawler(interfaces.AbstractCrawler):
     __FASTA_EXTENSION = ".dna.toplevel.fa.gz"
     __FTP_IGNORED_DIRS = ["cds","dna_index","ncrna","pep"]
     __GFF_EXTENSION = ".gff3.gz"
+    __LISTING_BASENAME = "listing-"
 
 
     def __init__(
@@ -40,53 +47,52 @@ class EnsemblCrawler(interfaces.AbstractCrawler):
         Initializes a new ensembl crawler.
         """
         super().__init__()
-        self.__ftp = None
-        self.__text = ""
+        self.__transport = None
         self.__taxIds = {}
+        self.__speciesDirs = {}
 
 
     def crawl(
         self
-        ,species=""
+        ,speciesFilter
         ):
         """
         Implements the pynome.interfaces.AbstractCrawler interface.
 
         Parameters
         ----------
-        species : object
-                  See interface docs.
+        speciesFilter : object
+                        See interface docs.
         """
         self._connect_()
-        releaseVersion = self._latestRelease_()
-        if releaseVersion:
-            self._log_("Loading taxonomy ...")
-            self._getTaxonomyIds_(
-                self._FTP_ROOT_DIR
-                + "/"
-                + self._FTP_RELEASE_BASENAME
-                + str(releaseVersion)
-            )
-            self._log_("Crawling FASTA ...")
-            (fasta,cdna) = self._crawlFasta_(
-                self._FTP_ROOT_DIR
-                + "/"
-                + self._FTP_RELEASE_BASENAME
-                + str(releaseVersion)
-                + self._FTP_FASTA_DIR
-                ,species
-            )
-            self._log_("Crawling GFF ...")
-            gff = self._crawlGff_(
-                self._FTP_ROOT_DIR
-                + "/"
-                + self._FTP_RELEASE_BASENAME
-                + str(releaseVersion)
-                + self._FTP_GFF_DIR
-                ,species
-                ,releaseVersion
-            )
-            self._mergeResults_(fasta,cdna,gff)
+        try:
+            releaseVersion = self._latestRelease_()
+            if releaseVersion:
+                releaseDir = (
+                    self._FTP_ROOT_DIR
+                    + "/"
+                    + self._FTP_RELEASE_BASENAME
+                    + str(releaseVersion)
+                )
+                self._log_("Loading taxonomy ...")
+                self._getTaxonomyIds_(releaseDir)
+                listing = None
+                if not settings.recrawl:
+                    listing = self.__loadListing_(releaseVersion)
+                if listing is None:
+                    self._log_("Crawling release "+str(releaseVersion)+" ...")
+                    (fasta,cdna,gff) = self._crawlRelease_(releaseDir,speciesFilter,releaseVersion)
+                    if speciesFilter.isEmpty():
+                        self.__saveListing_(releaseVersion,fasta,cdna,gff)
+                else:
+                    self._log_("Loading cached listing of release "+str(releaseVersion)+" ...")
+                    (fasta,cdna,gff) = (
+                        {k: v for (k,v) in l.items() if self.__matches_(k,speciesFilter)}
+                        for l in listing
+                    )
+                self._mergeResults_(fasta,cdna,gff)
+        finally:
+            self._disconnect_()
 
 
     def name(
@@ -107,148 +113,94 @@ class EnsemblCrawler(interfaces.AbstractCrawler):
         self
         ):
         """
-        Connects this crawler to the ensembl FTP server, continuously retrying a
-        connection until one is made successfully.
+        Connects this crawler to the ensembl server, getting the shared
+        transport of its host selected for this crawler. All requests made with
+        the transport go through the scheduler singleton, so connections are
+        only opened as they are needed and failed requests are retried with
+        backoff.
         """
-        while True:
-            try:
-                self.__ftp = ftplib.FTP(self._FTP_HOST,timeout=10)
-                self.__ftp.login()
-            except ftplib.all_errors:
-                pass
-            else:
-                break
+        self.__transport = self._transport_(self._FTP_HOST)
 
 
-    def _crawlFasta_(
+    def _crawlRelease_(
         self
         ,directory
-        ,species
-        ,depth=0
+        ,speciesFilter
+        ,version
         ):
         """
-        Recursively crawls the given directory, calling this method on any
-        subdirectories found. If the FTP connection is lost this crawler's
-        connect method is called to reconnect and continue without interruption.
+        Crawls the FASTA and GFF3 directories of all divisions of the given
+        release directory in a single pass, listing directories concurrently
+        with this crawler's transport. Each directory is listed once with its
+        file types, sizes, and modify times. An unfiltered crawl is checkpointed
+        to this crawler's data directory so an interrupted crawl of the same
+        release is resumed by the next crawl. A filtered crawl only lists the
+        species directories of matching species, found with this crawler's
+        lookup table of species directories instead of listing every species.
 
         Parameters
         ----------
         directory : string
-                    The directory path that is recursively crawled for valid
-                    FASTA files.
-        species : string
-                  The name of the species that is crawled, ignoring any other
-                  species found on the remote server. If this string is blank
-                  then all species are crawled.
-        depth : int
-                The current subdirectory depth of this recursive scan. Used to
-                print output about progress for only the top level call of this
-                method.
+                    The release directory path that is crawled.
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter that crawled species must match, ignoring any
+                        other species found on the remote server.
+        version : string
+                  The release number of the release directory that is being
+                  crawled. This is needed for GFF3 because the release number is
+                  part of its valid file name extension.
 
         Returns
         -------
         ret0 : dictionary
                A lookup table of found valid FASTA files for potential entries
                where the keys are the file name excluding its FASTA extension
-               and the values are the full path to the file.
+               and the values are remote file dictionaries with the keys "path",
+               "size", and "modify".
         ret1 : dictionary
-               A lookup table of found valid CDNA files for potential entries
-               where the keys are the file name excluding its CDNA extension and
-               the values are the full path to the file.
+               A lookup table of found valid CDNA files in the same format as
+               the FASTA table excluding the CDNA extension.
+        ret2 : dictionary
+               A lookup table of found valid GFF3 files in the same format as
+               the FASTA table excluding the GFF3 extension.
         """
-        fasta = {}
-        cdna = {}
-        try:
-            listing = [x.split("/").pop() for x in self.__ftp.nlst(directory)]
-        except ftplib.all_errors:
-            self._connect_()
-            return self._crawlFasta_(directory,species,depth)
-        except socket.timeout:
-            self._connect_()
-            return self._crawlFasta_(directory,species,depth)
-        for file_ in listing:
-            if (
-                ( not depth and not file_.endswith("_collection") )
-                or ( depth == 1 and directory.endswith("_collection") )
-            ):
-                if species:
-                    names = file_.split("_")
-                    fullName = names[0].lower()+" "+names[1].lower()
-                    if not species.lower() in fullName:
-                        continue
-            if file_.endswith(self.__FASTA_EXTENSION):
-                fasta[file_[:-len(self.__FASTA_EXTENSION)]] = directory+"/"+file_
-            elif file_.endswith(self.__CDNA_EXTENSION):
-                cdna[file_[:-len(self.__CDNA_EXTENSION)]] = directory+"/"+file_
-            elif "." not in file_ and file_ not in self.__FTP_IGNORED_DIRS:
-                (f,c) = self._crawlFasta_(directory+"/"+file_,species,depth+1)
-                fasta.update(f)
-                cdna.update(c)
-        return (fasta,cdna)
-
-
-    def _crawlGff_(
+        items = []
+        checkpoint = ""
+        if speciesFilter.isEmpty():
+            for division in self._DIVISIONS:
+                base = directory+"/"+division if division else directory
+                items.append((base+self._FTP_FASTA_DIR,0,"fasta"))
+                items.append((base+self._FTP_GFF_DIR,0,"gff"))
+            checkpoint = self.__cachePath_(self.__CHECKPOINT_BASENAME,version)
+            if os.path.isfile(checkpoint):
+                self._log_("Resuming crawl from checkpoint ...")
+        else:
+            for (species,(division,path)) in sorted(self.__speciesDirs.items()):
+                if self.__matches_(species,speciesFilter):
+                    base = directory+"/"+division if division else directory
+                    depth = path.count("/")+1
+                    items.append((base+self._FTP_FASTA_DIR+"/"+path,depth,"fasta"))
+                    items.append((base+self._FTP_GFF_DIR+"/"+path,depth,"gff"))
+            self._log_("Crawling "+str(len(items)//2)+" matching species directories ...")
+        results = core.CrawlEngine(self.__transport).crawl(
+            items
+            ,lambda r,i,l: self.__visit_(speciesFilter,version,r,i,l)
+            ,{"fasta": {}, "cdna": {}, "gff": {}}
+            ,checkpoint
+        )
+        return (results["fasta"],results["cdna"],results["gff"])
+
+
+    def _disconnect_(
         self
-        ,directory
-        ,species
-        ,version
-        ,depth=0
         ):
         """
-        Recursively crawls the given directory, calling this method on any
-        subdirectories found. If the FTP connection is lost this crawler's
-        connect method is called to reconnect and continue without interruption.
-
-        Parameters
-        ----------
-        directory : string
-                    The directory path that is recursively crawled for valid
-                    GFF3 files.
-        species : string
-                  The name of the species that is crawled, ignoring any other
-                  species found on the remote server. If this string is blank
-                  then all species are crawled.
-        version : string
-                  The release number of the release directory that is being
-                  scanned. This is needed for GFF3 because the release number is
-                  part of its valid file name extension.
-        depth : int
-                The current subdirectory depth of this recursive scan. Used to
-                print output about progress for only the top level call of this
-                method.
-
-        Returns
-        -------
-        ret0 : dictionary
-               A lookup table of found valid GFF3 files for potential entries
-               where the keys are the file name excluding its GFF3 extension and
-               the values are the full path to the file.
+        Disconnects this crawler from the ensembl server, releasing its shared
+        transport. Its idle connections are kept open for reuse by the tasks
+        downloading from the same host and closed by the scheduler singleton
+        when they expire or this application exits.
         """
-        ret = {}
-        try:
-            listing = [x.split("/").pop() for x in self.__ftp.nlst(directory)]
-        except ftplib.all_errors:
-            self._connect_()
-            return self._crawlGff_(directory,species,version,depth)
-        except socket.timeout:
-            self._connect_()
-            return self._crawlGff_(directory,species,version,depth)
-        for file_ in listing:
-            if (
-                ( not depth and not file_.endswith("_collection") )
-                or ( depth == 1 and directory.endswith("_collection") )
-            ):
-                if species:
-                    names = file_.split("_")
-                    fullName = names[0].lower()+" "+names[1].lower()
-                    if not species.lower() in fullName:
-                        continue
-            ending = "."+str(version)+self.__GFF_EXTENSION
-            if file_.endswith(ending):
-                ret[file_[:-len(ending)]] = directory+"/"+file_
-            elif "." not in file_:
-                ret.update(self._crawlGff_(directory+"/"+file_,species,version,depth+1))
-        return ret
+        self.__transport = None
 
 
     def _getTaxonomyIds_(
@@ -257,21 +209,41 @@ class EnsemblCrawler(interfaces.AbstractCrawler):
         ):
         """
         Downloads and parses the given taxonomy ID file, populating this
-        crawlers lookup dictionary of taxonomy IDs.
+        crawlers lookup dictionaries of taxonomy IDs and species directories.
+        The species directory of each species is found from its division and
+        core database name, which names the collection directory of species
+        that are part of a collection.
 
         Parameters
         ----------
         directory : string
-                    The directory on the ensembl FTP server where the special
+                    The directory on the ensembl server where the special
                     taxonomy ID file is located.
         """
-        self.__text = ""
+        blocks = []
+        self.__transport.retrieve(directory+self._TAXONOMY_FILE,blocks.append)
         self.__taxIds = {}
-        self.__ftp.retrlines("RETR "+directory+self._TAXONOMY_FILE,self.__write_)
-        for line in self.__text.split("\n")[1:]:
+        self.__speciesDirs = {}
+        for line in b"".join(blocks).decode().split("\n")[1:]:
             parts = line.split("\t")
             if len(parts)>=5:
                 self.__taxIds[parts[1]] = parts[3]
+                division = parts[2]
+                if division.startswith(self.__DIVISION_PREFIX):
+                    division = division[len(self.__DIVISION_PREFIX):].lower()
+                if division not in self._DIVISIONS:
+                    if "" not in self._DIVISIONS:
+                        continue
+                    division = ""
+                path = parts[1]
+                if len(parts) >= 14 and self.__COLLECTION_SUFFIX+"_" in parts[13]:
+                    coreDb = parts[13]
+                    path = (
+                        coreDb[:coreDb.index(self.__COLLECTION_SUFFIX+"_")+len(self.__COLLECTION_SUFFIX)]
+                        + "/"
+                        + path
+                    )
+                self.__speciesDirs[parts[1]] = (division,path)
 
 
     def _latestRelease_(
@@ -287,8 +259,7 @@ class EnsemblCrawler(interfaces.AbstractCrawler):
                if no release directories were found.
         """
         ret = 0
-        listing = [x.split("/").pop() for x in self.__ftp.nlst(self._FTP_ROOT_DIR)]
-        for file_ in listing:
+        for (file_,facts) in self.__transport.list(self._FTP_ROOT_DIR):
             if file_.startswith(self._FTP_RELEASE_BASENAME):
                 version = file_[len(self._FTP_RELEASE_BASENAME):]
                 if version.isdigit():
@@ -313,12 +284,13 @@ class EnsemblCrawler(interfaces.AbstractCrawler):
         ----------
         fasta : dictionary
                 The FASTA lookup dictionary generated by this crawler's crawl
-                FASTA method.
-        cdna : object
-               Detailed description.
+                release method.
+        cdna : dictionary
+               The CDNA lookup dictionary generated by this crawler's crawl
+               release method.
         gff : dictionary
-              The GFF lookup dictionary generated by this crawler's crawl GFF
-              method.
+              The GFF lookup dictionary generated by this crawler's crawl
+              release method.
         """
         for key in fasta:
             if key in cdna and key in gff:
@@ -334,25 +306,233 @@ class EnsemblCrawler(interfaces.AbstractCrawler):
                         ,self.__taxIds[taxKey]
                         ,"ensembl"
                         ,{
-                            "fasta": "ftp://"+self._FTP_HOST+fasta[key]
-                            ,"cdna": "ftp://"+self._FTP_HOST+cdna[key]
-                            ,"gff": "ftp://"+self._FTP_HOST+gff[key]
+                            "fasta": self.__transport.url(fasta[key]["path"])
+                            ,"fasta_size": fasta[key]["size"]
+                            ,"fasta_modify": fasta[key]["modify"]
+                            ,"cdna": self.__transport.url(cdna[key]["path"])
+                            ,"cdna_size": cdna[key]["size"]
+                            ,"cdna_modify": cdna[key]["modify"]
+                            ,"gff": self.__transport.url(gff[key]["path"])
+                            ,"gff_size": gff[key]["size"]
+                            ,"gff_modify": gff[key]["modify"]
                         }
                     )
 
 
-    def __write_(
+    def __cachePath_(
+        self
+        ,basename
+        ,version
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        basename : string
+                   The base name of the cache file, either the listing or the
+                   checkpoint base name.
+        version : int
+                  The release number of the cache file.
+
+        Returns
+        -------
+        ret0 : string
+               The full path to the given cache file of this crawler's host and
+               the given release number.
+        """
+        return os.path.join(
+            self._dataDir_()
+            ,basename+self._FTP_HOST+"-"+str(version)+".json"
+        )
+
+
+    def __isFiltered_(
+        self
+        ,directory
+        ,depth
+        ,file_
+        ,speciesFilter
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        directory : string
+                    The remote directory the given file is listed in.
+        depth : int
+                The subdirectory depth of the given directory relative to the
+                crawled root directory.
+        file_ : string
+                The file name that is tested.
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter that crawled species must match.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given file is a species directory that does not match
+               the given species filter and must be ignored or false otherwise.
+        """
+        if (
+            ( not depth and not file_.endswith(self.__COLLECTION_SUFFIX) )
+            or ( depth == 1 and directory.endswith(self.__COLLECTION_SUFFIX) )
+        ):
+            if not self.__matches_(file_,speciesFilter):
+                return True
+        return False
+
+
+    def __loadListing_(
         self
-        ,text
+        ,version
         ):
         """
-        Callback function for writing to this crawlers special text holder for
-        downloading a taxonomy ID file.
+        Getter method.
 
         Parameters
         ----------
-        text : string
-               The string that is appended to this crawlers special placeholder
-               text.
+        version : int
+                  The release number whose cached listing is loaded.
+
+        Returns
+        -------
+        ret0 : tuple
+               The FASTA, CDNA, and GFF3 lookup tables of a full crawl of the
+               given release as returned by the crawl release method or None if
+               no listing of the given release is cached.
         """
-        self.__text += text+"\n"
+        path = self.__cachePath_(self.__LISTING_BASENAME,version)
+        if not os.path.isfile(path):
+            return None
+        with open(path,"r") as ifile:
+            listing = json.loads(ifile.read())
+        return (listing["fasta"],listing["cdna"],listing["gff"])
+
+
+    def __matches_(
+        self
+        ,name
+        ,speciesFilter
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        name : string
+               A remote species directory name or a file name excluding its
+               extension, starting with the genus and species separated by an
+               underscore.
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter that is matched, using this crawler's lookup
+                        table of taxonomy IDs to find the taxonomy ID of the
+                        given name.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given name matches the given species filter or false
+               otherwise.
+        """
+        if speciesFilter.isEmpty():
+            return True
+        stem = name.split(".")[0]
+        names = stem.split("_") + [""]
+        return speciesFilter.match(names[0],names[1],self.__taxIds.get(stem.lower()))
+
+
+    def __saveListing_(
+        self
+        ,version
+        ,fasta
+        ,cdna
+        ,gff
+        ):
+        """
+        Saves the given lookup tables of a full crawl of the given release to
+        this crawler's listing cache, removing the cached listing and crawl
+        checkpoint of any other release.
+
+        Parameters
+        ----------
+        version : int
+                  The release number that was crawled.
+        fasta : dictionary
+                The FASTA lookup table of the crawled release.
+        cdna : dictionary
+               The CDNA lookup table of the crawled release.
+        gff : dictionary
+              The GFF3 lookup table of the crawled release.
+        """
+        path = self.__cachePath_(self.__LISTING_BASENAME,version)
+        for basename in (self.__CHECKPOINT_BASENAME,self.__LISTING_BASENAME):
+            prefix = basename+self._FTP_HOST+"-"
+            for file_ in os.listdir(self._dataDir_()):
+                if file_.startswith(prefix) and file_ != os.path.basename(path):
+                    os.remove(os.path.join(self._dataDir_(),file_))
+        utility.saveJson(path,{"fasta": fasta, "cdna": cdna, "gff": gff})
+
+
+    def __visit_(
+        self
+        ,speciesFilter
+        ,version
+        ,results
+        ,item
+        ,listing
+        ):
+        """
+        Visit function given to the crawl engine when crawling a release.
+        Directories are recognized by their listed type. Symbolic links are
+        followed as directories only if their name has no extension.
+
+        Parameters
+        ----------
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter that crawled species must match.
+        version : string
+                  The release number of the release directory that is being
+                  crawled.
+        results : dictionary
+                  The FASTA, CDNA, and GFF3 lookup tables that are updated with
+                  any valid files found in the given listing.
+        item : tuple
+               The directory path, subdirectory depth, and kind of the given
+               listing. The kind is "fasta" or "gff".
+        listing : list
+                  The file names and facts found in the directory of the given
+                  item.
+
+        Returns
+        -------
+        ret0 : list
+               Work items for all subdirectories that must be crawled.
+        """
+        (directory,depth,kind) = item
+        ret = []
+        gffExtension = "."+str(version)+self.__GFF_EXTENSION
+        for (file_,facts) in listing:
+            if self.__isFiltered_(directory,depth,file_,speciesFilter):
+                continue
+            path = directory+"/"+file_
+            if facts["type"] != "dir":
+                remote = {"path": path, "size": facts["size"], "modify": facts["modify"]}
+                if kind == "fasta" and file_.endswith(self.__FASTA_EXTENSION):
+                    results["fasta"][file_[:-len(self.__FASTA_EXTENSION)]] = remote
+                    continue
+                if kind == "fasta" and file_.endswith(self.__CDNA_EXTENSION):
+                    results["cdna"][file_[:-len(self.__CDNA_EXTENSION)]] = remote
+                    continue
+                if kind == "gff" and file_.endswith(gffExtension):
+                    results["gff"][file_[:-len(gffExtension)]] = remote
+                    continue
+            if file_ in self.__FTP_IGNORED_DIRS:
+                continue
+            if (
+                facts["type"] == "dir"
+                or ( facts["type"] == "link" and "." not in file_ )
+            ):
+                ret.append((path,depth+1,kind))
+        return ret
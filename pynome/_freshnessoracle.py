@@ -0,0 +1,77 @@
+"""
+Contains the FreshnessOracle class.
+"""
+from . import core
+import threading
+from . import utility
+
+
+
+
+
+
+
+
+class FreshnessOracle():
+    """
+    This is the singleton freshness oracle class. It answers whether remote
+    files have changed by listing the remote directory of each file once per
+    run with its shared transport and caching the facts of every file in it.
+    All files of an assembly are found in one or two remote directories, so
+    checking all of them costs one or two listings instead of one request per
+    file. Files whose listed facts have no modify time, such as links or the
+    entries of index pages that do not show dates, are stated individually
+    instead. Directories listed as empty, because they do not exist or could
+    not be parsed, also fall back to stating their files individually.
+    """
+
+
+    def __init__(
+        self
+        ):
+        """
+        Initializes the singleton freshness oracle instance.
+        """
+        self.__listings = {}
+        self.__locks = {}
+        self.__lock = threading.Lock()
+
+
+    def facts(
+        self
+        ,url
+        ):
+        """
+        Getter method. The remote directory of the given URL is listed the
+        first time any file in it is requested, concurrent requests for the
+        same directory waiting for that single listing.
+
+        Parameters
+        ----------
+        url : string
+              The remote URL of a file.
+
+        Returns
+        -------
+        ret0 : dictionary
+               The facts of the given remote file in the same format returned
+               by the list directory utility function or None if it does not
+               exist.
+        """
+        transport = core.scheduler.transport(url)
+        path = utility.splitUrl(url)[2]
+        (directory,name) = path.rsplit("/",1)
+        key = transport.url(directory+"/")
+        with self.__lock:
+            lock = self.__locks.setdefault(key,threading.Lock())
+        with lock:
+            if key not in self.__listings:
+                self.__listings[key] = dict(transport.list(directory or "/"))
+            listing = self.__listings[key]
+        if not listing:
+            return transport.stat(path)
+        ret = listing.get(name)
+        if ret is not None and (ret["type"] == "link" or not ret["modify"]):
+            return transport.stat(path)
+        return ret
+
@@ -0,0 +1,256 @@
+"""
+Contains the FTPPool class.
+"""
+import contextlib
+import ftplib
+from . import settings
+import threading
+import time
+
+
+
+
+
+
+
+
+class FTPPool():
+    """
+    This is the FTP pool class. It keeps a bounded pool of logged in FTP
+    connections to a single host. Connections are created lazily as they are
+    acquired, up to the maximum size of the pool, and any thread acquiring a
+    connection while all connections are in use waits until one is released.
+    This is used to limit the number of concurrent connections made to any one
+    remote server. Idle connections are reused without any handshake. A
+    connection idle for longer than the session check interval setting is
+    checked with a NOOP command before it is reused, and one idle for longer
+    than the session idle timeout setting is closed instead.
+    """
+
+
+    def __init__(
+        self
+        ,host
+        ,size
+        ,timeout=10
+        ):
+        """
+        Initializes a new FTP pool.
+
+        Parameters
+        ----------
+        host : string
+               The remote FTP host that all connections of this pool connect to.
+        size : int
+               The maximum number of connections this pool opens at once.
+        timeout : int
+                  The timeout in seconds given to all connections of this pool.
+        """
+        super().__init__()
+        self.__host = host
+        self.__size = max(1,size)
+        self.__timeout = timeout
+        self.__idle = []
+        self.__count = 0
+        self.__lock = threading.Condition()
+
+
+    def acquire(
+        self
+        ):
+        """
+        Acquires a logged in connection from this pool, reusing the most
+        recently released idle connection that is still alive, opening a new
+        connection if none are idle and the pool is not full, or waiting for a
+        connection to be released otherwise. New connections are switched to
+        binary mode once, so file sizes can be requested without another round
+        trip. Any FTP error raised connecting is passed to the caller.
+
+        Returns
+        -------
+        ret0 : ftplib.FTP
+               A logged in FTP connection that must be given back to this pool
+               with the release method.
+        """
+        while True:
+            with self.__lock:
+                while not self.__idle and self.__count >= self.__size:
+                    self.__lock.wait()
+                if not self.__idle:
+                    self.__count += 1
+                    break
+                (ftp,released) = self.__idle.pop()
+            idle = time.monotonic()-released
+            if idle < settings.sessionIdleTimeout and (
+                idle < settings.sessionCheckInterval or self.__isAlive_(ftp)
+            ):
+                return ftp
+            self.release(ftp,broken=True)
+        try:
+            ftp = ftplib.FTP(self.__host,timeout=self.__timeout)
+            ftp.login()
+            ftp.voidcmd("TYPE I")
+            return ftp
+        except:
+            with self.__lock:
+                self.__count -= 1
+                self.__lock.notify()
+            raise
+
+
+    def close(
+        self
+        ):
+        """
+        Closes all idle connections of this pool, politely ending their
+        sessions. Connections currently acquired are closed when they are
+        released as broken.
+        """
+        with self.__lock:
+            idle = self.__idle
+            self.__idle = []
+            self.__count -= len(idle)
+            self.__lock.notify_all()
+        for (ftp,released) in idle:
+            self.__close_(ftp,True)
+
+
+    @contextlib.contextmanager
+    def connection(
+        self
+        ):
+        """
+        Context manager that acquires a connection from this pool and releases
+        it once the context exits. If the context exits with an exception the
+        connection is assumed to be broken and is discarded.
+
+        Returns
+        -------
+        ret0 : ftplib.FTP
+               A logged in FTP connection usable within the context.
+        """
+        ftp = self.acquire()
+        try:
+            yield ftp
+        except:
+            self.release(ftp,broken=True)
+            raise
+        else:
+            self.release(ftp)
+
+
+    def host(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : string
+               The remote FTP host of this pool.
+        """
+        return self.__host
+
+
+    def release(
+        self
+        ,ftp
+        ,broken=False
+        ):
+        """
+        Releases the given connection back to this pool. Any idle connections
+        that have expired are closed.
+
+        Parameters
+        ----------
+        ftp : ftplib.FTP
+              The connection that was acquired from this pool.
+        broken : bool
+                 True to close and discard the given connection instead of
+                 making it idle for reuse.
+        """
+        if broken:
+            self.__close_(ftp)
+        now = time.monotonic()
+        with self.__lock:
+            expired = [
+                ftp_ for (ftp_,released) in self.__idle
+                if now-released >= settings.sessionIdleTimeout
+            ]
+            self.__idle = [i for i in self.__idle if i[0] not in expired]
+            self.__count -= len(expired)
+            if broken:
+                self.__count -= 1
+            else:
+                self.__idle.append((ftp,now))
+            self.__lock.notify_all()
+        for ftp_ in expired:
+            self.__close_(ftp_)
+
+
+    def size(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : int
+               The maximum number of connections this pool opens at once.
+        """
+        return self.__size
+
+
+    def __close_(
+        self
+        ,ftp
+        ,polite=False
+        ):
+        """
+        Closes the given connection, ignoring any errors because it is most
+        likely already broken.
+
+        Parameters
+        ----------
+        ftp : ftplib.FTP
+              The connection that is closed.
+        polite : bool
+                 True to end the session with a QUIT command before closing the
+                 connection or false to just close it.
+        """
+        if polite:
+            try:
+                ftp.quit()
+            except:
+                pass
+        try:
+            ftp.close()
+        except:
+            pass
+
+
+    def __isAlive_(
+        self
+        ,ftp
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        ftp : ftplib.FTP
+              An idle connection of this pool.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given connection answered a NOOP command or false if
+               it is broken.
+        """
+        try:
+            ftp.voidcmd("NOOP")
+            return True
+        except (ftplib.Error,OSError,EOFError):
+            return False
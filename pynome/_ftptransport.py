@@ -0,0 +1,234 @@
+"""
+Contains the FTPTransport class.
+"""
+from . import core
+import ftplib
+from . import interfaces
+from . import settings
+from . import utility
+
+
+
+
+
+
+
+
+class FTPTransport(interfaces.AbstractTransport):
+    """
+    This is the FTP transport class. It implements the abstract transport
+    interface. Remote files are accessed with a pool of logged in FTP
+    connections to its host, limited in size by the host connections setting,
+    that are reused for as long as they stay alive. Directories are listed with
+    MLSD, falling back to LIST, and single files are stated with one MLST
+    command, falling back to the MDTM and SIZE commands.
+    """
+
+
+    def __init__(
+        self
+        ,host
+        ,scheme="ftp"
+        ):
+        """
+        Initializes a new FTP transport.
+
+        Parameters
+        ----------
+        host : string
+               The remote FTP host this new transport accesses.
+        scheme : string
+                 The URL scheme this new transport is registered with.
+        """
+        super().__init__(host,scheme)
+        self.__pool = core.FTPPool(host,settings.hostConnections,settings.stallTimeout)
+
+
+    def close(
+        self
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+        """
+        self.__pool.close()
+
+
+    def list(
+        self
+        ,directory
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+
+        Parameters
+        ----------
+        directory : object
+                    See interface docs.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        def list_(ftp):
+            try:
+                return utility.listDirectory(ftp,directory)
+            except ftplib.error_perm:
+                return []
+        return self.__request_(list_)
+
+
+    def retrieve(
+        self
+        ,path
+        ,callback
+        ,offset=0
+        ,validators=None
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+
+        Parameters
+        ----------
+        path : object
+               See interface docs.
+        callback : object
+                   See interface docs.
+        offset : object
+                 See interface docs.
+        validators : object
+                     See interface docs.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        received = [0]
+        def write(data):
+            self._deliver_(callback,data,path,offset+received[0])
+            received[0] += len(data)
+        def retrieve(ftp):
+            rest = offset+received[0]
+            ftp.retrbinary(
+                "RETR "+path
+                ,write
+                ,blocksize=settings.downloadBlockSize
+                ,rest=rest if rest else None
+            )
+        self.__request_(retrieve)
+        return {}
+
+
+    def retrieveRange(
+        self
+        ,path
+        ,callback
+        ,start
+        ,length
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface. The range
+        is retrieved by restarting the transfer at its start and closing the
+        data connection once it has been received. The control connection used
+        is discarded afterwards because the server is left in the middle of an
+        aborted transfer.
+
+        Parameters
+        ----------
+        path : object
+               See interface docs.
+        callback : object
+                   See interface docs.
+        start : object
+                See interface docs.
+        length : object
+                 See interface docs.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        received = [0]
+        def retrieve():
+            ftp = self.__pool.acquire()
+            try:
+                conn = ftp.transfercmd("RETR "+path,start+received[0])
+                with conn:
+                    while received[0] < length:
+                        data = conn.recv(min(settings.downloadBlockSize,length-received[0]))
+                        if not data:
+                            raise EOFError(
+                                "Remote file '"+self.url(path)+"' ended before its range."
+                            )
+                        self._deliver_(callback,data,path,start+received[0])
+                        received[0] += len(data)
+            finally:
+                self.__pool.release(ftp,broken=True)
+        core.scheduler.call(self.host(),retrieve)
+        return {}
+
+
+    def size(
+        self
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        return self.__pool.size()
+
+
+    def stat(
+        self
+        ,path
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+
+        Parameters
+        ----------
+        path : object
+               See interface docs.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        def stat(ftp):
+            try:
+                return utility.statFile(ftp,path)
+            except ftplib.error_perm:
+                return None
+        return self.__request_(stat)
+
+
+    def __request_(
+        self
+        ,function
+        ):
+        """
+        Makes a request to this transport's host through the scheduler
+        singleton, calling the given function with a connection from this
+        transport's pool.
+
+        Parameters
+        ----------
+        function : function
+                   Called with a logged in FTP connection to make the request.
+
+        Returns
+        -------
+        ret0 : object
+               The value returned by the given function.
+        """
+        def call():
+            with self.__pool.connection() as ftp:
+                return function(ftp)
+        return core.scheduler.call(self.host(),call)
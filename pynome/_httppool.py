@@ -0,0 +1,230 @@
+"""
+Contains the HTTPPool class.
+"""
+import contextlib
+import http.client
+import select
+from . import settings
+import threading
+import time
+
+
+
+
+
+
+
+
+class HTTPPool():
+    """
+    This is the HTTP pool class. It keeps a bounded pool of persistent HTTP or
+    HTTPS connections to a single host, so consecutive requests reuse the same
+    keep alive connection instead of connecting again. Connections are created
+    lazily as they are acquired, up to the maximum size of the pool, and any
+    thread acquiring a connection while all connections are in use waits until
+    one is released. A connection must only be released for reuse after the
+    response of its last request has been read completely. Idle connections
+    are checked without a round trip before they are reused, discarding any
+    the server has closed, and one idle for longer than the session idle
+    timeout setting is closed instead.
+    """
+
+
+    def __init__(
+        self
+        ,host
+        ,size
+        ,secure=True
+        ,timeout=10
+        ):
+        """
+        Initializes a new HTTP pool.
+
+        Parameters
+        ----------
+        host : string
+               The remote host that all connections of this pool connect to,
+               which can include a port number.
+        size : int
+               The maximum number of connections this pool opens at once.
+        secure : bool
+                 True to make HTTPS connections or false to make plain HTTP
+                 connections.
+        timeout : int
+                  The timeout in seconds given to all connections of this pool.
+        """
+        super().__init__()
+        self.__host = host
+        self.__size = max(1,size)
+        self.__secure = secure
+        self.__timeout = timeout
+        self.__idle = []
+        self.__count = 0
+        self.__lock = threading.Condition()
+
+
+    def acquire(
+        self
+        ):
+        """
+        Acquires a connection from this pool, reusing the most recently
+        released idle connection that is still open, creating a new connection
+        if none are idle and the pool is not full, or waiting for a connection
+        to be released otherwise. New connections connect when their first
+        request is made.
+
+        Returns
+        -------
+        ret0 : http.client.HTTPConnection
+               A connection that must be given back to this pool with the
+               release method.
+        """
+        while True:
+            with self.__lock:
+                while not self.__idle and self.__count >= self.__size:
+                    self.__lock.wait()
+                if not self.__idle:
+                    self.__count += 1
+                    break
+                (connection,released) = self.__idle.pop()
+            if (
+                time.monotonic()-released < settings.sessionIdleTimeout
+                and self.__isAlive_(connection)
+            ):
+                return connection
+            self.release(connection,broken=True)
+        if self.__secure:
+            return http.client.HTTPSConnection(self.__host,timeout=self.__timeout)
+        return http.client.HTTPConnection(self.__host,timeout=self.__timeout)
+
+
+    def close(
+        self
+        ):
+        """
+        Closes all idle connections of this pool. Connections currently acquired
+        are closed when they are released as broken.
+        """
+        with self.__lock:
+            idle = self.__idle
+            self.__idle = []
+            self.__count -= len(idle)
+            self.__lock.notify_all()
+        for (connection,released) in idle:
+            connection.close()
+
+
+    @contextlib.contextmanager
+    def connection(
+        self
+        ):
+        """
+        Context manager that acquires a connection from this pool and releases
+        it once the context exits. If the context exits with an exception the
+        connection is assumed to be broken and is discarded.
+
+        Returns
+        -------
+        ret0 : http.client.HTTPConnection
+               A connection usable within the context.
+        """
+        connection = self.acquire()
+        try:
+            yield connection
+        except:
+            self.release(connection,broken=True)
+            raise
+        else:
+            self.release(connection)
+
+
+    def host(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : string
+               The remote host of this pool.
+        """
+        return self.__host
+
+
+    def release(
+        self
+        ,connection
+        ,broken=False
+        ):
+        """
+        Releases the given connection back to this pool. Any idle connections
+        that have expired are closed.
+
+        Parameters
+        ----------
+        connection : http.client.HTTPConnection
+                     The connection that was acquired from this pool.
+        broken : bool
+                 True to close and discard the given connection instead of
+                 making it idle for reuse.
+        """
+        if broken:
+            connection.close()
+        now = time.monotonic()
+        with self.__lock:
+            expired = [
+                c for (c,released) in self.__idle
+                if now-released >= settings.sessionIdleTimeout
+            ]
+            self.__idle = [i for i in self.__idle if i[0] not in expired]
+            self.__count -= len(expired)
+            if broken:
+                self.__count -= 1
+            else:
+                self.__idle.append((connection,now))
+            self.__lock.notify_all()
+        for c in expired:
+            c.close()
+
+
+    def size(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : int
+               The maximum number of connections this pool opens at once.
+        """
+        return self.__size
+
+
+    def __isAlive_(
+        self
+        ,connection
+        ):
+        """
+        Getter method. An idle keep alive connection has nothing to read, so
+        one whose socket is readable has been closed by its server.
+
+        Parameters
+        ----------
+        connection : http.client.HTTPConnection
+                     An idle connection of this pool.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given connection is still open or not connected yet
+               or false if it is broken.
+        """
+        if connection.sock is None:
+            return True
+        try:
+            (readable,writable,failed) = select.select([connection.sock],[],[],0)
+        except (OSError,ValueError):
+            return False
+        return not readable
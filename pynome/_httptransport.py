@@ -0,0 +1,376 @@
+"""
+Contains the HTTPTransport class.
+"""
+from . import core
+import datetime
+import email.utils
+from . import exceptions
+import http.client
+from . import interfaces
+from . import settings
+import urllib.parse
+
+
+
+
+
+
+
+
+class HTTPTransport(interfaces.AbstractTransport):
+    """
+    This is the HTTP transport class. It implements the abstract transport
+    interface. Remote files are accessed with a pool of persistent keep alive
+    HTTP or HTTPS connections to its host, limited in size by the host
+    connections setting. Directories are listed by parsing the directory index
+    page of their URL and single files are stated with HEAD requests. Files are
+    retrieved with conditional requests if validators are given. Missing or
+    forbidden paths are reported as not existing, server errors are retried
+    by the scheduler singleton, and any other unexpected status is a remote
+    error.
+    """
+    __MISSING = (403,404,410)
+    __STALE = (http.client.RemoteDisconnected,BrokenPipeError,ConnectionResetError)
+
+
+    def __init__(
+        self
+        ,host
+        ,scheme="https"
+        ):
+        """
+        Initializes a new HTTP transport.
+
+        Parameters
+        ----------
+        host : string
+               The remote host this new transport accesses, which can include a
+               port number.
+        scheme : string
+                 The URL scheme this new transport is registered with. The host
+                 is accessed with HTTPS if this is "https" or plain HTTP
+                 otherwise.
+        """
+        super().__init__(host,scheme)
+        self.__pool = core.HTTPPool(
+            host
+            ,settings.hostConnections
+            ,scheme == "https"
+            ,settings.stallTimeout
+        )
+
+
+    def close(
+        self
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+        """
+        self.__pool.close()
+
+
+    def conditional(
+        self
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        return True
+
+
+    def list(
+        self
+        ,directory
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+
+        Parameters
+        ----------
+        directory : object
+                    See interface docs.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        def parse(response):
+            parser = core.IndexParser()
+            charset = response.headers.get_content_charset("utf-8")
+            parser.feed(response.read().decode(charset,"replace"))
+            parser.close()
+            return parser.listing()
+        ret = self.__request_("GET",directory.rstrip("/")+"/",parse)
+        return [] if ret is None else ret
+
+
+    def retrieve(
+        self
+        ,path
+        ,callback
+        ,offset=0
+        ,validators=None
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface. A response
+        that ends before its content length fails the request, which resumes
+        with a range request, skipping the data already given to the callback if
+        the server ignores the range. The ETag and modify time of the given
+        validators are sent with the If-None-Match and If-Modified-Since headers
+        unless retrieval starts past the beginning of the file.
+
+        Parameters
+        ----------
+        path : object
+               See interface docs.
+        callback : object
+                   See interface docs.
+        offset : object
+                 See interface docs.
+        validators : object
+                     See interface docs.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        conditions = {}
+        if validators and not offset:
+            if validators.get("etag"):
+                conditions["If-None-Match"] = validators["etag"]
+            if validators.get("modify"):
+                when = datetime.datetime.strptime(validators["modify"],"%Y%m%d%H%M%S")
+                conditions["If-Modified-Since"] = email.utils.format_datetime(
+                    when.replace(tzinfo=datetime.timezone.utc)
+                    ,usegmt=True
+                )
+        received = [0]
+        def request():
+            start = offset+received[0]
+            def read(response):
+                if response.status == 304:
+                    return False
+                skip = start if response.status == 200 else 0
+                while True:
+                    data = response.read1(settings.downloadBlockSize)
+                    if not data:
+                        break
+                    if skip:
+                        if len(data) <= skip:
+                            skip -= len(data)
+                            continue
+                        data = data[skip:]
+                        skip = 0
+                    self._deliver_(callback,data,path,offset+received[0])
+                    received[0] += len(data)
+                if response.length:
+                    raise http.client.IncompleteRead(b"",response.length)
+                return self.__validators_(response)
+            headers = {"Range": "bytes="+str(start)+"-"} if start else dict(conditions)
+            return self.__request_("GET",path,read,headers,retry=False)
+        ret = core.scheduler.call(self.host(),request)
+        if ret is None:
+            raise exceptions.RemoteError("Remote file '"+self.url(path)+"' does not exist.")
+        return None if ret is False else ret
+
+
+    def retrieveRange(
+        self
+        ,path
+        ,callback
+        ,start
+        ,length
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface. A server
+        that ignores the range request raises a range error.
+
+        Parameters
+        ----------
+        path : object
+               See interface docs.
+        callback : object
+                   See interface docs.
+        start : object
+                See interface docs.
+        length : object
+                 See interface docs.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        received = [0]
+        def request():
+            def read(response):
+                if response.status != 206:
+                    raise exceptions.RangeError(
+                        "Server ignored range request for "+self.url(path)
+                    )
+                while received[0] < length:
+                    data = response.read1(min(settings.downloadBlockSize,length-received[0]))
+                    if not data:
+                        raise EOFError("Remote file '"+self.url(path)+"' ended before its range.")
+                    self._deliver_(callback,data,path,start+received[0])
+                    received[0] += len(data)
+                return self.__validators_(response)
+            first = start+received[0]
+            headers = {"Range": "bytes="+str(first)+"-"+str(start+length-1)}
+            return self.__request_("GET",path,read,headers,retry=False)
+        ret = core.scheduler.call(self.host(),request)
+        if ret is None:
+            raise exceptions.RemoteError("Remote file '"+self.url(path)+"' does not exist.")
+        return ret
+
+
+    def size(
+        self
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        return self.__pool.size()
+
+
+    def stat(
+        self
+        ,path
+        ):
+        """
+        Implements the pynome.interfaces.AbstractTransport interface.
+
+        Parameters
+        ----------
+        path : object
+               See interface docs.
+
+        Returns
+        -------
+        ret0 : object
+               See interface docs.
+        """
+        def facts(response):
+            validators = self.__validators_(response)
+            return {
+                "type": "file"
+                ,"size": validators.get("size")
+                ,"modify": validators.get("modify","")
+            }
+        return self.__request_("HEAD",path,facts)
+
+
+    def __request_(
+        self
+        ,method
+        ,path
+        ,function
+        ,headers={}
+        ,retry=True
+        ):
+        """
+        Makes a request to this transport's host with a connection from this
+        transport's pool, calling the given function with its response if it is
+        successful or not modified. The response is read completely before its
+        connection is reused. If a reused keep alive connection turns out to
+        have been closed by the server before it answered, the request is sent
+        once more over a new connection without counting as a failure.
+
+        Parameters
+        ----------
+        method : string
+                 The HTTP method of the request.
+        path : string
+               The remote path of the request.
+        function : function
+                   Called with the successful response, returning the result of
+                   the request.
+        headers : dictionary
+                  Additional headers sent with the request.
+        retry : bool
+                True to make the request through the scheduler singleton or
+                false if the caller is already making it through the scheduler.
+
+        Returns
+        -------
+        ret0 : object
+               The value returned by the given function or None if the remote
+               path does not exist.
+        """
+        def call():
+            with self.__pool.connection() as connection:
+                reused = connection.sock is not None
+                try:
+                    connection.request(method,urllib.parse.quote(path),headers=headers)
+                    response = connection.getresponse()
+                except self.__STALE:
+                    if not reused:
+                        raise
+                    connection.close()
+                    connection.request(method,urllib.parse.quote(path),headers=headers)
+                    response = connection.getresponse()
+                if response.status in self.__MISSING:
+                    response.read()
+                    return None
+                if response.status >= 500 or response.status == 429:
+                    raise http.client.HTTPException(
+                        str(response.status)+" "+response.reason+" for "+self.url(path)
+                    )
+                if response.status not in (200,206,304):
+                    raise exceptions.RemoteError(
+                        str(response.status)+" "+response.reason+" for "+self.url(path)
+                    )
+                ret = function(response)
+                response.read()
+                return ret
+        if retry:
+            return core.scheduler.call(self.host(),call)
+        return call()
+
+
+    def __validators_(
+        self
+        ,response
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        response : http.client.HTTPResponse
+                   A successful response for a remote file.
+
+        Returns
+        -------
+        ret0 : dictionary
+               The validators of the remote file reported by the headers of the
+               given response, with the keys "size", "modify", and "etag" for
+               each one that is reported. The size is the size of the whole
+               file even if the response is for a range of it.
+        """
+        ret = {}
+        size = response.headers.get("Content-Length","")
+        if response.status == 206:
+            size = response.headers.get("Content-Range","").rpartition("/")[2]
+        if size.isdigit():
+            ret["size"] = int(size)
+        if response.headers.get("Last-Modified"):
+            when = email.utils.parsedate_to_datetime(response.headers["Last-Modified"])
+            if when.tzinfo is not None:
+                when = when.astimezone(datetime.timezone.utc)
+            ret["modify"] = when.strftime("%Y%m%d%H%M%S")
+        if response.headers.get("ETag"):
+            ret["etag"] = response.headers["ETag"]
+        return ret
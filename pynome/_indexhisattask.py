@@ -1,6 +1,7 @@
 """
 Contains the IndexHisatTask class.
 """
+from . import core
 from . import interfaces
 import os
 import re
@@ -17,7 +18,9 @@ import subprocess
 class IndexHisatTask(interfaces.AbstractTask):
     """
     This is the index hisat task. It implements the abstract task interface.
-    This indexes the local Fasta file with HiSat2.
+    This indexes the local Fasta file with HiSat2. If the content store
+    singleton has an index built by the same version from identical input then
+    it is linked instead.
     """
 
 
@@ -46,10 +49,15 @@ class IndexHisatTask(interfaces.AbstractTask):
                     cmd = ["rm","-fr",os.path.join(self._workDir_(),p)]
                     assert(subprocess.run(cmd).returncode==0)
         outDir = os.path.join(self._workDir_(),"hisat-"+version)
+        key = core.store.indexKey("hisat",version,[filePath])
+        if core.store.fetchIndex(key,outDir,self._rootName_()):
+            self._log_("Linked identical HiSat2 index")
+            return True
         os.makedirs(outDir)
         outBase = os.path.join(outDir,self._rootName_())
         cmd = ["hisat2-build","--quiet","-p",str(settings.cpuCount),"-f",filePath,outBase]
         assert(subprocess.run(cmd).returncode==0)
+        core.store.saveIndex(key,outDir,self._rootName_())
         return True
 
 
@@ -1,6 +1,7 @@
 """
 Contains the IndexKallistoTask class.
 """
+from . import core
 from . import interfaces
 import os
 import re
@@ -16,7 +17,9 @@ import subprocess
 class IndexKallistoTask(interfaces.AbstractTask):
     """
     This is the index kallisto task. It implements the abstract task interface.
-    This indexes the local CDNA Fasta file with Kallisto.
+    This indexes the local CDNA Fasta file with Kallisto. If the content store
+    singleton has an index built by the same version from identical input then
+    it is linked instead.
     """
 
 
@@ -44,9 +47,13 @@ class IndexKallistoTask(interfaces.AbstractTask):
                 if os.path.isdir(path):
                     cmd = ["rm","-fr",os.path.join(self._workDir_(),p)]
                     assert(subprocess.run(cmd).returncode==0)
-        outBase = os.path.join(self._workDir_(),"kallisto-"+version)
-        os.makedirs(outBase,exist_ok=True)
-        outBase = os.path.join(outBase,self._rootName_()+".idx")
+        outDir = os.path.join(self._workDir_(),"kallisto-"+version)
+        key = core.store.indexKey("kallisto",version,[filePath])
+        if core.store.fetchIndex(key,outDir,self._rootName_()):
+            self._log_("Linked identical Kallisto index")
+            return True
+        os.makedirs(outDir,exist_ok=True)
+        outBase = os.path.join(outDir,self._rootName_()+".idx")
         cmd = [
             "kallisto"
             ,"index"
@@ -55,6 +62,7 @@ class IndexKallistoTask(interfaces.AbstractTask):
             ,filePath
         ]
         assert(subprocess.run(cmd,capture_output=True).returncode==0)
+        core.store.saveIndex(key,outDir,self._rootName_())
         return True
 
 
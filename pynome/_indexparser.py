@@ -0,0 +1,152 @@
+"""
+Contains the IndexParser class.
+"""
+import datetime
+import html.parser
+import re
+import urllib.parse
+
+
+
+
+
+
+
+
+class IndexParser(html.parser.HTMLParser):
+    """
+    This is the index parser class. It parses the HTML directory index page
+    generated by a web server for a remote directory, such as the Apache, nginx,
+    or python http.server index pages. Every relative link of the page is an
+    entry of the directory. Directories are recognized by the trailing slash of
+    their link and the modify time and size of an entry are parsed from the
+    text following its link, if the server lists them.
+    """
+    __DATE_FORMATS = (
+        (
+            re.compile(r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}(?::\d{2})?)")
+            ,("%Y-%m-%d %H:%M:%S","%Y-%m-%d %H:%M")
+        )
+        ,(
+            re.compile(r"(\d{2}-[A-Za-z]{3}-\d{4} \d{2}:\d{2}(?::\d{2})?)")
+            ,("%d-%b-%Y %H:%M:%S","%d-%b-%Y %H:%M")
+        )
+    )
+    __SIZE_REGEX = re.compile(r"^\s*(\d+(?:\.\d+)?[KMGT]?|-)(?:\s|$)")
+
+
+    def __init__(
+        self
+        ):
+        """
+        Initializes a new index parser.
+        """
+        super().__init__(convert_charrefs=True)
+        self.__entries = []
+        self.__inLink = False
+
+
+    def handle_data(
+        self
+        ,data
+        ):
+        """
+        Implements the html.parser.HTMLParser interface.
+
+        Parameters
+        ----------
+        data : string
+               Text of the parsed page.
+        """
+        if self.__entries and not self.__inLink:
+            self.__entries[-1][1].append(data)
+
+
+    def handle_endtag(
+        self
+        ,tag
+        ):
+        """
+        Implements the html.parser.HTMLParser interface.
+
+        Parameters
+        ----------
+        tag : string
+              Name of the closed tag.
+        """
+        if tag == "a":
+            self.__inLink = False
+
+
+    def handle_starttag(
+        self
+        ,tag
+        ,attrs
+        ):
+        """
+        Implements the html.parser.HTMLParser interface.
+
+        Parameters
+        ----------
+        tag : string
+              Name of the opened tag.
+        attrs : list
+                Name and value pairs of the opened tag's attributes.
+        """
+        if tag != "a":
+            return
+        self.__inLink = True
+        href = dict(attrs).get("href")
+        if not href:
+            return
+        parts = urllib.parse.urlsplit(href)
+        if parts.scheme or parts.netloc or parts.query or parts.path.startswith("/"):
+            return
+        name = urllib.parse.unquote(parts.path)
+        if name.rstrip("/") in ("",".","..") or "/" in name.rstrip("/"):
+            return
+        self.__entries.append((name,[]))
+
+
+    def listing(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : list
+               Tuples of the file name and facts of every entry of the parsed
+               page in the same format returned by the list directory utility
+               function. Link types are never reported because index pages do
+               not distinguish them.
+        """
+        ret = []
+        seen = set()
+        for (name,texts) in self.__entries:
+            text = "".join(texts)
+            type_ = "dir" if name.endswith("/") else "file"
+            name = name.rstrip("/")
+            if name in seen:
+                continue
+            seen.add(name)
+            modify = ""
+            size = None
+            for (regex,formats) in self.__DATE_FORMATS:
+                match = regex.search(text)
+                if match is None:
+                    continue
+                for format_ in formats:
+                    try:
+                        when = datetime.datetime.strptime(match.group(1),format_)
+                    except ValueError:
+                        continue
+                    modify = when.strftime("%Y%m%d%H%M%S")
+                    break
+                sizeMatch = self.__SIZE_REGEX.match(text[match.end():])
+                if sizeMatch is not None and sizeMatch.group(1).isdigit():
+                    size = int(sizeMatch.group(1))
+                break
+            ret.append((name,{"type": type_, "size": size, "modify": modify}))
+        return ret
@@ -1,6 +1,7 @@
 """
 Contains the IndexSalmonTask class.
 """
+from . import core
 from . import interfaces
 import os
 import re
@@ -17,7 +18,9 @@ import subprocess
 class IndexSalmonTask(interfaces.AbstractTask):
     """
     This is the index salmon task. It implements the abstract task interface.
-    This indexes the local CDNA Fasta file with Salmon.
+    This indexes the local CDNA Fasta file with Salmon. If the content store
+    singleton has an index built by the same version from identical input then
+    it is linked instead.
     """
 
 
@@ -45,17 +48,23 @@ class IndexSalmonTask(interfaces.AbstractTask):
                 if os.path.isdir(path):
                     cmd = ["rm","-fr",os.path.join(self._workDir_(),p)]
                     assert(subprocess.run(cmd).returncode==0)
+        outDir = os.path.join(self._workDir_(),"salmon-"+version)
+        key = core.store.indexKey("salmon",version,[filePath])
+        if core.store.fetchIndex(key,outDir,self._rootName_()):
+            self._log_("Linked identical Salmon index")
+            return True
         cmd = [
             "salmon"
             ,"index"
             ,"--index"
-            ,os.path.join(self._workDir_(),"salmon-"+version)
+            ,outDir
             ,"--transcripts"
             ,filePath
             ,"--threads"
             ,str(settings.cpuCount)
         ]
         assert(subprocess.run(cmd,capture_output=True).returncode==0)
+        core.store.saveIndex(key,outDir,self._rootName_())
         return True
 
 
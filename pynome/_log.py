@@ -1,6 +1,7 @@
 """
 Contains the Log class.
 """
+import threading
 import time
 
 
@@ -15,8 +16,9 @@ class Log():
     This is the singleton log class. It is responsible for logging any messages
     given to it from anywhere else in the application, putting a timestamp on
     the output of every message. This is designed to be the central location for
-    any standard output. An echo state can be enabled or disabled, allowing the
-    program to be quiet by disabling it.
+    any standard output and is safe to use from multiple threads. An echo state
+    can be enabled or disabled, allowing the program to be quiet by disabling
+    it.
     """
 
 
@@ -27,6 +29,7 @@ class Log():
         Initializes the singleton log instance.
         """
         self.__echo = True
+        self.__lock = threading.Lock()
 
 
     def setEcho(
@@ -59,4 +62,5 @@ class Log():
                   The log message.
         """
         if self.__echo:
-            print(time.strftime("[%D %H:%M:%S] ")+message)
+            with self.__lock:
+                print(time.strftime("[%D %H:%M:%S] ")+message,flush=True)
@@ -0,0 +1,104 @@
+"""
+Contains the MirrorEngine class.
+"""
+import collections
+import concurrent.futures
+
+
+
+
+
+
+
+
+class MirrorEngine():
+    """
+    This is the mirror engine class. It runs mirror jobs concurrently with a
+    pool of worker threads, limiting both the total number of jobs running at
+    once and the number of jobs running at once for any one remote host. Jobs
+    waiting on a busy host never hold a worker, so other hosts are kept busy
+    instead. Jobs are taken lazily from the iterable given to the run method,
+    looking ahead a bounded number of jobs to find ones for hosts that are not
+    busy.
+    """
+    __LOOKAHEAD = 1000
+
+
+    def __init__(
+        self
+        ,size
+        ,hostSize
+        ):
+        """
+        Initializes a new mirror engine.
+
+        Parameters
+        ----------
+        size : int
+               The maximum number of jobs running at once.
+        hostSize : int
+                   The maximum number of jobs running at once for any one
+                   remote host.
+        """
+        super().__init__()
+        self.__size = max(1,size)
+        self.__hostSize = max(1,hostSize)
+
+
+    def run(
+        self
+        ,jobs
+        ):
+        """
+        Runs the given jobs until all of them are done. Any exception raised by
+        a job is raised once all running jobs are done, without starting any
+        more jobs.
+
+        Parameters
+        ----------
+        jobs : iterable
+               Tuples of the remote host and function of each job. The function
+               is called with no arguments from a worker thread. Jobs that do
+               not access a remote host can give an empty host, which is
+               limited like any other host.
+        """
+        jobs = iter(jobs)
+        queues = collections.defaultdict(collections.deque)
+        running = collections.Counter()
+        futures = {}
+        pending = 0
+        exhausted = False
+        with concurrent.futures.ThreadPoolExecutor(self.__size) as executor:
+            try:
+                while True:
+                    while len(futures) < self.__size:
+                        host = next(
+                            (h for (h,q) in queues.items() if q and running[h] < self.__hostSize)
+                            ,None
+                        )
+                        if host is not None:
+                            futures[executor.submit(queues[host].popleft())] = host
+                            running[host] += 1
+                            pending -= 1
+                        elif not exhausted and pending < self.__LOOKAHEAD:
+                            try:
+                                (host,function) = next(jobs)
+                            except StopIteration:
+                                exhausted = True
+                                continue
+                            queues[host].append(function)
+                            pending += 1
+                        else:
+                            break
+                    if not futures:
+                        break
+                    (done,notDone) = concurrent.futures.wait(
+                        futures
+                        ,return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        running[futures.pop(future)] -= 1
+                        future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
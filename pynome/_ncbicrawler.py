@@ -1,10 +1,15 @@
 """
 Contains the NCBICrawler class.
 """
-import ftplib
+import concurrent.futures
+from . import core
+from . import exceptions
+import hashlib
 from . import interfaces
+import json
 import os
-import subprocess
+from . import settings
+import time
 from . import utility
 
 
@@ -19,25 +24,38 @@ class NCBICrawler(interfaces.AbstractCrawler):
     This is the NCBI class. It implements the abstract crawler interface. The
     remote database is crawled in three stages.
 
-    The first stage is downloading and parsing the taxonomy database dump. This
-    allows the crawler to build a list of taxonomy IDs that are part of a valid
-    division and should be added locally.
+    The first stage is loading the taxonomy index of the taxonomy singleton.
+    This allows the crawler to build a lookup table of taxonomy IDs that are
+    part of a valid division and should be added locally.
 
     The second stage is downloading the full assembly list and parsing it. Each
     listing is verified to be part of a desired division and then verified to
     have a proper GFF or GTF file in its remote location. The final test makes
     sure it is a reference or representative assembly. If all tests pass its
-    entry is added locally.
+    entry is added locally. Remote locations are probed concurrently and their
+    results cached so an unchanged assembly is only probed once. The assembly
+    list is streamed from a local copy and only rows that are new or changed
+    since the last crawl are probed and added.
     """
-    __DIV_NAME = "division.dmp"
     __FASTA_EXTENSION = "_genomic.fna.gz"
     __FTP_HOST = "ftp.ncbi.nlm.nih.gov"
     __GFF_EXTENSION = "_genomic.gff.gz"
     __GTF_EXTENSION = "_genomic.gtf.gz"
-    __NODE_NAME = "nodes.dmp"
-    __SUMMARY_PATH = "/genomes/genbank/assembly_summary_genbank.txt"
-    __TAX_DIR = "/pub/taxonomy/"
-    __TAX_NAME = "taxdump.tar.gz"
+    __PROBE_CACHE_NAME = "probes.json"
+    __SPECIES_GROUPS = [
+        "fungi"
+        ,"invertebrate"
+        ,"plant"
+        ,"protozoa"
+        ,"vertebrate_mammalian"
+        ,"vertebrate_other"
+    ]
+    __SPECIES_SUMMARY_NAME = "assembly_summary.txt"
+    __SUMMARY_NAME = "assembly_summary_genbank.txt"
+    __SUMMARY_DIR = "/genomes/genbank/"
+    __SUMMARY_PATH = __SUMMARY_DIR+__SUMMARY_NAME
+    __SUMMARY_STATE_NAME = "summary.json"
+    __SUMMARY_VALIDATORS_NAME = "summaries.json"
     __VALID_DIVS = ["INV","MAM","PLN","PRI","ROD","VRT"]
     __VALID_CATS = ["reference genome","representative genome"]
 
@@ -49,65 +67,103 @@ class NCBICrawler(interfaces.AbstractCrawler):
         Initializes a new ensembl crawler.
         """
         super().__init__()
-        self.__ftp = None
-        self.__lines = []
-        self.__safeSTIDs = set()
+        self.__transport = None
+        self.__validTaxIds = b""
 
 
     def crawl(
         self
-        ,species=""
+        ,speciesFilter
         ):
         """
         Implements the pynome.interfaces.AbstractCrawler interface.
 
         Parameters
         ----------
-        species : object
-                  See interface docs.
-        """
-        self.__loadTaxonomy_()
-        self.__ftp = ftplib.FTP(self.__FTP_HOST,timeout=10)
-        self.__ftp.login()
-        self._log_("Downloading assembly summary...")
-        self.__lines = []
-        self.__ftp.retrlines("RETR "+self.__SUMMARY_PATH,self.__write_)
+        speciesFilter : object
+                        See interface docs.
+        """
+        self._log_("Loading taxonomy ...")
+        self.__validTaxIds = core.taxonomy.index().divisionMask(self.__VALID_DIVS)
+        self.__transport = self._transport_(self.__FTP_HOST)
+        summaryPaths = self.__syncSpeciesSummaries_(speciesFilter)
+        if summaryPaths is None:
+            summaryPath = os.path.join(self._dataDir_(),self.__SUMMARY_NAME)
+            self._log_("Syncing assembly summary...")
+            self.__syncSummary_(self.__SUMMARY_PATH,summaryPath)
+            summaryPaths = [summaryPath]
         self._log_("Crawling assembly summary...")
-        for text in self.__lines:
-            if text and text[0] != "#":
-                parts = text.split("\t")
-                if len(parts) < 16:
-                    continue
-                sParts = parts[7].split()
-                sParts = [sParts[0]," ".join(sParts[1:])]
-                if species and not species in sParts[0]+" "+sParts[1]:
-                    continue
-                if parts[6] in self.__safeSTIDs and parts[4] in self.__VALID_CATS:
-                    (hasGff,hasGtf) = self.__hasGffGtf_(parts[-3])
-                    if not hasGff and not hasGtf:
-                        continue
-                    fasta = parts[-3]
-                    gff = ""
-                    gtf = ""
-                    if hasGff:
-                        gff = fasta + fasta[fasta.rfind("/"):] + self.__GFF_EXTENSION
-                    if hasGtf:
-                        gtf = fasta + fasta[fasta.rfind("/"):] + self.__GTF_EXTENSION
-                    fasta = fasta + fasta[fasta.rfind("/"):] + self.__FASTA_EXTENSION
-                    introName = sParts[1].split()
-                    if len(introName) > 1:
-                        introName = " ".join(introName[1:])
-                    else:
-                        introName = ""
-                    self._addEntry_(
-                        sParts[0]
-                        ,sParts[1].split()[0]
-                        ,introName
-                        ,parts[15]
-                        ,parts[6]
-                        ,"ncbi"
-                        ,{"fasta": fasta, "gff": gff, "gtf": gtf}
+        statePath = os.path.join(self._dataDir_(),self.__SUMMARY_STATE_NAME)
+        state = {}
+        if os.path.isfile(statePath) and not settings.recrawl:
+            with open(statePath,"r") as ifile:
+                state = json.loads(ifile.read())
+        rows = []
+        unchanged = 0
+        for (parts,sParts,digest) in (
+            row
+            for path in summaryPaths
+            for row in self.__readSummary_(path,speciesFilter)
+        ):
+            previous = state.get(parts[0],{})
+            if previous.get("digest") == digest and (
+                not previous["added"]
+                or os.path.isfile(
+                    os.path.join(
+                        settings.rootPath
+                        ,self._entryKey_(parts[6],parts[15])
+                        ,"metadata.json"
                     )
+                )
+            ):
+                unchanged += 1
+                if previous["added"]:
+                    self._keepEntry_(parts[6],parts[15])
+            else:
+                rows.append((parts,sParts,digest))
+        self._log_(
+            "Found "+str(len(rows))+" new or changed and "+str(unchanged)+" unchanged assemblies..."
+        )
+        probes = self.__probeAll_([parts for (parts,sParts,digest) in rows])
+        for (parts,sParts,digest) in rows:
+            probe = probes.get(parts[0])
+            if probe is None:
+                continue
+            added = probe["gff"] is not None or probe["gtf"] is not None
+            state[parts[0]] = {"digest": digest, "added": added}
+            if not added:
+                continue
+            fasta = self.__transport.url(utility.splitUrl(parts[-3])[2])
+            fasta = fasta + fasta[fasta.rfind("/"):]
+            processData = {}
+            for (key,extension) in (
+                ("fasta",self.__FASTA_EXTENSION)
+                ,("gff",self.__GFF_EXTENSION)
+                ,("gtf",self.__GTF_EXTENSION)
+            ):
+                if probe[key] is not None:
+                    processData[key] = fasta + extension
+                    processData[key+"_size"] = probe[key]["size"]
+                    processData[key+"_modify"] = probe[key]["modify"]
+                else:
+                    processData[key] = ""
+            if not processData["fasta"]:
+                processData["fasta"] = fasta + self.__FASTA_EXTENSION
+            introName = sParts[1].split()
+            if len(introName) > 1:
+                introName = " ".join(introName[1:])
+            else:
+                introName = ""
+            self._addEntry_(
+                sParts[0]
+                ,sParts[1].split()[0]
+                ,introName
+                ,parts[15]
+                ,parts[6]
+                ,"ncbi"
+                ,processData
+            )
+        utility.saveJson(statePath,state)
 
 
     def name(
@@ -124,86 +180,229 @@ class NCBICrawler(interfaces.AbstractCrawler):
         return "ncbi"
 
 
-    def __hasGffGtf_(
+    def __probe_(
         self
         ,url
         ):
         """
-        Getter method.
+        Getter method. Lists the given remote assembly directory with this
+        crawler's transport, whose requests are made through the scheduler
+        singleton and retried with backoff if listing fails.
 
         Parameters
         ----------
         url : string
-              The remote FTP URL which is verified to have a GFF file or not.
+              The remote URL of an assembly directory.
+
+        Returns
+        -------
+        ret0 : dictionary
+               Facts of the FASTA, GFF, and GTF file of the given directory with
+               the keys "fasta", "gff", and "gtf". Each value is None if that
+               file is not found or a dictionary with the keys "size" and
+               "modify" of that remote file.
+        """
+        ret = {"fasta": None, "gff": None, "gtf": None}
+        for (name,facts) in self.__transport.list(utility.splitUrl(url)[2]):
+            for (key,extension) in (
+                ("fasta",self.__FASTA_EXTENSION)
+                ,("gff",self.__GFF_EXTENSION)
+                ,("gtf",self.__GTF_EXTENSION)
+            ):
+                if name.endswith(extension):
+                    ret[key] = {"size": facts["size"], "modify": facts["modify"]}
+        return ret
+
+
+    def __probeAll_(
+        self
+        ,rows
+        ):
+        """
+        Getter method. Remote assembly directories of the given rows are probed
+        concurrently, using a worker for each connection of this crawler's
+        transport, limited by the host connections setting. Probe results are
+        stored in a persistent cache keyed by the accession and sequence release
+        date of each row so unchanged assemblies are never probed again. The
+        cache is saved at checkpoint intervals so an interrupted crawl keeps its
+        progress. Failed probes are logged and not cached.
+
+        Parameters
+        ----------
+        rows : list
+               Split assembly summary rows whose assembly directories are
+               probed.
 
         Returns
         -------
-        ret0 : bool
-               True if the given remote FTP URL has a GFF file within it or
-               false otherwise.
-        ret1 : bool
-               True if the given remote FTP URL has a GTF file within it or
-               false otherwise.
-        """
-        (gff,gtf) = (False,False)
-        dirPath = url[6+len(self.__FTP_HOST):]
+        ret0 : dictionary
+               Probe results as returned by the probe method keyed by the
+               accession of each given row. Rows whose probe failed are not
+               included.
+        """
+        cachePath = os.path.join(self._dataDir_(),self.__PROBE_CACHE_NAME)
+        cache = {}
+        if os.path.isfile(cachePath):
+            with open(cachePath,"r") as ifile:
+                cache = json.loads(ifile.read())
+        ret = {}
+        todo = []
+        for parts in rows:
+            cached = cache.get(parts[0])
+            if cached is not None and cached["date"] == parts[14]:
+                ret[parts[0]] = cached
+            else:
+                todo.append(parts)
+        self._log_("Probing "+str(len(todo))+" of "+str(len(rows))+" assemblies...")
+        saved = time.monotonic()
         try:
-            listing = self.__ftp.nlst(dirPath)
-            for path in listing:
-                if path.endswith(self.__GFF_EXTENSION):
-                    gff = True
-                if path.endswith(self.__GTF_EXTENSION):
-                    gtf = True
-        except:
-            self._log_("Failed crawling directory '"+dirPath+"'")
-        return (gff,gtf)
-
-
-    def __loadTaxonomy_(
+            with concurrent.futures.ThreadPoolExecutor(self.__transport.size()) as executor:
+                futures = {executor.submit(self.__probe_,p[-3]): p for p in todo}
+                for future in concurrent.futures.as_completed(futures):
+                    parts = futures[future]
+                    try:
+                        probe = future.result()
+                    except exceptions.RemoteError as e:
+                        self._log_("Failed probing directory '"+parts[-3]+"': "+str(e))
+                        continue
+                    probe["date"] = parts[14]
+                    ret[parts[0]] = probe
+                    cache[parts[0]] = probe
+                    if time.monotonic()-saved >= settings.checkpointInterval:
+                        utility.saveJson(cachePath,cache)
+                        saved = time.monotonic()
+        finally:
+            utility.saveJson(cachePath,cache)
+        return ret
+
+
+    def __readSummary_(
+        self
+        ,path
+        ,speciesFilter
+        ):
+        """
+        Generator method that reads the local assembly summary file at the
+        given path one line at a time, yielding only rows that are part of a
+        valid division and category and match the given species filter.
+
+        Parameters
+        ----------
+        path : string
+               The full path to the local assembly summary file.
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter that yielded rows must match.
+
+        Returns
+        -------
+        ret0 : list
+               The split columns of the yielded row.
+        ret1 : list
+               The genus and remaining organism name of the yielded row.
+        ret2 : string
+               The digest of the yielded row's text, used to detect if it has
+               changed since the last crawl.
+        """
+        with open(path,"r") as ifile:
+            for text in ifile:
+                if not text or text[0] == "#":
+                    continue
+                text = text.rstrip("\n")
+                parts = text.split("\t")
+                if len(parts) < 16:
+                    continue
+                if parts[4] not in self.__VALID_CATS:
+                    continue
+                taxId = int(parts[6]) if parts[6].isdigit() else -1
+                if not 0 <= taxId < len(self.__validTaxIds) or not self.__validTaxIds[taxId]:
+                    continue
+                sParts = parts[7].split()
+                sParts = [sParts[0]," ".join(sParts[1:])]
+                if not speciesFilter.match(sParts[0],sParts[1],parts[6]):
+                    continue
+                yield (parts,sParts,hashlib.md5(text.encode()).hexdigest())
+
+
+    def __syncSpeciesSummaries_(
         self
+        ,speciesFilter
         ):
         """
-        Synchronizes the remote taxonomy dump with the local one and then loads
-        all acceptable taxonomy IDs into this crawler. Acceptable IDs are ones
-        that match a given list of division IDs.
+        Synchronizes the per species assembly summaries of the species named by
+        the given filter, so crawling a single species does not require the
+        full assembly list. The species directory is looked for in every
+        species group of a valid division.
+
+        Parameters
+        ----------
+        speciesFilter : pynome.core.SpeciesFilter
+                        The filter whose species name is looked up. Only a full
+                        genus and species name can be looked up.
+
+        Returns
+        -------
+        ret0 : list
+               The full paths to the synchronized local per species assembly
+               summaries or None if the given filter does not name exactly one
+               species or it was not found, in which case the full assembly list
+               must be crawled.
         """
-        tarPath = os.path.join(self._dataDir_(),self.__TAX_NAME)
-        self._log_("Syncing taxonomy ...")
-        if utility.rSync(self.__FTP_HOST+self.__TAX_DIR+self.__TAX_NAME,tarPath):
-            cmd = ["tar","-xvf",tarPath,"-C",self._dataDir_()]
-            assert(subprocess.run(cmd,capture_output=True).returncode==0)
-        self._log_("Loading taxonomy ...")
-        divs = []
-        with open(os.path.join(self._dataDir_(),self.__DIV_NAME),"r") as ifile:
-            while True:
-                line = ifile.readline()
-                if not line:
-                    break
-                parts = [l.strip() for l in line.split("|")]
-                if parts[1] in self.__VALID_DIVS:
-                    divs.append(parts[0])
-        with open(os.path.join(self._dataDir_(),self.__NODE_NAME),"r") as ifile:
-            while True:
-                line = ifile.readline()
-                if not line:
-                    break
-                parts = [l.strip() for l in line.split("|")]
-                if parts[4] in divs:
-                    self.__safeSTIDs.add(parts[0])
-
-
-    def __write_(
+        names = speciesFilter.name().split()
+        if len(names) != 2 or not all(n.isalpha() for n in names):
+            return None
+        speciesDir = names[0].capitalize()+"_"+names[1]
+        ret = []
+        for group in self.__SPECIES_GROUPS:
+            remotePath = (
+                self.__SUMMARY_DIR
+                + group
+                + "/"
+                + speciesDir
+                + "/"
+                + self.__SPECIES_SUMMARY_NAME
+            )
+            if self.__transport.stat(remotePath) is None:
+                continue
+            self._log_("Syncing assembly summary of "+speciesDir+" in "+group+"...")
+            path = os.path.join(
+                self._dataDir_()
+                ,group+"-"+speciesDir+"-"+self.__SPECIES_SUMMARY_NAME
+            )
+            self.__syncSummary_(remotePath,path)
+            ret.append(path)
+        return ret if ret else None
+
+
+    def __syncSummary_(
         self
-        ,text
+        ,remotePath
+        ,path
         ):
         """
-        Callback function for writing to this crawlers special text holder for
-        downloading the full assembly list text file.
+        Synchronizes the given remote assembly summary with the given local
+        path. The validators of every synchronized summary are kept in this
+        crawler's data directory, so a summary is downloaded again exactly when
+        its remote size or modify time changed instead of comparing timestamps.
+        A local summary without kept validators is always downloaded again.
 
         Parameters
         ----------
-        text : string
-               The string that is appended to this crawlers special placeholder
-               text.
+        remotePath : string
+                     The remote path of the assembly summary on this crawler's
+                     host.
+        path : string
+               The full path to the local assembly summary.
         """
-        self.__lines.append(text)
+        validatorsPath = os.path.join(self._dataDir_(),self.__SUMMARY_VALIDATORS_NAME)
+        validators = {}
+        if os.path.isfile(validatorsPath):
+            with open(validatorsPath,"r") as ifile:
+                validators = json.loads(ifile.read())
+        name = os.path.basename(path)
+        if not validators.get(name) or not os.path.isfile(path):
+            validators[name] = {}
+            if os.path.isfile(path):
+                os.remove(path)
+        summary = validators[name]
+        utility.rSync(self.__transport.url(remotePath),path,validators=summary)
+        utility.saveJson(validatorsPath,validators)
@@ -0,0 +1,439 @@
+"""
+Contains the Scheduler class.
+"""
+import atexit
+from . import core
+from . import exceptions
+import ftplib
+import http.client
+from . import interfaces
+import random
+from . import settings
+import threading
+import time
+from . import utility
+
+
+
+
+
+
+
+
+class Scheduler():
+    """
+    This is the singleton scheduler class. It is responsible for scheduling all
+    requests made to remote servers. Requests to each host are rate limited
+    with a token bucket and failed requests are retried with exponential
+    backoff and jitter. If too many requests to a host fail in a row, its
+    circuit breaker opens and all requests to it fail immediately until a cool
+    down has passed, after which a single trial request is allowed through.
+    Counters of requests, retries, failures, latency, downloaded bytes, and
+    checksum mismatches are kept for each host. The scheduler also keeps a
+    lookup table of registered transport implementations by URL scheme and the
+    transports shared by everything that accesses a remote host, closing them
+    when this application exits.
+    """
+    __COUNTERS = (
+        "requests"
+        ,"retries"
+        ,"failures"
+        ,"latency"
+        ,"maxLatency"
+        ,"downloaded"
+        ,"downloadTime"
+        ,"mismatches"
+    )
+    __PERMANENT = (ftplib.error_perm,)
+    __RETRYABLE = (ftplib.Error,http.client.HTTPException,OSError,EOFError)
+
+
+    def __init__(
+        self
+        ):
+        """
+        Initializes the singleton scheduler instance.
+        """
+        self.__hosts = {}
+        self.__transportClasses = {}
+        self.__transports = {}
+        self.__lock = threading.Lock()
+        atexit.register(self.close)
+
+
+    def call(
+        self
+        ,host
+        ,function
+        ):
+        """
+        Calls the given function that makes a request to the given host,
+        waiting for the host's rate limit and retrying the function if it
+        raises a retryable error. Permanent FTP errors are passed to the caller
+        without being retried.
+
+        Parameters
+        ----------
+        host : string
+               The remote host the given function makes a request to.
+        function : function
+                   Called with no arguments to make the request. It is called
+                   again for every retry so it must not depend on state left by
+                   a failed call.
+
+        Returns
+        -------
+        ret0 : object
+               The value returned by the given function.
+        """
+        attempt = 0
+        while True:
+            trial = self.__acquire_(host)
+            start = time.monotonic()
+            try:
+                ret = function()
+            except self.__PERMANENT:
+                self.__record_(host,time.monotonic()-start,True,trial)
+                raise
+            except self.__RETRYABLE as error:
+                self.__record_(host,time.monotonic()-start,False,trial)
+                attempt += 1
+                if attempt > settings.requestRetries or self.__isOpen_(host):
+                    raise exceptions.RemoteError(
+                        "Request to '"+host+"' failed after "+str(attempt)+" attempts: "+str(error)
+                    ) from error
+                with self.__lock:
+                    self.__hosts[host]["retries"] += 1
+                delay = min(settings.backoffMax,settings.backoffBase*2**(attempt-1))
+                time.sleep(delay/2+random.uniform(0,delay/2))
+            except:
+                self.__record_(host,time.monotonic()-start,True,trial)
+                raise
+            else:
+                self.__record_(host,time.monotonic()-start,True,trial)
+                return ret
+
+
+    def close(
+        self
+        ):
+        """
+        Closes the idle connections of all shared transports. Transports remain
+        usable afterwards, opening new connections as they are needed.
+        """
+        with self.__lock:
+            transports = list(self.__transports.values())
+        for transport in transports:
+            try:
+                transport.close()
+            except:
+                pass
+
+
+    def recordDownload(
+        self
+        ,host
+        ,size
+        ,seconds
+        ):
+        """
+        Adds a finished download from the given host to its throughput
+        counters.
+
+        Parameters
+        ----------
+        host : string
+               The remote host the file was downloaded from.
+        size : int
+               The number of bytes downloaded.
+        seconds : float
+                  The time in seconds the download took.
+        """
+        with self.__lock:
+            state = self.__host_(host)
+            state["downloaded"] += size
+            state["downloadTime"] += seconds
+
+
+    def recordMismatch(
+        self
+        ,host
+        ):
+        """
+        Adds a downloaded file from the given host whose data did not match its
+        upstream checksum to its counters.
+
+        Parameters
+        ----------
+        host : string
+               The remote host the file was downloaded from.
+        """
+        with self.__lock:
+            self.__host_(host)["mismatches"] += 1
+
+
+    def registerTransport(
+        self
+        ,scheme
+        ,transportClass
+        ):
+        """
+        Registers a new transport implementation with the given class, used for
+        all URLs with the given scheme.
+
+        Parameters
+        ----------
+        scheme : string
+                 The lower case URL scheme accessed with the given transport
+                 implementation.
+        transportClass : class
+                         The abstract transport implementation class that is
+                         registered. It is created with the remote host and URL
+                         scheme of the transport.
+        """
+        if not issubclass(transportClass,interfaces.AbstractTransport):
+            raise exceptions.RegisterError("Given class is not Transport subclass.")
+        if scheme in self.__transportClasses:
+            raise exceptions.RegisterError("Transport '"+scheme+"' already exists.")
+        self.__transportClasses[scheme] = transportClass
+
+
+    def report(
+        self
+        ):
+        """
+        Sends the request and throughput counters of every host to the logging
+        system.
+        """
+        with self.__lock:
+            hosts = sorted(self.__hosts)
+        for host in hosts:
+            stats = self.stats(host)
+            if not stats["requests"]:
+                continue
+            core.log.send(
+                "("+host+") "
+                + str(stats["requests"])
+                + " requests, "
+                + str(stats["retries"])
+                + " retries, "
+                + str(stats["failures"])
+                + " failures, %.3fs mean latency, %.3fs max latency"
+                % (stats["latency"]/stats["requests"],stats["maxLatency"])
+            )
+            if stats["downloaded"]:
+                core.log.send(
+                    "("+host+") Downloaded %.1f MiB in %.1fs, %.2f MiB/s"
+                    % (
+                        stats["downloaded"]/1048576
+                        ,stats["downloadTime"]
+                        ,stats["downloaded"]/1048576/max(stats["downloadTime"],1e-6)
+                    )
+                )
+            if stats["mismatches"]:
+                core.log.send("("+host+") "+str(stats["mismatches"])+" checksum mismatches")
+
+
+    def stats(
+        self
+        ,host
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        host : string
+               The remote host whose counters are returned.
+
+        Returns
+        -------
+        ret0 : dictionary
+               A copy of the counters of the given host with the keys
+               "requests", "retries", "failures", "latency", "maxLatency",
+               "downloaded", "downloadTime", and "mismatches". Latencies and
+               download times are in seconds and downloaded sizes are in bytes.
+        """
+        with self.__lock:
+            state = self.__host_(host)
+            return {k: state[k] for k in self.__COUNTERS}
+
+
+    def transport(
+        self
+        ,url
+        ):
+        """
+        Getter method. Transports are shared by every caller accessing the same
+        host with the same protocol, so they are created the first time they
+        are requested and kept for the lifetime of this application.
+
+        Parameters
+        ----------
+        url : string
+              A remote URL whose scheme selects the registered transport
+              implementation. URLs without a scheme are accessed with FTP.
+
+        Returns
+        -------
+        ret0 : pynome.interfaces.AbstractTransport
+               The shared transport of the given URL's scheme and host.
+        """
+        (scheme,host,path) = utility.splitUrl(url)
+        with self.__lock:
+            if (scheme,host) not in self.__transports:
+                if scheme not in self.__transportClasses:
+                    raise exceptions.RemoteError(
+                        "No transport registered for URL '"+url+"'."
+                    )
+                self.__transports[(scheme,host)] = self.__transportClasses[scheme](host,scheme)
+            return self.__transports[(scheme,host)]
+
+
+    def __acquire_(
+        self
+        ,host
+        ):
+        """
+        Waits until the token bucket of the given host has a token and takes
+        it. If the circuit breaker of the given host is open then this raises a
+        remote error instead, unless its cool down has passed, in which case it
+        is half opened to let this single request through as a trial. Every
+        other request raises a remote error until the trial is recorded,
+        closing or opening the circuit breaker again.
+
+        Parameters
+        ----------
+        host : string
+               The remote host whose rate limit is waited on.
+
+        Returns
+        -------
+        ret0 : bool
+               True if this request is the trial of the half open circuit
+               breaker of the given host or false otherwise.
+        """
+        trial = False
+        while True:
+            with self.__lock:
+                state = self.__host_(host)
+                now = time.monotonic()
+                if state["openUntil"] is not None and not trial:
+                    if now < state["openUntil"] or state["trial"]:
+                        raise exceptions.RemoteError(
+                            "Circuit breaker of '"+host+"' is open."
+                        )
+                    state["trial"] = True
+                    trial = True
+                state["tokens"] = min(
+                    float(settings.requestBurst)
+                    ,state["tokens"]+(now-state["refilled"])*settings.requestRate
+                )
+                state["refilled"] = now
+                if state["tokens"] >= 1.0:
+                    state["tokens"] -= 1.0
+                    return trial
+                wait = (1.0-state["tokens"])/settings.requestRate
+            time.sleep(wait)
+
+
+    def __host_(
+        self
+        ,host
+        ):
+        """
+        Getter method. This must be called with this scheduler's lock held.
+
+        Parameters
+        ----------
+        host : string
+               A remote host.
+
+        Returns
+        -------
+        ret0 : dictionary
+               The state and counters of the given host, created if this is its
+               first request.
+        """
+        if host not in self.__hosts:
+            self.__hosts[host] = {
+                "requests": 0
+                ,"retries": 0
+                ,"failures": 0
+                ,"latency": 0.0
+                ,"maxLatency": 0.0
+                ,"downloaded": 0
+                ,"downloadTime": 0.0
+                ,"mismatches": 0
+                ,"tokens": float(settings.requestBurst)
+                ,"refilled": time.monotonic()
+                ,"consecutive": 0
+                ,"openUntil": None
+                ,"trial": False
+            }
+        return self.__hosts[host]
+
+
+    def __isOpen_(
+        self
+        ,host
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        host : string
+               A remote host.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the circuit breaker of the given host is open or false
+               otherwise.
+        """
+        with self.__lock:
+            return self.__host_(host)["openUntil"] is not None
+
+
+    def __record_(
+        self
+        ,host
+        ,latency
+        ,success
+        ,trial=False
+        ):
+        """
+        Records a finished request to the given host in its counters, opening
+        its circuit breaker if too many requests have failed in a row. If the
+        request is the trial of its half open circuit breaker then the breaker
+        is closed if it succeeded or opened again if it failed.
+
+        Parameters
+        ----------
+        host : string
+               The remote host of the finished request.
+        latency : float
+                  The time in seconds the request took.
+        success : bool
+                  True if the request reached the host or false if it failed.
+        trial : bool
+                True if the request is the trial of the half open circuit
+                breaker of the given host or false otherwise.
+        """
+        with self.__lock:
+            state = self.__host_(host)
+            state["requests"] += 1
+            state["latency"] += latency
+            state["maxLatency"] = max(state["maxLatency"],latency)
+            if trial:
+                state["trial"] = False
+            if success:
+                state["consecutive"] = 0
+                if trial:
+                    state["openUntil"] = None
+            else:
+                state["failures"] += 1
+                state["consecutive"] += 1
+                if trial or state["consecutive"] >= settings.breakerThreshold:
+                    state["openUntil"] = time.monotonic()+settings.breakerCooldown
@@ -0,0 +1,181 @@
+"""
+Contains the SpeciesFilter class.
+"""
+from . import core
+
+
+
+
+
+
+
+
+class SpeciesFilter():
+    """
+    This is the species filter class. It restricts crawling, mirroring, and
+    indexing to a subset of species, matching a species name substring, an
+    exact taxonomy ID, a clade given as the taxonomy ID of its root node, or
+    any combination of them. An empty filter matches everything. Clade matching
+    uses the lineage index of the taxonomy singleton, which is only loaded if
+    a clade is given.
+    """
+
+
+    def __init__(
+        self
+        ,species=""
+        ,clade=0
+        ,taxId=0
+        ):
+        """
+        Initializes a new species filter.
+
+        Parameters
+        ----------
+        species : string
+                  Case insensitive substring matched with the genus and species
+                  name separated by a space. If this is empty then all names
+                  match.
+        clade : int
+                The taxonomy ID of the root node of the clade whose taxonomy
+                IDs match. If this is 0 then all taxonomy IDs match.
+        taxId : int
+                The only taxonomy ID that matches. If this is 0 then all
+                taxonomy IDs match.
+        """
+        super().__init__()
+        self.__species = species.lower().replace("_"," ")
+        self.__clade = clade
+        self.__taxId = taxId
+
+
+    def hasTaxonomy(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : bool
+               True if this filter restricts taxonomy IDs, requiring a taxonomy
+               ID to be known for anything to match, or false otherwise.
+        """
+        return bool(self.__clade or self.__taxId)
+
+
+    def isEmpty(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : bool
+               True if this filter matches everything or false otherwise.
+        """
+        return not self.__species and not self.hasTaxonomy()
+
+
+    def match(
+        self
+        ,genus
+        ,species
+        ,taxId
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        genus : string
+                The genus name that is matched.
+        species : string
+                  The species name that is matched.
+        taxId : object
+                The taxonomy ID that is matched as an integer or digit string.
+                This can be None if it is unknown, which never matches if this
+                filter restricts taxonomy IDs.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given names and taxonomy ID match this filter or
+               false otherwise.
+        """
+        return self.matchName(genus,species) and self.matchTaxId(taxId)
+
+
+    def matchName(
+        self
+        ,genus
+        ,species
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        genus : string
+                The genus name that is matched.
+        species : string
+                  The species name that is matched.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given names match this filter's species name or
+               false otherwise.
+        """
+        if not self.__species:
+            return True
+        return self.__species in genus.lower()+" "+species.lower()
+
+
+    def matchTaxId(
+        self
+        ,taxId
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        taxId : object
+                The taxonomy ID that is matched as an integer or digit string.
+                This can be None if it is unknown, which never matches if this
+                filter restricts taxonomy IDs.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given taxonomy ID matches this filter's taxonomy ID
+               and clade or false otherwise.
+        """
+        if not self.hasTaxonomy():
+            return True
+        if taxId is None or not str(taxId).isdigit():
+            return False
+        taxId = int(taxId)
+        if self.__taxId and taxId != self.__taxId:
+            return False
+        if self.__clade and not core.taxonomy.index().inClade(taxId,self.__clade):
+            return False
+        return True
+
+
+    def name(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : string
+               The lower case species name substring of this filter with words
+               separated by spaces or an empty string if it does not restrict
+               names.
+        """
+        return self.__species
@@ -0,0 +1,168 @@
+"""
+Contains the Taxonomy class.
+"""
+from . import core
+import os
+from . import settings
+import tarfile
+import threading
+from . import utility
+
+
+
+
+
+
+
+
+class Taxonomy():
+    """
+    This is the singleton taxonomy class. It is responsible for synchronizing
+    the NCBI taxonomy dump with its own hidden data directory in the local
+    database and providing the binary taxonomy index built from it to any
+    crawler or filter that requires taxonomy lookups. The dump is synchronized
+    and the index loaded once, the first time it is requested.
+    """
+    __DIR_NAME = ".taxonomy"
+    __DIV_NAME = "division.dmp"
+    __FTP_HOST = "ftp.ncbi.nlm.nih.gov"
+    __NODE_NAME = "nodes.dmp"
+    __TAX_DIR = "/pub/taxonomy/"
+    __TAX_NAME = "taxdump.tar.gz"
+
+
+    def __init__(
+        self
+        ):
+        """
+        Initializes the singleton taxonomy instance.
+        """
+        self.__index = None
+        self.__lock = threading.Lock()
+
+
+    def index(
+        self
+        ):
+        """
+        Getter method. The remote taxonomy dump is synchronized and its index
+        loaded if this is the first call.
+
+        Returns
+        -------
+        ret0 : pynome.core.TaxonomyIndex
+               The loaded taxonomy index of the latest taxonomy dump.
+        """
+        with self.__lock:
+            if self.__index is None:
+                self.__index = self.__load_()
+            return self.__index
+
+
+    def __load_(
+        self
+        ):
+        """
+        Synchronizes the remote taxonomy dump with the local one and then loads
+        its taxonomy index. The taxonomy dump is only parsed to build the index
+        when the dump has changed, otherwise the index is just loaded.
+
+        Returns
+        -------
+        ret0 : pynome.core.TaxonomyIndex
+               The loaded taxonomy index.
+        """
+        dataDir = os.path.join(settings.rootPath,self.__DIR_NAME)
+        os.makedirs(dataDir,exist_ok=True)
+        tarPath = os.path.join(dataDir,self.__TAX_NAME)
+        self.__log_("Syncing taxonomy ...")
+        synced = utility.rSync("ftp://"+self.__FTP_HOST+self.__TAX_DIR+self.__TAX_NAME,tarPath)
+        st = os.stat(tarPath)
+        version = str(st.st_size)+"-"+str(int(st.st_mtime))
+        self.__log_("Loading taxonomy ...")
+        ret = core.TaxonomyIndex(dataDir)
+        if synced or not ret.load(version):
+            self.__log_("Building taxonomy index ...")
+            divisions = []
+            ret.build(version,self.__readTaxonomy_(tarPath,divisions),divisions)
+        return ret
+
+
+    def __log_(
+        self
+        ,message
+        ):
+        """
+        Adds the given message to the logging system, tagged as coming from the
+        taxonomy.
+
+        Parameters
+        ----------
+        message : string
+                  Message that is sent to the logging system.
+        """
+        core.log.send("(taxonomy) "+message)
+
+
+    def __readDump_(
+        self
+        ,ifile
+        ,columns
+        ):
+        """
+        Generator method that reads the given taxonomy dump file one line at a
+        time, yielding the given columns of each line.
+
+        Parameters
+        ----------
+        ifile : object
+                A binary file object of a taxonomy dump file.
+        columns : tuple
+                  The indexes of the columns that are yielded. Columns that are
+                  digits are converted to integers.
+
+        Returns
+        -------
+        ret0 : tuple
+               The given columns of the yielded line.
+        """
+        for line in ifile:
+            parts = line.decode().split("\t|\t")
+            yield tuple(
+                int(parts[i]) if parts[i].isdigit() else parts[i].strip("\t|\n")
+                for i in columns
+            )
+
+
+    def __readTaxonomy_(
+        self
+        ,tarPath
+        ,divisions
+        ):
+        """
+        Generator method that streams the taxonomy dump tarball at the given
+        path in a single pass, parsing only the nodes and division dump files as
+        they are decompressed without writing anything to disk. All divisions
+        are appended to the given list, which is complete once this generator is
+        exhausted.
+
+        Parameters
+        ----------
+        tarPath : string
+                  The full path to the local taxonomy dump tarball.
+        divisions : list
+                    The list that the integer ID and code of every division is
+                    appended to.
+
+        Returns
+        -------
+        ret0 : tuple
+               The integer taxonomy ID, parent taxonomy ID, and division ID of
+               the yielded taxonomy node.
+        """
+        with tarfile.open(tarPath,"r|gz") as tar:
+            for member in tar:
+                if member.name == self.__DIV_NAME:
+                    divisions.extend(self.__readDump_(tar.extractfile(member),(0,1)))
+                elif member.name == self.__NODE_NAME:
+                    yield from self.__readDump_(tar.extractfile(member),(0,1,4))
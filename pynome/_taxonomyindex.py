@@ -0,0 +1,324 @@
+"""
+Contains the TaxonomyIndex class.
+"""
+import array
+import json
+import mmap
+import os
+from . import utility
+
+
+
+
+
+
+
+
+class TaxonomyIndex():
+    """
+    This is the taxonomy index class. It is a compact binary index of the NCBI
+    taxonomy nodes saved to a directory, mapping each taxonomy ID to its
+    division and lineage. The division of every taxonomy ID is stored as a flat
+    array indexed by taxonomy ID, so building the index from the taxonomy dump
+    is done once per dump version and loading it is just memory mapping its
+    files. A lineage index is also stored, numbering all nodes in depth first
+    order so every clade is a contiguous range of numbers.
+    """
+    __DIVISIONS_NAME = "taxonomy.divisions"
+    __EXTENTS_NAME = "taxonomy.extents"
+    __FORMAT = 3
+    __HEADER_NAME = "taxonomy.json"
+    __NO_DIVISION = 255
+    __ORDERS_NAME = "taxonomy.orders"
+
+
+    def __init__(
+        self
+        ,directory
+        ):
+        """
+        Initializes a new taxonomy index.
+
+        Parameters
+        ----------
+        directory : string
+                    The full path to the directory where the files of this
+                    index are saved.
+        """
+        super().__init__()
+        self.__directory = directory
+        self.__header = None
+        self.__divisions = None
+        self.__orders = None
+        self.__extents = None
+
+
+    def build(
+        self
+        ,version
+        ,nodes
+        ,divisions
+        ):
+        """
+        Builds and saves this index from the given taxonomy nodes and divisions
+        and then loads it.
+
+        Parameters
+        ----------
+        version : string
+                  The version of the taxonomy dump this index is built from.
+        nodes : iterable
+                Tuples of the integer taxonomy ID, parent taxonomy ID, and
+                division ID of every taxonomy node.
+        divisions : iterable
+                    Tuples of the integer division ID and division code of every
+                    taxonomy division.
+        """
+        parents = array.array("I")
+        divs = bytearray()
+        for (taxId,parent,division) in nodes:
+            if taxId >= len(parents):
+                grow = max(taxId+1,2*len(parents))-len(parents)
+                parents.frombytes(bytes(grow*parents.itemsize))
+                divs.extend(bytes([self.__NO_DIVISION])*grow)
+            parents[taxId] = parent
+            divs[taxId] = division
+        size = 0
+        for taxId in range(len(divs)-1,-1,-1):
+            if divs[taxId] != self.__NO_DIVISION:
+                size = taxId+1
+                break
+        del parents[size:]
+        del divs[size:]
+        (orders,extents) = self.__buildLineage_(parents,divs)
+        for (name,data) in (
+            (self.__DIVISIONS_NAME,divs)
+            ,(self.__ORDERS_NAME,orders)
+            ,(self.__EXTENTS_NAME,extents)
+        ):
+            with open(os.path.join(self.__directory,name),"wb") as ofile:
+                ofile.write(data)
+        utility.saveJson(
+            os.path.join(self.__directory,self.__HEADER_NAME)
+            ,{
+                "format": self.__FORMAT
+                ,"version": version
+                ,"size": size
+                ,"divisions": {code: i for (i,code) in divisions}
+            }
+        )
+        self.load(version)
+
+
+    def divisionMask(
+        self
+        ,codes
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        codes : list
+                Division codes, such as "PLN", that are accepted.
+
+        Returns
+        -------
+        ret0 : bytes
+               A lookup table indexed by taxonomy ID that is 1 for taxonomy IDs
+               that are part of one of the given divisions and 0 otherwise.
+        """
+        table = bytearray(256)
+        for code in codes:
+            if code in self.__header["divisions"]:
+                table[self.__header["divisions"][code]] = 1
+        return self.__divisions[:].translate(table)
+
+
+    def inClade(
+        self
+        ,taxId
+        ,cladeId
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        taxId : int
+                A taxonomy ID.
+        cladeId : int
+                  The taxonomy ID of the root node of a clade.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given taxonomy ID is the given clade root or one of
+               its descendants or false otherwise.
+        """
+        if not self.__exists_(taxId) or not self.__exists_(cladeId):
+            return False
+        return self.__orders[cladeId] <= self.__orders[taxId] < self.__extents[cladeId]
+
+
+    def load(
+        self
+        ,version
+        ):
+        """
+        Loads this index from its saved files if they exist and were built from
+        the given taxonomy dump version.
+
+        Parameters
+        ----------
+        version : string
+                  The version of the taxonomy dump this index must be built
+                  from.
+
+        Returns
+        -------
+        ret0 : bool
+               True if this index was loaded or false if it must be built.
+        """
+        path = os.path.join(self.__directory,self.__HEADER_NAME)
+        if not os.path.isfile(path):
+            return False
+        with open(path,"r") as ifile:
+            header = json.loads(ifile.read())
+        if header.get("format") != self.__FORMAT or header["version"] != version:
+            return False
+        self.__header = header
+        self.__divisions = self.__map_(self.__DIVISIONS_NAME)
+        self.__orders = memoryview(self.__map_(self.__ORDERS_NAME)).cast("I")
+        self.__extents = memoryview(self.__map_(self.__EXTENTS_NAME)).cast("I")
+        return True
+
+
+    def __buildLineage_(
+        self
+        ,parents
+        ,divs
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        parents : array.array
+                  The parent taxonomy ID of every taxonomy ID.
+        divs : bytearray
+               The division ID of every taxonomy ID, which is the no division
+               value for taxonomy IDs that do not exist.
+
+        Returns
+        -------
+        ret0 : array.array
+               The depth first order number of every taxonomy ID.
+        ret1 : array.array
+               One past the last order number of any descendant of every
+               taxonomy ID.
+        """
+        size = len(parents)
+        starts = array.array("I",bytes(parents.itemsize*(size+1)))
+        roots = []
+        for taxId in range(size):
+            if divs[taxId] != self.__NO_DIVISION:
+                parent = parents[taxId]
+                if parent == taxId or not self.__present_(parent,divs):
+                    roots.append(taxId)
+                else:
+                    starts[parent+1] += 1
+        for i in range(size):
+            starts[i+1] += starts[i]
+        children = array.array("I",bytes(parents.itemsize*starts[size]))
+        fill = array.array("I",starts)
+        for taxId in range(size):
+            if divs[taxId] != self.__NO_DIVISION:
+                parent = parents[taxId]
+                if parent != taxId and self.__present_(parent,divs):
+                    children[fill[parent]] = taxId
+                    fill[parent] += 1
+        orders = array.array("I",bytes(parents.itemsize*size))
+        extents = array.array("I",bytes(parents.itemsize*size))
+        visited = array.array("I")
+        stack = roots[::-1]
+        while stack:
+            taxId = stack.pop()
+            orders[taxId] = len(visited)
+            visited.append(taxId)
+            stack.extend(children[starts[taxId]:starts[taxId+1]])
+        sizes = array.array("I",[1])*size
+        for taxId in reversed(visited):
+            extents[taxId] = orders[taxId]+sizes[taxId]
+            parent = parents[taxId]
+            if parent != taxId and self.__present_(parent,divs):
+                sizes[parent] += sizes[taxId]
+        return (orders,extents)
+
+
+    def __exists_(
+        self
+        ,taxId
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        taxId : int
+                A taxonomy ID.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given taxonomy ID is a node of this loaded index or
+               false otherwise.
+        """
+        return self.__present_(taxId,self.__divisions)
+
+
+    def __map_(
+        self
+        ,name
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        name : string
+               The file name of one of this index's saved arrays.
+
+        Returns
+        -------
+        ret0 : mmap.mmap
+               A read only memory map of the given saved array.
+        """
+        with open(os.path.join(self.__directory,name),"rb") as ifile:
+            if not os.fstat(ifile.fileno()).st_size:
+                return b""
+            return mmap.mmap(ifile.fileno(),0,access=mmap.ACCESS_READ)
+
+
+    def __present_(
+        self
+        ,taxId
+        ,divs
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        taxId : int
+                A taxonomy ID.
+        divs : object
+               The division array of an index being built or loaded.
+
+        Returns
+        -------
+        ret0 : bool
+               True if the given taxonomy ID is a node of the given division
+               array or false otherwise.
+        """
+        return 0 <= taxId < len(divs) and divs[taxId] != self.__NO_DIVISION
@@ -1,6 +1,7 @@
 """
 Contains the WriteCDNATask class.
 """
+from . import core
 from . import interfaces
 import os
 import subprocess
@@ -15,7 +16,8 @@ import subprocess
 class WriteCDNATask(interfaces.AbstractTask):
     """
     This is the write CDNA task. It implements the abstract task interface. This
-    writes the local CDNA Fasta file with gffread.
+    writes the local CDNA Fasta file with gffread and adds it to the content
+    store singleton.
     """
 
 
@@ -34,6 +36,7 @@ class WriteCDNATask(interfaces.AbstractTask):
         if not os.path.isfile(basePath+".fa") or not os.path.isfile(basePath+".gtf"):
             return False
         self._log_("Writing CDNA from GTF")
+        core.store.detach(basePath+".cdna.fa")
         try:
             cmd = ["gffread","-w",basePath+".cdna.fa","-g",basePath+".fa",basePath+".gtf"]
             assert(subprocess.run(cmd,capture_output=True).returncode==0)
@@ -44,6 +47,7 @@ class WriteCDNATask(interfaces.AbstractTask):
         finally:
             cmd = ["rm","-fr",basePath+".fa.fai"]
             subprocess.run(cmd)
+        core.store.add(basePath+".cdna.fa")
         return True
 
 
@@ -1,6 +1,7 @@
 """
 Contains the WriteGtfTask class.
 """
+from . import core
 from . import interfaces
 import os
 import subprocess
@@ -15,8 +16,9 @@ import subprocess
 class WriteGtfTask(interfaces.AbstractTask):
     """
     This is the write Gtf task. It implements the abstract task interface. This
-    writes the local Gtf file with gffread. If the Gtf URL entry in the metadata
-    is not empty then this does nothing.
+    writes the local Gtf file with gffread and adds it to the content store
+    singleton. If the Gtf URL entry in the metadata is not empty then this does
+    nothing.
     """
 
 
@@ -40,10 +42,12 @@ class WriteGtfTask(interfaces.AbstractTask):
         tPath = os.path.join(self._workDir_(),"temp.gff")
         cmd = ["cp",basePath+".gff",tPath]
         assert(subprocess.run(cmd).returncode==0)
+        core.store.detach(basePath+".gtf")
         cmd = ["gffread","-T",tPath,"-o",basePath+".gtf"]
         assert(subprocess.run(cmd).returncode==0)
         cmd = ["rm",tPath]
         assert(subprocess.run(cmd).returncode==0)
+        core.store.add(basePath+".gtf")
         return True
 
 
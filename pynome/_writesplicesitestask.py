@@ -1,6 +1,7 @@
 """
 Contains the WriteSpliceSitesTask class.
 """
+from . import core
 from . import interfaces
 import os
 import subprocess
@@ -15,7 +16,8 @@ import subprocess
 class WriteSpliceSitesTask(interfaces.AbstractTask):
     """
     This is the write splice sites task. It implements the abstract task
-    interface. This writes the local splice sites file with gffread.
+    interface. This writes the local splice sites file with gffread and adds it
+    to the content store singleton.
     """
 
 
@@ -33,10 +35,12 @@ class WriteSpliceSitesTask(interfaces.AbstractTask):
         basePath = os.path.join(self._workDir_(),self._rootName_())
         if not os.path.isfile(basePath+".gtf"):
             return False
+        core.store.detach(basePath+".Splice_sites")
         with open(basePath+".Splice_sites",'w') as ofile:
             self._log_("Writing Spice sites from GTF")
             cmd = ['hisat2_extract_splice_sites.py',basePath+".gtf"]
             assert(subprocess.run(cmd,stdout=ofile).returncode==0)
+        core.store.add(basePath+".Splice_sites")
         return True
 
 
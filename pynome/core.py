@@ -3,7 +3,20 @@ Contains all core classes, functions, and objects of this application.
 """
 
 from ._assembly import Assembly
+from ._checksumoracle import ChecksumOracle
+from ._contentstore import ContentStore
+from ._crawlengine import CrawlEngine
+from ._downloader import Downloader
+from ._freshnessoracle import FreshnessOracle
+from ._ftppool import FTPPool
+from ._httppool import HTTPPool
+from ._indexparser import IndexParser
 from ._log import Log
+from ._mirrorengine import MirrorEngine
+from ._scheduler import Scheduler
+from ._speciesfilter import SpeciesFilter
+from ._taxonomy import Taxonomy
+from ._taxonomyindex import TaxonomyIndex
 
 
 
@@ -13,4 +26,9 @@ from ._log import Log
 
 
 assembly = Assembly()
+checksums = ChecksumOracle()
+freshness = FreshnessOracle()
 log = Log()
+scheduler = Scheduler()
+store = ContentStore()
+taxonomy = Taxonomy()
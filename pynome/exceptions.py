@@ -9,9 +9,77 @@ Contains all custom exception classes for this application.
 
 
 
+class DownloadError(Exception):
+    """
+    This is the download error exception. This represents a remote file whose
+    download failed or stalled, keeping the URL of the file and the number of
+    bytes that were downloaded before it failed.
+    """
+
+
+    def __init__(
+        self
+        ,url
+        ,received
+        ,reason
+        ):
+        """
+        Initializes a new download error.
+
+        Parameters
+        ----------
+        url : string
+              The URL of the remote file whose download failed.
+        received : int
+                   The number of bytes downloaded before the download failed.
+        reason : string
+                 Description of why the download failed.
+        """
+        super().__init__(
+            "Download of '"+url+"' failed after "+str(received)+" bytes: "+reason
+        )
+        self.url = url
+        self.received = received
+        self.reason = reason
+
+
+
+
+class ChecksumError(DownloadError):
+    """
+    This is the checksum error exception. This represents a downloaded remote
+    file whose data does not match the checksum published by its upstream
+    server.
+    """
+    pass
+
+
+
+
 class RegisterError(Exception):
     """
     This is the register error exception. This represents an error in
     registering a new crawler or mirror implementation.
     """
     pass
+
+
+
+
+class RemoteError(Exception):
+    """
+    This is the remote error exception. This represents a request to a remote
+    server that failed after all of its retries or was refused because the
+    circuit breaker of its host is open.
+    """
+    pass
+
+
+
+
+class RangeError(RemoteError):
+    """
+    This is the range error exception. This represents a remote server that
+    ignored a request for a byte range of a file.
+    """
+    pass
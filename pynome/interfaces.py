@@ -6,3 +6,4 @@ import abc
 from ._abstractcrawler import AbstractCrawler
 from ._abstractprocess import AbstractProcess
 from ._abstracttask import AbstractTask
+from ._abstracttransport import AbstractTransport
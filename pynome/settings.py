@@ -11,5 +11,27 @@ import os
 
 
 JOB_NAME = "pynome_work_%05d.txt"
+backoffBase = 1.0
+backoffMax = 60.0
+breakerCooldown = 60.0
+breakerThreshold = 5
+checkpointInterval = 60
+checksumRetries = 2
 cpuCount = os.cpu_count()
+deduplicate = True
+downloadBlockSize = 1048576
+hostConnections = 4
+mirrorJobs = 8
+progressInterval = 60.0
+recrawl = False
+requestBurst = 10
+requestRate = 10.0
+requestRetries = 5
+resumeDecompressed = False
 rootPath = os.path.join(os.path.expanduser("~"),"species")
+segmentCount = 4
+segmentThreshold = 268435456
+sessionCheckInterval = 15.0
+sessionIdleTimeout = 120.0
+stallTimeout = 60.0
+transports = {}
@@ -0,0 +1,6 @@
+"""
+Contains all abstract transport implementations.
+"""
+
+from ._ftptransport import FTPTransport
+from ._httptransport import HTTPTransport
@@ -1,67 +1,258 @@
 """
 Contains utility functions used throughout this application.
 """
+from . import core
 import datetime
+from . import exceptions
 import os
 import ftplib
-import subprocess
+import json
+from . import settings
 import traceback
 
 
 
 
+def createTemp(
+    path
+    ,mode="w"
+    ,buffering=-1
+    ):
+    """
+    Creates a new uniquely named temporary file in the directory of the given
+    path and opens it. Unlike the temporary files of the tempfile module it is
+    created with the regular file permissions allowed by the umask, so the file
+    that replaces the given path can still be read by the other users of the
+    local database.
+
+    Parameters
+    ----------
+    path : string
+           The full path of the file the temporary file later replaces.
+    mode : string
+           The mode the temporary file is opened with, "w" for text or "wb" for
+           binary.
+    buffering : int
+                The buffering policy the temporary file is opened with.
+
+    Returns
+    -------
+    ret0 : file
+           The opened temporary file.
+    ret1 : string
+           The full path to the temporary file.
+    """
+    while True:
+        tmpPath = os.path.join(os.path.dirname(path),".tmp-"+os.urandom(6).hex())
+        try:
+            return (open(tmpPath,mode.replace("w","x"),buffering=buffering),tmpPath)
+        except FileExistsError:
+            continue
+
+
+
+
+def listDirectory(
+    ftp
+    ,directory
+    ):
+    """
+    Getter function. The given directory is listed with the MLSD command,
+    falling back to parsing the output of the LIST command if the remote server
+    does not support MLSD.
+
+    Parameters
+    ----------
+    ftp : ftplib.FTP
+          The logged in FTP connection used to list the given directory.
+    directory : string
+                The remote directory path that is listed.
+
+    Returns
+    -------
+    ret0 : list
+           Tuples of the file name and facts of every entry of the given
+           directory, excluding its current and parent entries. The facts are a
+           dictionary with the keys "type", "size", and "modify". The type is
+           "dir", "file", or "link", the size is an integer or None if unknown,
+           and the modify time is a "YYYYMMDDHHMMSS" string or empty if unknown.
+    """
+    if ftp.host not in _NO_MLSD:
+        try:
+            ret = []
+            for (name,facts) in ftp.mlsd(directory,["type","size","modify"]):
+                type_ = facts.get("type","").lower()
+                if type_ in ("cdir","pdir"):
+                    continue
+                if type_.startswith("os.unix=sl"):
+                    type_ = "link"
+                size = facts.get("size","")
+                ret.append((
+                    name
+                    ,{
+                        "type": type_
+                        ,"size": int(size) if size.isdigit() else None
+                        ,"modify": facts.get("modify","")[:14]
+                    }
+                ))
+            return ret
+        except ftplib.error_perm as e:
+            if not str(e)[:3] in ("500","501","502","504"):
+                raise
+            _NO_MLSD.add(ftp.host)
+    lines = []
+    ftp.retrlines("LIST "+directory,lines.append)
+    ret = []
+    for line in lines:
+        entry = _parseListLine(line)
+        if entry is not None and entry[0] not in (".",".."):
+            ret.append(entry)
+    return ret
+
+
+
+
 def rSync(
     url
     ,path
     ,compare=""
+    ,validators=None
+    ,decompress=False
+    ,store=False
     ):
     """
     Synchronizes the given remote URL file with the given local path. An
-    optional comparison path is provided, which is used to compare the timestamp
-    with the remote URL if given instead of the regular path.
+    optional comparison path is provided, which is used to check the local file
+    exists if given instead of the regular path. If validators of the remote
+    file are given then it is downloaded only if the remote file changed
+    compared with them, using a conditional request if its transport supports
+    them, and they are updated after every download. Without validators the
+    remote timestamp is compared with the timestamp of the local file. Remote
+    facts are answered by the freshness oracle singleton. The remote file is
+    downloaded with a downloader, optionally decompressing it on the fly, and
+    replaces the local path once it is complete. If its upstream server
+    publishes a checksum for it then the download is verified while it
+    streams, logging and retrying any mismatch. A download error is raised if
+    it fails.
 
     Parameters
     ----------
     url : string
-          The remote FTP URL of a file that is synchronized with the given local
-          path.
+          The remote FTP or HTTP(S) URL of a file that is synchronized with the
+          given local path.
     path : string
            The full path to the local file that is synchronized with the given
            remote URL.
     compare : string
-              The full path to the local file used to compare the timestamp with
-              the remote in reference to synchronization. The regular path is
-              still used when downloading the remote file if it is newer that
-              this compared local file. If this string is empty then it is
-              ignored.
+              The full path to the local file used to compare with the remote
+              in reference to synchronization. The regular path is still used
+              when downloading the remote file if it is newer that this compared
+              local file. If this string is empty then it is ignored.
+    validators : dictionary
+                 The last seen validators of the remote file in the same format
+                 as the validators of tasks, which are updated in place. If this
+                 is empty then validators are adopted from the remote file if
+                 the local file is up to date by its timestamp.
+    decompress : bool
+                 True to decompress the gzip compressed remote file while it is
+                 downloaded, writing only the decompressed file to the given
+                 path, or false to write it unchanged.
+    store : bool
+            True to add the downloaded file to the content store singleton
+            with the digest computed while it was downloaded or false
+            otherwise.
+
+    Returns
+    -------
+    ret0 : bool
+           True if the remote file was downloaded or false otherwise.
     """
     if not compare:
         compare = path
-    download = False
-    if not os.path.isfile(compare):
-        download = True
-    else:
-        rts = timeStamp(url)
-        lts = datetime.datetime.fromtimestamp(os.stat(compare).st_mtime+DAY)
-        lts = lts.strftime("%Y%m%d%H%M%S")
-        if rts > lts:
-            download = True
-    if download:
-        cmd = [
-            "wget"
-            ,url
-            ,"-O"
-            ,path
-        ]
-        assert(subprocess.run(cmd,capture_output=True).returncode==0)
-        return True
-    else:
+    transport = core.scheduler.transport(url)
+    exists = os.path.isfile(compare)
+    conditional = (
+        exists
+        and validators is not None
+        and transport.conditional()
+        and bool(validators.get("etag") or validators.get("modify"))
+    )
+    facts = None
+    if not conditional:
+        try:
+            facts = core.freshness.facts(url)
+        except:
+            traceback.print_exc()
+    if exists and not conditional:
+        if facts is None:
+            return False
+        changed = _hasChanged(validators or {},facts)
+        if changed is None:
+            lts = datetime.datetime.fromtimestamp(os.stat(compare).st_mtime+DAY)
+            changed = facts["modify"] > lts.strftime("%Y%m%d%H%M%S")
+            if not changed and validators is not None and not transport.conditional():
+                validators.update({k: facts[k] for k in ("size","modify") if facts[k]})
+        if not changed:
+            return False
+    checksum = core.checksums.expected(url)
+    attempt = 0
+    while True:
+        downloader = core.Downloader(url,decompress=decompress,checksum=checksum)
+        try:
+            reported = downloader.run(path,validators if conditional else None)
+            break
+        except exceptions.ChecksumError as e:
+            core.scheduler.recordMismatch(transport.host())
+            core.log.send(str(e))
+            attempt += 1
+            if attempt > settings.checksumRetries:
+                raise
+    if reported is None:
         return False
+    if validators is not None:
+        validators.clear()
+        if facts is not None and not transport.conditional():
+            validators.update({k: facts[k] for k in ("size","modify") if facts[k]})
+        validators.update(reported)
+        validators["checksum"] = downloader.digest()
+    if store:
+        core.store.add(path,downloader.contentDigest())
+    return True
+
+
+
 
+def saveJson(
+    path
+    ,data
+    ,indent=None
+    ):
+    """
+    Saves the given data as JSON to the given path atomically, writing it to a
+    temporary file in the same directory that then replaces the given path.
+
+    Parameters
+    ----------
+    path : string
+           The full path of the JSON file that is written.
+    data : object
+           The JSON compatible data that is saved.
+    indent : int
+             The indent level of the written JSON or None for compact JSON.
+    """
+    (ofile,tmpPath) = createTemp(path)
+    try:
+        with ofile:
+            ofile.write(json.dumps(data,indent=indent) + "\n")
+        os.replace(tmpPath,path)
+    except:
+        os.remove(tmpPath)
+        raise
 
 
 
-def timeStamp(
+
+def splitUrl(
     url
     ):
     """
@@ -70,26 +261,164 @@ def timeStamp(
     Parameters
     ----------
     url : string
-          The FTP URL of a remote file whose FTP timestamp is returned.
+          A remote URL, with or without its scheme.
 
     Returns
     -------
     ret0 : string
-           The FTP timestamp of the remote file location at the given URL.
+           The lower case scheme of the given URL, which is "ftp" if it has
+           none.
+    ret1 : string
+           The host of the given URL.
+    ret2 : string
+           The path of the given URL, starting with a slash.
     """
+    scheme = "ftp"
     d = url.find("://")
     if d != -1:
+        scheme = url[:d].lower()
         url = url[d+3:]
-    site = url[:url.find("/")]
-    path = url[url.find("/"):]
+    if url.find("/") == -1:
+        return (scheme,url,"/")
+    return (scheme,url[:url.find("/")],url[url.find("/"):])
+
+
+
+
+def statFile(
+    ftp
+    ,path
+    ):
+    """
+    Getter function. The given file is stated with a single MLST command,
+    falling back to the MDTM and SIZE commands if the remote server does not
+    support MLST.
+
+    Parameters
+    ----------
+    ftp : ftplib.FTP
+          The logged in FTP connection used to state the given file. It must be
+          in binary transfer mode for the size of the file to be exact.
+    path : string
+           The remote file path that is stated.
+
+    Returns
+    -------
+    ret0 : dictionary
+           The facts of the given remote file in the same format returned by
+           the list directory function. A permanent FTP error is raised if it
+           does not exist.
+    """
+    if ftp.host not in _NO_MLST:
+        try:
+            for line in ftp.sendcmd("MLST "+path).splitlines()[1:]:
+                if not line.startswith(" "):
+                    continue
+                facts = {}
+                for fact in line.strip().split(" ",1)[0].split(";"):
+                    if "=" in fact:
+                        (key,value) = fact.split("=",1)
+                        facts[key.lower()] = value
+                type_ = facts.get("type","").lower()
+                if type_.startswith("os.unix=sl"):
+                    type_ = "link"
+                size = facts.get("size","")
+                return {
+                    "type": type_
+                    ,"size": int(size) if size.isdigit() else None
+                    ,"modify": facts.get("modify","")[:14]
+                }
+        except ftplib.error_perm as e:
+            if not str(e)[:3] in ("500","501","502","504"):
+                raise
+            _NO_MLST.add(ftp.host)
+    modify = ftp.sendcmd("MDTM "+path).split()[-1].strip()
+    return {"type": "file", "size": ftp.size(path), "modify": modify[:14]}
+
+
+
+
+def _hasChanged(
+    validators
+    ,facts
+    ):
+    """
+    Getter function.
+
+    Parameters
+    ----------
+    validators : dictionary
+                 The last seen validators of a remote file.
+    facts : dictionary
+            The current facts of the same remote file in the same format
+            returned by the list directory function.
+
+    Returns
+    -------
+    ret0 : bool
+           True if the size or modify time of the given facts differ from the
+           given validators, false if they match, or None if neither is known
+           by both of them.
+    """
+    ret = None
+    for key in ("size","modify"):
+        if validators.get(key) and facts.get(key):
+            if validators[key] != facts[key]:
+                return True
+            ret = False
+    return ret
+
+
+
+
+def _parseListLine(
+    line
+    ):
+    """
+    Getter function.
+
+    Parameters
+    ----------
+    line : string
+           A single line of output from the FTP LIST command in the common unix
+           "ls -l" format.
+
+    Returns
+    -------
+    ret0 : tuple
+           The file name and facts of the given line in the same format
+           returned by the list directory function or None if the line could
+           not be parsed.
+    """
+    parts = line.split(None,8)
+    if len(parts) < 9 or parts[0][0] not in "-dl":
+        return None
+    type_ = {"-": "file", "d": "dir", "l": "link"}[parts[0][0]]
+    name = parts[8]
+    if type_ == "link":
+        name = name.split(" -> ")[0]
     try:
-        ftp = ftplib.FTP(site)
-        ftp.login()
-        ts = ftp.voidcmd("MDTM "+path)
-        return ts.split()[-1].strip()
-    except:
-        traceback.print_exc()
-        return "0"
+        if ":" in parts[7]:
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            when = datetime.datetime.strptime(
+                " ".join((parts[5],parts[6],str(now.year),parts[7]))
+                ,"%b %d %Y %H:%M"
+            )
+            if when > now+datetime.timedelta(days=1):
+                when = when.replace(year=now.year-1)
+        else:
+            when = datetime.datetime.strptime(" ".join(parts[5:8]),"%b %d %Y")
+        modify = when.strftime("%Y%m%d%H%M%S")
+    except ValueError:
+        modify = ""
+    return (
+        name
+        ,{
+            "type": type_
+            ,"size": int(parts[4]) if parts[4].isdigit() else None
+            ,"modify": modify
+        }
+    )
 
 
 
@@ -99,3 +428,5 @@ def timeStamp(
 
 
 DAY = 86400
+_NO_MLSD = set()
+_NO_MLST = set()
@@ -0,0 +1,129 @@
+"""
+Tests resuming an interrupted crawl of the crawl engine from its checkpoint.
+"""
+from pynome import core
+import os
+import tempfile
+import unittest
+
+
+
+
+
+
+
+
+class FakeTransport():
+    """
+    This is the fake transport class. It lists a fixed remote directory tree
+    and records every directory it lists.
+    """
+    TREE = {
+        "/": ["a/","b/","top.gz"]
+        ,"/a/": ["c/","a.gz"]
+        ,"/a/c/": ["c.gz"]
+        ,"/b/": ["b.gz"]
+    }
+
+
+    def __init__(
+        self
+        ):
+        """
+        Initializes a new fake transport.
+        """
+        self.listed = []
+
+
+    def list(
+        self
+        ,path
+        ):
+        """
+        Lists the given directory of the fixed tree.
+        """
+        self.listed.append(path)
+        return [
+            (n.rstrip("/"),{"type": "dir" if n.endswith("/") else "file"})
+            for n in self.TREE[path]
+        ]
+
+
+    def size(
+        self
+        ):
+        """
+        Getter method.
+        """
+        return 2
+
+
+
+
+class CrawlEngineTestCase(unittest.TestCase):
+    """
+    This is the crawl engine test case class. It crawls a fixed remote tree,
+    interrupting the crawl and resuming it from its checkpoint.
+    """
+
+
+    def setUp(
+        self
+        ):
+        """
+        Creates the path of the checkpoint of this test case.
+        """
+        self.checkpoint = os.path.join(tempfile.mkdtemp(),"crawl.json")
+
+
+    def testResume(
+        self
+        ):
+        """
+        Tests that an interrupted crawl saves its checkpoint and that crawling
+        again resumes from its frontier and results, listing again only the
+        directories that were not visited, and removes the checkpoint once it
+        is complete.
+        """
+        transport = FakeTransport()
+        def interrupt(results,item,listing):
+            if item[0] == "/a/":
+                raise KeyboardInterrupt()
+            return self.__visit_(results,item,listing)
+        with self.assertRaises(KeyboardInterrupt):
+            core.CrawlEngine(transport).crawl([("/",)],interrupt,{"files": []},self.checkpoint)
+        self.assertTrue(os.path.isfile(self.checkpoint))
+        transport.listed = []
+        results = core.CrawlEngine(transport).crawl(
+            [("/",)]
+            ,self.__visit_
+            ,{"files": []}
+            ,self.checkpoint
+        )
+        self.assertEqual(
+            sorted(results["files"])
+            ,["/a/a.gz","/a/c/c.gz","/b/b.gz","/top.gz"]
+        )
+        self.assertNotIn("/",transport.listed)
+        self.assertIn("/a/",transport.listed)
+        self.assertEqual(len(set(transport.listed)),len(transport.listed))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+
+    def __visit_(
+        self
+        ,results
+        ,item
+        ,listing
+        ):
+        """
+        Adds the files of the given listing to the given results and returns
+        its directories as new work items.
+        """
+        ret = []
+        for (name,facts) in listing:
+            if facts["type"] == "dir":
+                ret.append((item[0]+name+"/",))
+            else:
+                results["files"].append(item[0]+name)
+        return ret
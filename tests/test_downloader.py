@@ -0,0 +1,272 @@
+"""
+Tests resuming interrupted single stream and segmented downloads from their
+partial file against a local http.server whose first response of a file is cut
+off half way.
+"""
+import errno
+import functools
+import hashlib
+import http.server
+import json
+import os
+from pynome import core
+from pynome import exceptions
+from pynome import settings
+from pynome import transports
+from pynome import utility
+import random
+import tempfile
+import threading
+import unittest
+
+
+
+
+
+
+
+
+class CutHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    This is the cut handler class. It serves the files of a directory like the
+    simple HTTP request handler, additionally answering single byte range
+    requests with partial content, and closes the connection half way through
+    the first response of every file. The range header of every GET request of
+    a file is recorded.
+    """
+    protocol_version = "HTTP/1.1"
+    cut = set()
+    lock = threading.Lock()
+    ranges = []
+
+
+    def do_GET(
+        self
+        ):
+        """
+        Answers a GET request, with partial content if it has a range header,
+        cutting off the first response of every file.
+        """
+        path = self.translate_path(self.path)
+        rangeHeader = self.headers.get("Range")
+        if not os.path.isfile(path):
+            super().do_GET()
+            return
+        self.ranges.append(rangeHeader)
+        with open(path,"rb") as ifile:
+            data = ifile.read()
+        (first,last) = (0,len(data)-1)
+        if rangeHeader:
+            (first,end) = rangeHeader[len("bytes="):].split("-")
+            first = int(first)
+            last = min(int(end),last) if end else last
+        body = data[first:last+1]
+        self.send_response(206 if rangeHeader else 200)
+        if rangeHeader:
+            self.send_header("Content-Range","bytes %d-%d/%d" % (first,last,len(data)))
+        self.send_header("Content-Length",str(len(body)))
+        self.send_header("Last-Modified",self.date_time_string(int(os.path.getmtime(path))))
+        self.end_headers()
+        with self.lock:
+            cut = path not in self.cut
+            self.cut.add(path)
+        if cut:
+            self.wfile.write(body[:len(body)//2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+    def log_message(
+        self
+        ,*args
+        ):
+        """
+        Discards the log messages of the server.
+        """
+        pass
+
+
+
+
+class DownloaderTestCase(unittest.TestCase):
+    """
+    This is the downloader test case class. Every test downloads a file of its
+    own local HTTP server without retries, so a cut off response fails the
+    download, restoring the changed settings afterwards.
+    """
+    __SETTINGS = (
+        "checkpointInterval"
+        ,"requestRetries"
+        ,"rootPath"
+        ,"segmentCount"
+        ,"segmentThreshold"
+    )
+
+
+    def setUp(
+        self
+        ):
+        """
+        Starts the local HTTP server with a single file.
+        """
+        self.serverRoot = tempfile.mkdtemp()
+        self.data = random.Random(0).randbytes(300000)
+        self.remotePath = os.path.join(self.serverRoot,"genome.fa")
+        with open(self.remotePath,"wb") as ofile:
+            ofile.write(self.data)
+        os.utime(self.remotePath,(1600000000,1600000000))
+        self.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1",0)
+            ,functools.partial(CutHandler,directory=self.serverRoot)
+        )
+        threading.Thread(target=self.server.serve_forever,daemon=True).start()
+        self.url = "http://127.0.0.1:%d/genome.fa" % self.server.server_address[1]
+        self.saved = {name: getattr(settings,name) for name in self.__SETTINGS}
+        settings.requestRetries = 0
+        settings.rootPath = tempfile.mkdtemp()
+        settings.segmentThreshold = len(self.data)+1
+        self.path = os.path.join(settings.rootPath,"genome.fa")
+        core.log.setEcho(False)
+        try:
+            core.scheduler.registerTransport("http",transports.HTTPTransport)
+        except exceptions.RegisterError:
+            pass
+        CutHandler.ranges.clear()
+
+
+    def tearDown(
+        self
+        ):
+        """
+        Stops the local HTTP server and restores the changed settings.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        for (name,value) in self.saved.items():
+            setattr(settings,name,value)
+        core.log.setEcho(True)
+
+
+    def testChanged(
+        self
+        ):
+        """
+        Tests that an interrupted download is started again from the beginning
+        if the remote file changed since it was interrupted.
+        """
+        with self.assertRaises(exceptions.DownloadError):
+            core.Downloader(self.url).run(self.path)
+        self.data = self.data[::-1]
+        with open(self.remotePath,"wb") as ofile:
+            ofile.write(self.data)
+        os.utime(self.remotePath,(1600000100,1600000100))
+        CutHandler.ranges.clear()
+        core.Downloader(self.url).run(self.path)
+        with open(self.path,"rb") as ifile:
+            self.assertEqual(ifile.read(),self.data)
+        self.assertEqual(CutHandler.ranges,[None])
+
+
+    def testLocalError(
+        self
+        ):
+        """
+        Tests that a local error writing a download, such as a full disk, is
+        neither retried nor counted as a failure of the remote host, and keeps
+        a partial file that is resumed.
+        """
+        settings.requestRetries = 2
+        def progress(received,seconds):
+            raise OSError(errno.ENOSPC,"No space left on device")
+        host = utility.splitUrl(self.url)[1]
+        failures = core.scheduler.stats(host)["failures"]
+        with self.assertRaises(exceptions.DownloadError):
+            core.Downloader(self.url,progress=progress).run(self.path)
+        self.assertEqual(CutHandler.ranges,[None])
+        self.assertEqual(core.scheduler.stats(host)["failures"],failures)
+        size = os.path.getsize(self.path+".part")
+        self.assertGreater(size,0)
+        CutHandler.ranges.clear()
+        core.Downloader(self.url).run(self.path)
+        with open(self.path,"rb") as ifile:
+            self.assertEqual(ifile.read(),self.data)
+        self.assertEqual(CutHandler.ranges,["bytes=%d-" % size])
+
+
+    def testResume(
+        self
+        ):
+        """
+        Tests that an interrupted download keeps its partial file and that
+        downloading it again only requests the remaining data, computing the
+        digests of the whole file.
+        """
+        with self.assertRaises(exceptions.DownloadError):
+            core.Downloader(self.url).run(self.path)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(os.path.getsize(self.path+".part"),len(self.data)//2)
+        self.assertTrue(os.path.isfile(self.path+".part.json"))
+        CutHandler.ranges.clear()
+        downloader = core.Downloader(self.url)
+        downloader.run(self.path)
+        with open(self.path,"rb") as ifile:
+            self.assertEqual(ifile.read(),self.data)
+        self.assertEqual(CutHandler.ranges,["bytes=%d-" % (len(self.data)//2)])
+        self.assertEqual(downloader.digest(),hashlib.md5(self.data).hexdigest())
+        self.assertFalse([p for p in os.listdir(settings.rootPath) if ".part" in p])
+
+
+    def testSegmentCheckpoint(
+        self
+        ):
+        """
+        Tests that the progress of the segments of a download is saved while
+        they are retrieved, never claiming more data than is in the partial
+        file.
+        """
+        CutHandler.cut.add(self.remotePath)
+        settings.checkpointInterval = 0
+        settings.segmentThreshold = 1
+        settings.segmentCount = 4
+        statePath = self.path+".part.json"
+        saved = []
+        def progress(received,seconds):
+            with open(statePath) as ifile:
+                segments = json.loads(ifile.read())["segments"]
+            with open(self.path+".part","rb") as ifile:
+                data = ifile.read()
+            for (start,length,done) in segments:
+                self.assertEqual(data[start:start+done],self.data[start:start+done])
+            saved.append(sum(s[2] for s in segments))
+        core.Downloader(self.url,progress=progress).run(self.path)
+        with open(self.path,"rb") as ifile:
+            self.assertEqual(ifile.read(),self.data)
+        self.assertTrue([s for s in saved if 0 < s < len(self.data)])
+
+
+    def testSegmentResume(
+        self
+        ):
+        """
+        Tests that a segmented download retrieves its segments as byte ranges
+        and that an interrupted segmented download resumes only the remaining
+        data of its interrupted segment.
+        """
+        settings.segmentThreshold = 1
+        settings.segmentCount = 4
+        with self.assertRaises(exceptions.DownloadError):
+            core.Downloader(self.url).run(self.path)
+        self.assertEqual(len(CutHandler.ranges),4)
+        self.assertEqual(os.path.getsize(self.path+".part"),len(self.data))
+        CutHandler.ranges.clear()
+        downloader = core.Downloader(self.url)
+        downloader.run(self.path)
+        with open(self.path,"rb") as ifile:
+            self.assertEqual(ifile.read(),self.data)
+        self.assertEqual(len(CutHandler.ranges),1)
+        (first,last) = CutHandler.ranges[0][len("bytes="):].split("-")
+        step = -(-len(self.data)//4)
+        self.assertEqual(int(last)-int(first)+1,step-step//2)
+        self.assertEqual(downloader.digest(),hashlib.md5(self.data).hexdigest())
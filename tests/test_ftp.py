@@ -0,0 +1,190 @@
+"""
+Tests listing remote FTP directories with the MLSD command and parsing the
+output of the LIST command it falls back to.
+"""
+import datetime
+import ftplib
+from pynome import utility
+import unittest
+
+
+
+
+
+
+
+
+class FakeFTP():
+    """
+    This is the fake FTP class. It stands in for a logged in FTP connection,
+    answering the MLSD and LIST commands with fixed entries and recording every
+    command it is given.
+    """
+
+
+    def __init__(
+        self
+        ,host
+        ,facts=None
+        ,lines=()
+        ):
+        """
+        Initializes a new fake FTP connection.
+
+        Parameters
+        ----------
+        host : string
+               The remote host of this connection.
+        facts : list
+                Tuples of the name and facts of every entry answered by the
+                MLSD command or None if the MLSD command is not supported.
+        lines : list
+                The lines answered by the LIST command.
+        """
+        self.host = host
+        self.facts = facts
+        self.lines = lines
+        self.commands = []
+
+
+    def mlsd(
+        self
+        ,path
+        ,facts
+        ):
+        """
+        Answers the MLSD command for the given path.
+        """
+        self.commands.append("MLSD "+path)
+        if self.facts is None:
+            raise ftplib.error_perm("500 Unknown command.")
+        return iter(self.facts)
+
+
+    def retrlines(
+        self
+        ,command
+        ,callback
+        ):
+        """
+        Answers the given LIST command, giving every line to the given callback.
+        """
+        self.commands.append(command)
+        for line in self.lines:
+            callback(line)
+
+
+
+
+class FTPListingTestCase(unittest.TestCase):
+    """
+    This is the FTP listing test case class. It lists fake FTP connections
+    that do and do not support the MLSD command.
+    """
+
+
+    def tearDown(
+        self
+        ):
+        """
+        Forgets the fake hosts that do not support the MLSD command.
+        """
+        utility._NO_MLSD.discard("nomlsd.example")
+
+
+    def testListFallback(
+        self
+        ):
+        """
+        Tests that a host not supporting the MLSD command is listed with the
+        LIST command, skipping its current and parent entries, and that the
+        MLSD command is never tried again for that host.
+        """
+        ftp = FakeFTP(
+            "nomlsd.example"
+            ,lines=(
+                "drwxr-xr-x   2 ftp ftp      4096 Jan 02  2020 ."
+                ,"drwxr-xr-x   2 ftp ftp      4096 Jan 02  2020 .."
+                ,"-rw-r--r--   1 ftp ftp       100 Jan 02  2020 genome.fa.gz"
+            )
+        )
+        self.assertEqual(
+            utility.listDirectory(ftp,"/pub")
+            ,[("genome.fa.gz",{"type": "file", "size": 100, "modify": "20200102000000"})]
+        )
+        utility.listDirectory(ftp,"/pub")
+        self.assertEqual(ftp.commands,["MLSD /pub","LIST /pub","LIST /pub"])
+
+
+    def testMLSD(
+        self
+        ):
+        """
+        Tests that MLSD facts are normalized, skipping the current and parent
+        entries, marking symbolic links, and truncating fractional seconds.
+        """
+        ftp = FakeFTP(
+            "mlsd.example"
+            ,facts=[
+                (".",{"type": "cdir"})
+                ,("..",{"type": "pdir"})
+                ,("a.gz",{"type": "file", "size": "7", "modify": "20200102030405.123"})
+                ,("current",{"type": "OS.unix=slink:/pub/b"})
+                ,("sub",{"type": "dir", "modify": "20200102030405"})
+            ]
+        )
+        self.assertEqual(
+            utility.listDirectory(ftp,"/pub")
+            ,[
+                ("a.gz",{"type": "file", "size": 7, "modify": "20200102030405"})
+                ,("current",{"type": "link", "size": None, "modify": ""})
+                ,("sub",{"type": "dir", "size": None, "modify": "20200102030405"})
+            ]
+        )
+        self.assertEqual(ftp.commands,["MLSD /pub"])
+
+
+    def testParseListLine(
+        self
+        ):
+        """
+        Tests parsing LIST lines of files, directories, and symbolic links with
+        years or times, and lines that cannot be parsed.
+        """
+        self.assertEqual(
+            utility._parseListLine("-rw-r--r--   1 ftp ftp  1234 Mar  5  2019 a b.txt")
+            ,("a b.txt",{"type": "file", "size": 1234, "modify": "20190305000000"})
+        )
+        self.assertEqual(
+            utility._parseListLine("drwxr-xr-x   2 ftp ftp  4096 Dec 31  2018 dir")
+            ,("dir",{"type": "dir", "size": 4096, "modify": "20181231000000"})
+        )
+        self.assertEqual(
+            utility._parseListLine("lrwxrwxrwx 1 ftp ftp 10 Mar  5  2019 current -> release-110")
+            ,("current",{"type": "link", "size": 10, "modify": "20190305000000"})
+        )
+        self.assertEqual(
+            utility._parseListLine("-rw-r--r--   1 ftp ftp     1 Feb 30  2019 bad")[1]["modify"]
+            ,""
+        )
+        self.assertIsNone(utility._parseListLine("total 12"))
+        self.assertIsNone(utility._parseListLine("crw-r--r--   1 ftp ftp  1, 3 Mar  5  2019 null"))
+
+
+    def testParseListLineTime(
+        self
+        ):
+        """
+        Tests that LIST lines with a time instead of a year are dated in the
+        current year unless that would be in the future, in which case they are
+        dated in the previous year.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        past = now-datetime.timedelta(days=2)
+        future = now+datetime.timedelta(days=2)
+        for (when,year) in ((past,past.year),(future,future.year-1)):
+            line = "-rw-r--r-- 1 ftp ftp 1 "+when.strftime("%b %d %H:%M")+" f"
+            self.assertEqual(
+                utility._parseListLine(line)[1]["modify"]
+                ,when.replace(year=year).strftime("%Y%m%d%H%M00")
+            )
@@ -0,0 +1,310 @@
+"""
+Tests crawling and mirroring over the HTTP transport against a local
+http.server stand-in of the ensembl FTP tree.
+"""
+import functools
+import gzip
+import hashlib
+import http.server
+import os
+from pynome import core
+from pynome import crawlers
+from pynome import exceptions
+from pynome import processes
+from pynome import settings
+from pynome import tasks
+from pynome import transports
+import random
+import tempfile
+import threading
+import unittest
+
+
+
+
+
+
+
+
+class RangeHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    This is the range handler class. It serves the files of a directory like
+    the simple HTTP request handler, additionally answering single byte range
+    requests with partial content, and records every response it sends.
+    """
+    protocol_version = "HTTP/1.1"
+    responses = []
+
+
+    def do_GET(
+        self
+        ):
+        """
+        Answers a GET request, with partial content if it has a range header.
+        """
+        path = self.translate_path(self.path)
+        rangeHeader = self.headers.get("Range")
+        if rangeHeader is None or not os.path.isfile(path):
+            super().do_GET()
+            return
+        size = os.path.getsize(path)
+        (first,last) = rangeHeader[len("bytes="):].split("-")
+        first = int(first)
+        last = min(int(last),size-1) if last else size-1
+        with open(path,"rb") as ifile:
+            ifile.seek(first)
+            data = ifile.read(last-first+1)
+        self.send_response(206)
+        self.send_header("Content-Range","bytes %d-%d/%d" % (first,last,size))
+        self.send_header("Content-Length",str(len(data)))
+        self.send_header("Last-Modified",self.date_time_string(int(os.path.getmtime(path))))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+    def log_message(
+        self
+        ,*args
+        ):
+        """
+        Discards the log messages of the server.
+        """
+        pass
+
+
+    def send_response(
+        self
+        ,code
+        ,message=None
+        ):
+        """
+        Records the given response with the method, path, and conditional and
+        range headers of its request before sending it.
+        """
+        self.responses.append((
+            self.command
+            ,self.path
+            ,self.headers.get("Range")
+            ,self.headers.get("If-Modified-Since")
+            ,code
+        ))
+        super().send_response(code,message)
+
+
+
+
+class HTTPTransportTestCase(unittest.TestCase):
+    """
+    This is the HTTP transport test case class. It crawls a local HTTP server
+    serving a single ensembl assembly and mirrors it once, with a segment
+    threshold small enough for its genome to be downloaded as byte ranges if it
+    was not decompressed.
+    Crawling and mirroring use their own assembly instance and every changed
+    setting is restored once the test case is done.
+    """
+    __RELEASE = "/pub/release-110"
+    __SETTINGS = (
+        "hostConnections"
+        ,"rootPath"
+        ,"segmentCount"
+        ,"segmentThreshold"
+        ,"transports"
+    )
+
+
+    @classmethod
+    def setUpClass(
+        cls
+        ):
+        """
+        Starts the local HTTP server and crawls and mirrors it once.
+        """
+        cls.serverRoot = tempfile.mkdtemp()
+        rng = random.Random(0)
+        cls.genome = "".join(
+            ">1\n"+"".join(rng.choice("ACGT") for i in range(60))+"\n" for j in range(2000)
+        ).encode()
+        cls.__put_("/pub/release-109/README",b"")
+        cls.__put_(
+            cls.__RELEASE+"/species_EnsemblVertebrates.txt"
+            ,b"#name\tspecies\tdivision\ttaxonomy_id\tassembly\n"
+            b"Human\thomo_sapiens\tEnsemblVertebrates\t9606\tGRCh38\n"
+        )
+        base = cls.__RELEASE+"/fasta/homo_sapiens/"
+        cls.__put_(base+"dna/Homo_sapiens.GRCh38.dna.toplevel.fa.gz",gzip.compress(cls.genome))
+        cls.__put_(base+"cdna/Homo_sapiens.GRCh38.cdna.all.fa.gz",gzip.compress(b">t\nACGT\n"))
+        cls.__put_(
+            cls.__RELEASE+"/gff3/homo_sapiens/Homo_sapiens.GRCh38.110.gff3.gz"
+            ,gzip.compress(b"##gff-version 3\n")
+        )
+        cls.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1",0)
+            ,functools.partial(RangeHandler,directory=cls.serverRoot)
+        )
+        threading.Thread(target=cls.server.serve_forever,daemon=True).start()
+        cls.host = "127.0.0.1:%d" % cls.server.server_address[1]
+        cls.saved = {name: getattr(settings,name) for name in cls.__SETTINGS}
+        settings.rootPath = tempfile.mkdtemp()
+        settings.transports = dict(settings.transports,ensembl="http")
+        settings.segmentThreshold = 4096
+        settings.segmentCount = 4
+        settings.hostConnections = 4
+        core.log.setEcho(False)
+        cls.assembly = core.Assembly()
+        cls.__register_()
+        crawler = type("LocalCrawler",(crawlers.EnsemblCrawler,),{"_FTP_HOST": cls.host})()
+        cls.assembly.registerCrawler(crawler)
+        cls.assembly.crawl(core.SpeciesFilter())
+        RangeHandler.responses.clear()
+        cls.assembly.mirror(core.SpeciesFilter())
+        cls.firstMirror = list(RangeHandler.responses)
+        cls.workDir = os.path.join(settings.rootPath,"9606","GRCh38-ensembl")
+
+
+    @classmethod
+    def tearDownClass(
+        cls
+        ):
+        """
+        Stops the local HTTP server and restores the changed settings.
+        """
+        cls.server.shutdown()
+        cls.server.server_close()
+        for (name,value) in cls.saved.items():
+            setattr(settings,name,value)
+        core.log.setEcho(True)
+
+
+    def testConditionalMirror(
+        self
+        ):
+        """
+        Tests that mirroring again sends conditional requests that download
+        nothing because the remote files have not changed.
+        """
+        path = os.path.join(self.workDir,"Homo_sapiens-GRCh38.fa")
+        inode = os.stat(path).st_ino
+        RangeHandler.responses.clear()
+        self.assembly.mirror(core.SpeciesFilter())
+        gets = [r for r in RangeHandler.responses if r[0] == "GET"]
+        self.assertEqual(len(gets),3)
+        for (method,path_,rangeHeader,since,code) in gets:
+            self.assertIsNotNone(since)
+            self.assertEqual(code,304)
+        self.assertEqual(os.stat(path).st_ino,inode)
+
+
+    def testCrawl(
+        self
+        ):
+        """
+        Tests that crawling over HTTP saves HTTP URLs of the local server in
+        the metadata of the crawled assembly.
+        """
+        with open(os.path.join(self.workDir,"metadata.json")) as ifile:
+            meta = ifile.read()
+        self.assertIn(
+            "http://"
+            + self.host
+            + self.__RELEASE
+            + "/fasta/homo_sapiens/dna/Homo_sapiens.GRCh38.dna.toplevel.fa.gz"
+            ,meta
+        )
+
+
+    def testDeduplication(
+        self
+        ):
+        """
+        Tests that the genome is added to the content store under the SHA-256
+        digest of its decompressed content computed while it was downloaded.
+        """
+        digest = hashlib.sha256(self.genome).hexdigest()
+        stored = os.path.join(settings.rootPath,".store","objects",digest[:2],digest)
+        path = os.path.join(self.workDir,"Homo_sapiens-GRCh38.fa")
+        self.assertTrue(os.path.samefile(stored,path))
+        self.assertEqual(core.store.digest(path),digest)
+
+
+    def testMirror(
+        self
+        ):
+        """
+        Tests that mirroring downloads and decompresses every file as a single
+        stream, even if it is larger than the segment threshold.
+        """
+        with open(os.path.join(self.workDir,"Homo_sapiens-GRCh38.fa"),"rb") as ifile:
+            self.assertEqual(ifile.read(),self.genome)
+        with open(os.path.join(self.workDir,"Homo_sapiens-GRCh38.cdna.fa"),"rb") as ifile:
+            self.assertEqual(ifile.read(),b">t\nACGT\n")
+        gets = [
+            r for r in self.firstMirror
+            if r[0] == "GET" and r[1].endswith("toplevel.fa.gz")
+        ]
+        self.assertEqual(len(gets),1)
+        for (method,path,rangeHeader,since,code) in gets:
+            self.assertIsNone(rangeHeader)
+            self.assertEqual(code,200)
+        self.assertFalse([
+            p for p in os.listdir(self.workDir)
+            if ".part" in p or p.startswith(".tmp-")
+        ])
+
+
+    def testPermissions(
+        self
+        ):
+        """
+        Tests that mirrored files and metadata are created with the regular
+        file permissions allowed by the umask.
+        """
+        umask = os.umask(0)
+        os.umask(umask)
+        for name in ("Homo_sapiens-GRCh38.fa","Homo_sapiens-GRCh38.gff","metadata.json"):
+            mode = os.stat(os.path.join(self.workDir,name)).st_mode & 0o777
+            self.assertEqual(mode,0o666 & ~umask)
+
+
+    @classmethod
+    def __put_(
+        cls
+        ,path
+        ,data
+        ):
+        """
+        Writes the given data to the given path of the local HTTP server.
+
+        Parameters
+        ----------
+        path : string
+               The remote path of the file that is written.
+        data : bytes
+               The content of the file.
+        """
+        fullPath = cls.serverRoot+path
+        os.makedirs(os.path.dirname(fullPath),exist_ok=True)
+        with open(fullPath,"wb") as ofile:
+            ofile.write(data)
+
+
+    @classmethod
+    def __register_(
+        cls
+        ):
+        """
+        Registers the processes and tasks used by mirroring with the assembly
+        instance of this test case and the HTTP transport with the scheduler
+        singleton unless it is already registered.
+        """
+        cls.assembly.registerProcess(processes.EnsemblProcess())
+        for task in (
+            tasks.DownloadCDNATask
+            ,tasks.DownloadFastaTask
+            ,tasks.DownloadGffTask
+            ,tasks.DownloadGtfTask
+        ):
+            cls.assembly.registerTask(task)
+        try:
+            core.scheduler.registerTransport("http",transports.HTTPTransport)
+        except exceptions.RegisterError:
+            pass
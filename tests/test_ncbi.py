@@ -0,0 +1,296 @@
+"""
+Tests that the NCBI crawler only probes the assemblies of its assembly summary
+that are new or changed since its last crawl, against a local http.server
+stand-in of the NCBI FTP tree.
+"""
+import functools
+import http.server
+import os
+from pynome import core
+from pynome import crawlers
+from pynome import exceptions
+from pynome import settings
+from pynome import transports
+import tempfile
+import threading
+import unittest
+
+
+
+
+
+
+
+
+class RecordingHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    This is the recording handler class. It serves the files and directory
+    index pages of a directory like the simple HTTP request handler and
+    records the method, path, and response code of every request.
+    """
+    protocol_version = "HTTP/1.1"
+    responses = []
+
+
+    def log_message(
+        self
+        ,*args
+        ):
+        """
+        Discards the log messages of the server.
+        """
+        pass
+
+
+    def send_response(
+        self
+        ,code
+        ,message=None
+        ):
+        """
+        Records the given response with the method and path of its request
+        before sending it.
+        """
+        self.responses.append((self.command,self.path,code))
+        super().send_response(code,message)
+
+
+
+
+class FakeTaxonomy():
+    """
+    This is the fake taxonomy class. It stands in for the taxonomy singleton,
+    providing a taxonomy index of a few primate and rodent taxonomy IDs
+    instead of synchronizing the NCBI taxonomy dump.
+    """
+
+
+    def __init__(
+        self
+        ,directory
+        ):
+        """
+        Initializes a new fake taxonomy whose index is saved to the given
+        directory.
+        """
+        self.__index = core.TaxonomyIndex(directory)
+        self.__index.build(
+            "test"
+            ,[(1,1,8),(9598,1,2),(9606,1,2),(10090,1,4)]
+            ,[(2,"PRI"),(4,"ROD"),(8,"UNA")]
+        )
+
+
+    def index(
+        self
+        ):
+        """
+        Getter method.
+        """
+        return self.__index
+
+
+
+
+class NCBICrawlerTestCase(unittest.TestCase):
+    """
+    This is the NCBI crawler test case class. Every test crawls its own local
+    HTTP server serving an assembly summary and the remote directories of its
+    assemblies, restoring the taxonomy singleton and changed settings
+    afterwards.
+    """
+    __SETTINGS = ("rootPath","transports")
+    __SUMMARY = "/genomes/genbank/assembly_summary_genbank.txt"
+
+
+    def setUp(
+        self
+        ):
+        """
+        Starts the local HTTP server with two assemblies.
+        """
+        self.serverRoot = tempfile.mkdtemp()
+        self.rows = {
+            "GCA_000001.1": ["GCA_000001.1","Homo sapiens","9606","2020/01/01","GRCh1"]
+            ,"GCA_000002.1": ["GCA_000002.1","Mus musculus","10090","2020/01/01","GRCm1"]
+        }
+        for row in self.rows.values():
+            name = row[0]+"_"+row[4]
+            for extension in ("_genomic.fna.gz","_genomic.gff.gz"):
+                self.__put_(self.__directory_(row)+name+extension,b"")
+        self.__putSummary_()
+        self.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1",0)
+            ,functools.partial(RecordingHandler,directory=self.serverRoot)
+        )
+        threading.Thread(target=self.server.serve_forever,daemon=True).start()
+        host = "127.0.0.1:%d" % self.server.server_address[1]
+        self.saved = {name: getattr(settings,name) for name in self.__SETTINGS}
+        self.savedTaxonomy = core.taxonomy
+        settings.rootPath = tempfile.mkdtemp()
+        settings.transports = dict(settings.transports,ncbi="http")
+        core.taxonomy = FakeTaxonomy(tempfile.mkdtemp())
+        core.log.setEcho(False)
+        try:
+            core.scheduler.registerTransport("http",transports.HTTPTransport)
+        except exceptions.RegisterError:
+            pass
+        transport = lambda crawler,h: crawlers.NCBICrawler._transport_(crawler,host)
+        self.crawler = type("LocalCrawler",(crawlers.NCBICrawler,),{"_transport_": transport})()
+        os.makedirs(self.crawler._dataDir_())
+
+
+    def tearDown(
+        self
+        ):
+        """
+        Stops the local HTTP server and restores the taxonomy singleton and
+        changed settings.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        for (name,value) in self.saved.items():
+            setattr(settings,name,value)
+        core.taxonomy = self.savedTaxonomy
+        core.log.setEcho(True)
+
+
+    def testProbeCache(
+        self
+        ):
+        """
+        Tests that a changed row whose sequence release date is unchanged is
+        added again with the cached probe of its assembly directory instead of
+        probing it again.
+        """
+        self.__crawl_()
+        self.rows["GCA_000002.1"][1] = "Mus musculus domesticus"
+        self.__putSummary_()
+        self.assertEqual(self.__crawl_(),[])
+        path = os.path.join(settings.rootPath,"10090","GRCm1-ncbi","metadata.json")
+        with open(path) as ifile:
+            self.assertIn("domesticus",ifile.read())
+
+
+    def testRowDiff(
+        self
+        ):
+        """
+        Tests that only new or changed rows of the assembly summary are probed,
+        that an unchanged summary is not downloaded again, and that a changed
+        summary is.
+        """
+        self.assertEqual(
+            sorted(self.__crawl_())
+            ,sorted(self.__directory_(r) for r in self.rows.values())
+        )
+        for key in ("9606/GRCh1-ncbi","10090/GRCm1-ncbi"):
+            self.assertTrue(os.path.isfile(os.path.join(settings.rootPath,key,"metadata.json")))
+        self.assertEqual(self.__crawl_(),[])
+        self.assertEqual(self.__summaryGets_(),[304])
+        self.rows["GCA_000002.1"][3] = "2021/01/01"
+        self.rows["GCA_000003.1"] = ["GCA_000003.1","Pan troglodytes","9598","2020/01/01","Pan1"]
+        self.__put_(
+            self.__directory_(self.rows["GCA_000003.1"])+"GCA_000003.1_Pan1_genomic.gtf.gz"
+            ,b""
+        )
+        self.__putSummary_()
+        self.assertEqual(
+            sorted(self.__crawl_())
+            ,sorted(self.__directory_(self.rows[k]) for k in ("GCA_000002.1","GCA_000003.1"))
+        )
+        self.assertEqual(self.__summaryGets_(),[200])
+        self.assertTrue(
+            os.path.isfile(os.path.join(settings.rootPath,"9598","Pan1-ncbi","metadata.json"))
+        )
+
+
+    def __crawl_(
+        self
+        ):
+        """
+        Crawls the local HTTP server with this test case's crawler.
+
+        Returns
+        -------
+        ret0 : list
+               The paths of the remote assembly directories that were probed.
+        """
+        RecordingHandler.responses.clear()
+        self.crawler.crawl(core.SpeciesFilter())
+        self.crawler.assemble(core.SpeciesFilter())
+        return [p for (m,p,c) in RecordingHandler.responses if p.startswith("/genomes/all/")]
+
+
+    def __directory_(
+        self
+        ,row
+        ):
+        """
+        Getter method.
+
+        Parameters
+        ----------
+        row : list
+              The accession, organism name, taxonomy ID, sequence release date,
+              and assembly name of an assembly.
+
+        Returns
+        -------
+        ret0 : string
+               The remote path of the given assembly's directory.
+        """
+        return "/genomes/all/"+row[0][:7]+"/"+row[0]+"_"+row[4]+"/"
+
+
+    def __put_(
+        self
+        ,path
+        ,data
+        ):
+        """
+        Writes the given data to the given path of the local HTTP server.
+        """
+        fullPath = self.serverRoot+path
+        os.makedirs(os.path.dirname(fullPath),exist_ok=True)
+        with open(fullPath,"wb") as ofile:
+            ofile.write(data)
+
+
+    def __putSummary_(
+        self
+        ):
+        """
+        Writes the assembly summary of this test case's rows to the local HTTP
+        server, dating it later than any previous summary.
+        """
+        lines = ["# assembly_accession\tetc."]
+        for (accession,organism,taxId,date,name) in self.rows.values():
+            parts = [""]*22
+            parts[0] = accession
+            parts[4] = "reference genome"
+            parts[6] = taxId
+            parts[7] = organism
+            parts[14] = date
+            parts[15] = name
+            parts[19] = "https://ftp.ncbi.nlm.nih.gov"+self.__directory_(self.rows[accession])[:-1]
+            lines.append("\t".join(parts))
+        self.__put_(self.__SUMMARY,("\n".join(lines)+"\n").encode())
+        mtime = getattr(self,"summaryTime",1600000000)+10
+        os.utime(self.serverRoot+self.__SUMMARY,(mtime,mtime))
+        self.summaryTime = mtime
+
+
+    def __summaryGets_(
+        self
+        ):
+        """
+        Getter method.
+
+        Returns
+        -------
+        ret0 : list
+               The response codes of the GET requests of the assembly summary
+               made by the last crawl.
+        """
+        return [c for (m,p,c) in RecordingHandler.responses if m == "GET" and p == self.__SUMMARY]
@@ -0,0 +1,159 @@
+"""
+Tests retrying requests with backoff and the circuit breaker of the
+scheduler.
+"""
+import ftplib
+from pynome import core
+from pynome import exceptions
+from pynome import settings
+import time
+import unittest
+
+
+
+
+
+
+
+
+class SchedulerTestCase(unittest.TestCase):
+    """
+    This is the scheduler test case class. Every test uses its own scheduler
+    instance with short backoff delays and cool downs, restoring the changed
+    settings afterwards.
+    """
+    __HOST = "scheduler.example"
+    __SETTINGS = (
+        "backoffBase"
+        ,"backoffMax"
+        ,"breakerCooldown"
+        ,"breakerThreshold"
+        ,"requestRetries"
+    )
+
+
+    def setUp(
+        self
+        ):
+        """
+        Creates a new scheduler with short backoff delays and cool downs.
+        """
+        self.saved = {name: getattr(settings,name) for name in self.__SETTINGS}
+        settings.backoffBase = 0.05
+        settings.backoffMax = 0.1
+        settings.breakerCooldown = 0.2
+        settings.breakerThreshold = 2
+        settings.requestRetries = 5
+        self.scheduler = core.Scheduler()
+
+
+    def tearDown(
+        self
+        ):
+        """
+        Restores the changed settings.
+        """
+        for (name,value) in self.saved.items():
+            setattr(settings,name,value)
+
+
+    def testBackoff(
+        self
+        ):
+        """
+        Tests that failed requests are retried with exponential backoff capped
+        by the maximum backoff, and counted as retries and failures.
+        """
+        settings.breakerThreshold = 10
+        failures = [OSError("reset")]*3
+        def request():
+            if failures:
+                raise failures.pop()
+            return "done"
+        start = time.monotonic()
+        self.assertEqual(self.scheduler.call(self.__HOST,request),"done")
+        self.assertGreaterEqual(time.monotonic()-start,(0.05+0.1+0.1)/2)
+        stats = self.scheduler.stats(self.__HOST)
+        self.assertEqual(stats["requests"],4)
+        self.assertEqual(stats["retries"],3)
+        self.assertEqual(stats["failures"],3)
+
+
+    def testBreakerHalfOpen(
+        self
+        ):
+        """
+        Tests that the circuit breaker lets a single trial request through once
+        its cool down has passed, rejecting every other request until the trial
+        is done, and closes again if the trial succeeds.
+        """
+        self.__open_()
+        time.sleep(settings.breakerCooldown)
+        rejected = []
+        def trial():
+            with self.assertRaises(exceptions.RemoteError):
+                self.scheduler.call(self.__HOST,lambda: rejected.append(True))
+            return "trial"
+        self.assertEqual(self.scheduler.call(self.__HOST,trial),"trial")
+        self.assertFalse(rejected)
+        self.assertEqual(self.scheduler.call(self.__HOST,lambda: "closed"),"closed")
+
+
+    def testBreakerOpen(
+        self
+        ):
+        """
+        Tests that the circuit breaker opens after too many failures in a row,
+        failing requests without making them, and opens again at once if its
+        trial request fails.
+        """
+        self.__open_()
+        calls = []
+        with self.assertRaises(exceptions.RemoteError):
+            self.scheduler.call(self.__HOST,lambda: calls.append(True))
+        self.assertFalse(calls)
+        time.sleep(settings.breakerCooldown)
+        with self.assertRaises(exceptions.RemoteError):
+            self.scheduler.call(self.__HOST,self.__fail_)
+        with self.assertRaises(exceptions.RemoteError):
+            self.scheduler.call(self.__HOST,lambda: calls.append(True))
+        self.assertFalse(calls)
+        self.assertEqual(self.scheduler.stats(self.__HOST)["failures"],3)
+
+
+    def testPermanentError(
+        self
+        ):
+        """
+        Tests that permanent FTP errors are raised without being retried or
+        counted as failures.
+        """
+        def request():
+            raise ftplib.error_perm("550 No such file.")
+        with self.assertRaises(ftplib.error_perm):
+            self.scheduler.call(self.__HOST,request)
+        stats = self.scheduler.stats(self.__HOST)
+        self.assertEqual(stats["requests"],1)
+        self.assertEqual(stats["failures"],0)
+
+
+    def __fail_(
+        self
+        ):
+        """
+        Fails a request with a connection error.
+        """
+        raise ConnectionRefusedError("refused")
+
+
+    def __open_(
+        self
+        ):
+        """
+        Opens the circuit breaker of this test case's host by failing requests
+        to it without retrying them.
+        """
+        settings.requestRetries = 0
+        for i in range(settings.breakerThreshold):
+            with self.assertRaises(exceptions.RemoteError):
+                self.scheduler.call(self.__HOST,self.__fail_)